@@ -0,0 +1,53 @@
+import json
+import logging
+import argparse
+
+from marketrpc.rpcBinary import encode_batch, decode_batch
+from marketrpc.rpcColumns import decode_columns
+from marketrpc.market_history_pb2 import BatchReply
+from decode_bench import kline_payload, aggtrade_payload, orderbook_payload, best_of
+
+logging.basicConfig(level=logging.INFO,format="[%(name)s][%(asctime)s][%(filename)s:%(lineno)d]\t%(levelname)s\t%(message)s",)
+
+
+def run(rows: int, repeat: int) -> list:
+    payloads = {
+        "KLINE": kline_payload(rows),
+        "AGG_TRADE": aggtrade_payload(rows),
+        "ORDER_BOOK": orderbook_payload(rows),
+    }
+    results = []
+    for type, payload in payloads.items():
+        raw = payload.encode("utf-8")
+        data = json.loads(payload)["data"]
+        binary = encode_batch(data, type).SerializeToString()
+        # 客户端收到的是序列化后的字节，解析耗时包含protobuf反序列化
+        results.append({
+            "type": type,
+            "rows": rows,
+            "json_kb": round(len(raw) / 1024, 1),
+            "binary_kb": round(len(binary) / 1024, 1),
+            "size_ratio": round(len(binary) / len(raw), 3),
+            "json_encode_ms": round(best_of(lambda: json.dumps({"data": data}), repeat) * 1000, 2),
+            "binary_encode_ms": round(best_of(lambda: encode_batch(data, type).SerializeToString(), repeat) * 1000, 2),
+            "json_records_ms": round(best_of(lambda: json.loads(raw)["data"], repeat) * 1000, 2),
+            "binary_records_ms": round(best_of(lambda: decode_batch(BatchReply.FromString(binary), type), repeat) * 1000, 2),
+            "json_columns_ms": round(best_of(lambda: decode_columns(raw, type), repeat) * 1000, 2),
+            "binary_columns_ms": round(best_of(lambda: decode_batch(BatchReply.FromString(binary), type, "columns"), repeat) * 1000, 2),
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="JSON与类型化二进制响应的大小及解析耗时对比")
+    parser.add_argument("--rows", type=int, default=10000, help="每个响应的数据行数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取最优值")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            logging.info(result)
@@ -0,0 +1,57 @@
+import json
+import logging
+import argparse
+
+from marketrpc.rpcCompress import available_encodings, compress_payload, decompress_payload
+from decode_bench import kline_payload, aggtrade_payload, orderbook_payload, best_of
+
+logging.basicConfig(level=logging.INFO,format="[%(name)s][%(asctime)s][%(filename)s:%(lineno)d]\t%(levelname)s\t%(message)s",)
+
+
+def run(rows: int, repeat: int, bandwidth_mbps: float) -> list:
+    payloads = {
+        "KLINE": kline_payload(rows),
+        "AGG_TRADE": aggtrade_payload(rows),
+        "ORDER_BOOK": orderbook_payload(rows),
+    }
+    results = []
+    for type, payload in payloads.items():
+        raw = payload.encode("utf-8")
+        results.append({
+            "type": type,
+            "encoding": "identity",
+            "wire_kb": round(len(raw) / 1024, 1),
+            "ratio": 1.0,
+            "transfer_ms": round(len(raw) * 8 / bandwidth_mbps / 1000, 2),
+        })
+        # gzip/deflate 与gRPC传输层压缩使用相同的zlib算法，可据此估算开启gRPC压缩后的线上字节数
+        for encoding in available_encodings():
+            compressed = compress_payload(raw, encoding)
+            compress_ms = best_of(lambda: compress_payload(raw, encoding), repeat) * 1000
+            decompress_ms = best_of(lambda: decompress_payload(compressed, encoding), repeat) * 1000
+            results.append({
+                "type": type,
+                "encoding": encoding,
+                "wire_kb": round(len(compressed) / 1024, 1),
+                "ratio": round(len(compressed) / len(raw), 3),
+                "compress_ms": round(compress_ms, 2),
+                "decompress_ms": round(decompress_ms, 2),
+                "transfer_ms": round(len(compressed) * 8 / bandwidth_mbps / 1000 + decompress_ms, 2),
+            })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="响应负载压缩的体积与解压耗时对比")
+    parser.add_argument("--rows", type=int, default=10000, help="每个响应的数据行数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取最优值")
+    parser.add_argument("--bandwidth", type=float, default=100, help="链路带宽(Mbps)，用于估算传输加解压耗时")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat, args.bandwidth)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            logging.info(result)
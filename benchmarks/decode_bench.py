@@ -0,0 +1,124 @@
+import json
+import time
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+from marketrpc import rpcDecode
+from marketrpc.rpcColumns import decode_columns
+
+logging.basicConfig(level=logging.INFO,format="[%(name)s][%(asctime)s][%(filename)s:%(lineno)d]\t%(levelname)s\t%(message)s",)
+
+BASE_TIME = datetime(2024, 12, 2, 10, 0, 0)
+BASE_TIMESTAMP = 1733104800000
+
+
+def kline_payload(rows: int) -> str:
+    random.seed(1)
+    data = []
+    price = 97000.0
+    for i in range(rows):
+        open_price = price
+        price = round(price + random.uniform(-5, 5), 1)
+        data.append({
+            "Time": (BASE_TIME + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "Timestamp": BASE_TIMESTAMP + i * 1000,
+            "IntervalSecond": 1,
+            "Open": open_price,
+            "High": round(max(open_price, price) + random.uniform(0, 3), 1),
+            "Low": round(min(open_price, price) - random.uniform(0, 3), 1),
+            "Close": price,
+            "Volume": round(random.uniform(0, 20), 3),
+            "EndTimestamp": BASE_TIMESTAMP + i * 1000 + 999,
+            "TransactionNumber": random.randint(0, 200),
+            "TransactionVolume": round(random.uniform(0, 2000000), 4),
+            "BuyTransactionVolume": round(random.uniform(0, 1000000), 4),
+            "BuyTransactionAmount": random.randint(0, 100),
+            "StartId": 5600000000 + i * 100,
+            "EndId": 5600000000 + i * 100 + 99,
+        })
+    return json.dumps({"data": data})
+
+
+def aggtrade_payload(rows: int) -> str:
+    random.seed(2)
+    data = []
+    for i in range(rows):
+        timestamp = BASE_TIMESTAMP + i * 37
+        data.append({
+            "Time": (BASE_TIME + timedelta(milliseconds=i * 37)).strftime("%Y-%m-%d %H:%M:%S"),
+            "Timestamp": timestamp,
+            "AId": 2400000000 + i,
+            "First": 5600000000 + i * 3,
+            "Last": 5600000000 + i * 3 + 2,
+            "Price": round(97000 + random.uniform(-50, 50), 1),
+            "Quantity": round(random.uniform(0.001, 3), 3),
+            "IsBuyer": random.random() < 0.5,
+        })
+    return json.dumps({"data": data})
+
+
+def orderbook_payload(rows: int, depth: int = 20) -> str:
+    random.seed(3)
+    data = []
+    for i in range(rows):
+        mid = 97000 + random.uniform(-50, 50)
+        data.append({
+            "Time": (BASE_TIME + timedelta(milliseconds=i * 100)).strftime("%Y-%m-%d %H:%M:%S"),
+            "Timestamp": BASE_TIMESTAMP + i * 100,
+            "UId": 6000000000 + i * 10,
+            "PreUId": 6000000000 + i * 10 - 10,
+            "Bids": [[f"{mid - 0.1 * (level + 1):.1f}", f"{random.uniform(0, 5):.3f}"] for level in range(depth)],
+            "Asks": [[f"{mid + 0.1 * (level + 1):.1f}", f"{random.uniform(0, 5):.3f}"] for level in range(depth)],
+        })
+    return json.dumps({"data": data})
+
+
+def best_of(func, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(rows: int, repeat: int) -> list:
+    payloads = {
+        "KLINE": kline_payload(rows),
+        "AGG_TRADE": aggtrade_payload(rows),
+        "ORDER_BOOK": orderbook_payload(rows),
+    }
+    results = []
+    for type, payload in payloads.items():
+        raw = payload.encode("utf-8")
+        for name in rpcDecode.available_decoders():
+            rpcDecode.set_decoder(name)
+            results.append({
+                "type": type,
+                "decoder": name,
+                "rows": rows,
+                "payload_mb": round(len(raw) / 1024 / 1024, 2),
+                "loads_str_ms": round(best_of(lambda: rpcDecode.loads(payload), repeat) * 1000, 2),
+                "loads_bytes_ms": round(best_of(lambda: rpcDecode.loads(raw), repeat) * 1000, 2),
+                "columns_ms": round(best_of(lambda: decode_columns(raw, type), repeat) * 1000, 2),
+            })
+    rpcDecode.set_decoder()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="JSON解析器性能对比")
+    parser.add_argument("--rows", type=int, default=10000, help="每个响应的数据行数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取最优值")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            logging.info(result)
@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import subprocess
+
+logging.basicConfig(level=logging.INFO,format="[%(name)s][%(asctime)s][%(filename)s:%(lineno)d]\t%(levelname)s\t%(message)s",)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入后检查是否被提前加载的重量级依赖
+HEAVY_MODULES = ("grpc", "google.protobuf", "marketrpc.market_history_pb2", "http.server", "numpy")
+
+# 在全新解释器中计时导入，再计时首次查询时才加载的 grpc 与 protobuf 生成模块
+_PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter() - started
+loaded = [name for name in {heavy!r} if name in sys.modules]
+started = time.perf_counter()
+from marketrpc import rpcUtils
+rpcUtils.market_history_pb2.DataRequest
+rpcUtils.grpc.StatusCode
+first_query = time.perf_counter() - started
+print(json.dumps({{"import_ms": imported * 1000, "first_query_ms": first_query * 1000, "loaded": loaded}}))
+"""
+
+
+def probe(module: str) -> dict:
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    output = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(modules: list, repeat: int) -> list:
+    results = []
+    for module in modules:
+        samples = [probe(module) for _ in range(repeat)]
+        import_ms = sorted(sample["import_ms"] for sample in samples)
+        first_query_ms = sorted(sample["first_query_ms"] for sample in samples)
+        results.append({
+            "module": module,
+            "import_ms": round(import_ms[len(import_ms) // 2], 2),
+            "import_min_ms": round(import_ms[0], 2),
+            "first_query_ms": round(first_query_ms[len(first_query_ms) // 2], 2),
+            "loaded": samples[-1]["loaded"],
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="包导入耗时与首次查询时的延迟加载耗时")
+    parser.add_argument("--modules", default="marketrpc,marketrpc.rpcUtils,marketrpc.rpcClient",
+                        help="逗号分隔的模块列表")
+    parser.add_argument("--repeat", type=int, default=10, help="每个模块启动解释器的次数，取中位数")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    args = parser.parse_args()
+
+    results = run(args.modules.split(","), args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            logging.info(result)
@@ -0,0 +1,216 @@
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import resource
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+
+from decode_bench import BASE_TIMESTAMP, kline_payload, aggtrade_payload, orderbook_payload
+
+logging.basicConfig(level=logging.INFO,format="[%(name)s][%(asctime)s][%(filename)s:%(lineno)d]\t%(levelname)s\t%(message)s",)
+
+# 各数据类型的合成数据生成函数与查询参数
+TYPES = {
+    "kline": ("KLINE", kline_payload),
+    "aggtrade": ("AGG_TRADE", aggtrade_payload),
+    "orderbook": ("ORDER_BOOK", orderbook_payload),
+}
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为KB，macOS 为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def run_server(rows: int, types: list, latency_ms: float, ready):
+    """
+    在子进程中运行合成数据服务，避免服务端与客户端争用GIL
+
+    相同请求的响应只序列化一次，使测量结果反映客户端开销；latency_ms 模拟服务端与网络延迟。
+    """
+    from marketrpc.rpcServer import MemorySource, MarketHistoryServicer, serve
+
+    data = {TYPES[name][0]: json.loads(TYPES[name][1](rows))["data"] for name in types}
+
+    class BenchServicer(MarketHistoryServicer):
+        def __init__(self, source):
+            super().__init__(source)
+            self._replies = {}
+            self._lock = threading.Lock()
+
+        def _cached(self, method: str, request, context):
+            key = (method, request.type, request.jsonData, request.accept_encoding)
+            reply = self._replies.get(key)
+            if reply is None:
+                reply = getattr(super(), method)(request, context)
+                with self._lock:
+                    self._replies[key] = reply
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            return reply
+
+        def queryData(self, request, context):
+            return self._cached("queryData", request, context)
+
+        def queryBatch(self, request, context):
+            return self._cached("queryBatch", request, context)
+
+    server, port = serve(BenchServicer(MemorySource(data)), max_workers=32,
+                         options=[("grpc.max_send_message_length", 100 * 1024 * 1024)])
+    ready.put(port)
+    server.wait_for_termination()
+
+
+def run_scenario(address: str, scenario: dict, result_queue):
+    """
+    在独立的子进程中执行一个场景，使峰值内存只反映该场景
+    """
+    from marketrpc import rpcUtils, rpcMetrics
+
+    rpcUtils.set_binary(scenario["binary"])
+    rpcUtils.set_default_client(rpcUtils.MarketRpcClient(address, options=rpcUtils.GRPC_OPTION))
+    rss_before = _peak_rss_mb()
+    received = []
+    rpcMetrics.add_hook(lambda metrics: received.append(metrics.bytes))
+
+    type = scenario["type"]
+    page_size = scenario["page_size"]
+    step = {"kline": 1000, "aggtrade": 37, "orderbook": 100}[type]
+    span = max(1, scenario["rows"] - page_size) * step
+    random.seed(0)
+    # 固定的几个查询窗口轮流使用，服务端缓存命中后只剩客户端开销
+    starts = [BASE_TIMESTAMP + random.randrange(0, span, step) for _ in range(8)]
+
+    def call(index: int) -> int:
+        start_time = starts[index % len(starts)]
+        end_time = start_time + page_size * step * 2
+        timer_start = time.perf_counter_ns()
+        if type == "kline":
+            rpcUtils.market_kline("future", "btcusdt", 1, start_time, end_time, limit=page_size,
+                                  output=scenario["output"], cache=False)
+        elif type == "aggtrade":
+            rpcUtils.market_aggtrade("binance", "future", "btcusdt", start_time, end_time, limit=page_size,
+                                     output=scenario["output"], cache=False)
+        else:
+            rpcUtils.market_orderbook("binance", "future", "btcusdt", start_time, end_time, limit=page_size,
+                                      output=scenario["output"], cache=False)
+        return time.perf_counter_ns() - timer_start
+
+    for index in range(scenario["warmup"]):
+        call(index)
+    received.clear()
+
+    wall_start = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=scenario["concurrency"]) as executor:
+        latencies = list(executor.map(call, range(scenario["requests"])))
+    wall = (time.perf_counter_ns() - wall_start) / 1e9
+
+    latencies_ms = [latency / 1e6 for latency in latencies]
+    total_bytes = sum(received)
+    result_queue.put(dict(scenario, **{
+        "calls_per_sec": round(len(latencies) / wall, 2),
+        "p50_ms": round(_percentile(latencies_ms, 0.5), 2),
+        "p99_ms": round(_percentile(latencies_ms, 0.99), 2),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2),
+        "mb_per_sec": round(total_bytes / 1024 / 1024 / wall, 2),
+        "bytes_per_call": total_bytes // max(1, len(received)),
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    }))
+
+
+def run(args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    server = context.Process(target=run_server, args=(args.rows, args.types, args.latency_ms, ready), daemon=True)
+    server.start()
+    address = f"127.0.0.1:{ready.get(timeout=120)}"
+    results = []
+    try:
+        for type in args.types:
+            for page_size in args.page_sizes:
+                for concurrency in args.concurrency:
+                    for output, binary in itertools.product(args.outputs, (False, True) if args.binary else (False,)):
+                        scenario = {
+                            "type": type,
+                            "page_size": page_size,
+                            "concurrency": concurrency,
+                            "output": output,
+                            "binary": binary,
+                            "requests": args.requests,
+                            "warmup": args.warmup,
+                            "rows": args.rows,
+                            "latency_ms": args.latency_ms,
+                        }
+                        result_queue = context.Queue()
+                        worker = context.Process(target=run_scenario, args=(address, scenario, result_queue))
+                        worker.start()
+                        result = result_queue.get()
+                        worker.join()
+                        logging.info(result)
+                        results.append(result)
+    finally:
+        server.terminate()
+        server.join()
+
+    from marketrpc import __version__
+    return {
+        "meta": {
+            "version": __version__,
+            "python": platform.python_version(),
+            "grpc": grpc.__version__,
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+
+
+def _int_list(value: str) -> list:
+    return [int(item) for item in value.split(",")]
+
+
+def _str_list(value: str) -> list:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="基于本地合成数据服务的查询性能测试")
+    parser.add_argument("--types", type=_str_list, default=["kline", "aggtrade", "orderbook"], help="数据类型，逗号分隔")
+    parser.add_argument("--page-sizes", type=_int_list, default=[1000, 10000], help="每次请求的行数，逗号分隔")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="并发请求数，逗号分隔")
+    parser.add_argument("--outputs", type=_str_list, default=["records", "numpy"], help="输出格式，逗号分隔")
+    parser.add_argument("--requests", type=int, default=50, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=3, help="每个场景的预热请求数")
+    parser.add_argument("--rows", type=int, default=20000, help="每种数据类型的合成数据行数")
+    parser.add_argument("--latency-ms", type=float, default=0, help="服务端注入的延迟(毫秒)")
+    parser.add_argument("--binary", action="store_true", help="在JSON响应之外同时测试类型化二进制响应，结果以 binary 字段区分")
+    parser.add_argument("--output", help="结果JSON文件路径，为空时输出到标准输出")
+    args = parser.parse_args()
+    for name in args.types:
+        if name not in TYPES:
+            parser.error(f"Type must be one of {', '.join(TYPES)}.")
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14market_history.proto\x12\x0emarket_history\"-\n\x0b\x44\x61taRequest\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x10\n\x08jsonData\x18\x02 \x01(\t\"W\n\tDataReply\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0b\n\x03msg\x18\x02 \x01(\t\x12\x0f\n\x07success\x18\x03 \x01(\x08\x12\x0c\n\x04type\x18\x04 \x01(\t\x12\x10\n\x08jsonData\x18\x05 \x01(\t2[\n\x14MarketHistoryService\x12\x43\n\tqueryData\x12\x1b.market_history.DataRequest\x1a\x19.market_history.DataReplyB\x15Z\x13grpc/market_historyb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14market_history.proto\x12\x0emarket_history\"F\n\x0b\x44\x61taRequest\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x10\n\x08jsonData\x18\x02 \x01(\t\x12\x17\n\x0f\x61\x63\x63\x65pt_encoding\x18\x03 \x01(\t\"z\n\tDataReply\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0b\n\x03msg\x18\x02 \x01(\t\x12\x0f\n\x07success\x18\x03 \x01(\x08\x12\x0c\n\x04type\x18\x04 \x01(\t\x12\x10\n\x08jsonData\x18\x05 \x01(\t\x12\x10\n\x08\x65ncoding\x18\x06 \x01(\t\x12\x0f\n\x07payload\x18\x07 \x01(\x0c\"}\n\x0cRawDataReply\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0b\n\x03msg\x18\x02 \x01(\t\x12\x0f\n\x07success\x18\x03 \x01(\x08\x12\x0c\n\x04type\x18\x04 \x01(\t\x12\x10\n\x08jsonData\x18\x05 \x01(\x0c\x12\x10\n\x08\x65ncoding\x18\x06 \x01(\t\x12\x0f\n\x07payload\x18\x07 \x01(\x0c\"\xb1\x02\n\nKlineBatch\x12\x11\n\ttimestamp\x18\x01 \x03(\x03\x12\x17\n\x0finterval_second\x18\x02 \x03(\x03\x12\x0c\n\x04open\x18\x03 \x03(\x01\x12\x0c\n\x04high\x18\x04 \x03(\x01\x12\x0b\n\x03low\x18\x05 \x03(\x01\x12\r\n\x05\x63lose\x18\x06 \x03(\x01\x12\x0e\n\x06volume\x18\x07 \x03(\x01\x12\x15\n\rend_timestamp\x18\x08 \x03(\x03\x12\x1a\n\x12transaction_number\x18\t \x03(\x03\x12\x1a\n\x12transaction_volume\x18\n \x03(\x01\x12\x1e\n\x16\x62uy_transaction_volume\x18\x0b \x03(\x01\x12\x1e\n\x16\x62uy_transaction_amount\x18\x0c \x03(\x03\x12\x10\n\x08start_id\x18\r \x03(\x03\x12\x0e\n\x06\x65nd_id\x18\x0e \x03(\x03\"\x80\x01\n\rAggTradeBatch\x12\x11\n\ttimestamp\x18\x01 \x03(\x03\x12\x0c\n\x04\x61_id\x18\x02 \x03(\x03\x12\r\n\x05\x66irst\x18\x03 \x03(\x03\x12\x0c\n\x04last\x18\x04 \x03(\x03\x12\r\n\x05price\x18\x05 \x03(\x01\x12\x10\n\x08quantity\x18\x06 \x03(\x01\x12\x10\n\x08is_buyer\x18\x07 \x03(\x08\"\xbb\x01\n\x0eOrderBookBatch\x12\x11\n\ttimestamp\x18\x01 \x03(\x03\x12\x0c\n\x04u_id\x18\x02 \x03(\x03\x12\x10\n\x08pre_u_id\x18\x03 \x03(\x03\x12\x11\n\tbid_depth\x18\x04 \x03(\r\x12\x11\n\tbid_price\x18\x05 \x03(\x01\x12\x14\n\x0c\x62id_quantity\x18\x06 \x03(\x01\x12\x11\n\task_depth\x18\x07 \x03(\r\x12\x11\n\task_price\x18\x08 \x03(\x01\x12\x14\n\x0c\x61sk_quantity\x18\t \x03(\x01\"\xe6\x01\n\nBatchReply\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0b\n\x03msg\x18\x02 \x01(\t\x12\x0f\n\x07success\x18\x03 \x01(\x08\x12\x0c\n\x04type\x18\x04 \x01(\t\x12+\n\x05kline\x18\x05 \x01(\x0b\x32\x1a.market_history.KlineBatchH\x00\x12\x32\n\tagg_trade\x18\x06 \x01(\x0b\x32\x1d.market_history.AggTradeBatchH\x00\x12\x34\n\norder_book\x18\x07 \x01(\x0b\x32\x1e.market_history.OrderBookBatchH\x00\x42\x07\n\x05\x62\x61tch2\xea\x01\n\x14MarketHistoryService\x12\x43\n\tqueryData\x12\x1b.market_history.DataRequest\x1a\x19.market_history.DataReply\x12\x46\n\nstreamData\x12\x1b.market_history.DataRequest\x1a\x19.market_history.DataReply0\x01\x12\x45\n\nqueryBatch\x12\x1b.market_history.DataRequest\x1a\x1a.market_history.BatchReplyB\x15Z\x13grpc/market_historyb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,9 +33,19 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z\023grpc/market_history'
   _globals['_DATAREQUEST']._serialized_start=40
-  _globals['_DATAREQUEST']._serialized_end=85
-  _globals['_DATAREPLY']._serialized_start=87
-  _globals['_DATAREPLY']._serialized_end=174
-  _globals['_MARKETHISTORYSERVICE']._serialized_start=176
-  _globals['_MARKETHISTORYSERVICE']._serialized_end=267
+  _globals['_DATAREQUEST']._serialized_end=110
+  _globals['_DATAREPLY']._serialized_start=112
+  _globals['_DATAREPLY']._serialized_end=234
+  _globals['_RAWDATAREPLY']._serialized_start=236
+  _globals['_RAWDATAREPLY']._serialized_end=361
+  _globals['_KLINEBATCH']._serialized_start=364
+  _globals['_KLINEBATCH']._serialized_end=669
+  _globals['_AGGTRADEBATCH']._serialized_start=672
+  _globals['_AGGTRADEBATCH']._serialized_end=800
+  _globals['_ORDERBOOKBATCH']._serialized_start=803
+  _globals['_ORDERBOOKBATCH']._serialized_end=990
+  _globals['_BATCHREPLY']._serialized_start=993
+  _globals['_BATCHREPLY']._serialized_end=1223
+  _globals['_MARKETHISTORYSERVICE']._serialized_start=1226
+  _globals['_MARKETHISTORYSERVICE']._serialized_end=1460
 # @@protoc_insertion_point(module_scope)
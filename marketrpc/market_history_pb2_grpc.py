@@ -3,7 +3,7 @@
 import grpc
 import warnings
 
-import market_history_pb2 as market__history__pb2
+from . import market_history_pb2 as market__history__pb2
 
 GRPC_GENERATED_VERSION = '1.67.1'
 GRPC_VERSION = grpc.__version__
@@ -39,6 +39,16 @@ class MarketHistoryServiceStub(object):
                 request_serializer=market__history__pb2.DataRequest.SerializeToString,
                 response_deserializer=market__history__pb2.DataReply.FromString,
                 _registered_method=True)
+        self.streamData = channel.unary_stream(
+                '/market_history.MarketHistoryService/streamData',
+                request_serializer=market__history__pb2.DataRequest.SerializeToString,
+                response_deserializer=market__history__pb2.DataReply.FromString,
+                _registered_method=True)
+        self.queryBatch = channel.unary_unary(
+                '/market_history.MarketHistoryService/queryBatch',
+                request_serializer=market__history__pb2.DataRequest.SerializeToString,
+                response_deserializer=market__history__pb2.BatchReply.FromString,
+                _registered_method=True)
 
 
 class MarketHistoryServiceServicer(object):
@@ -50,6 +60,20 @@ class MarketHistoryServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def streamData(self, request, context):
+        """按块流式返回数据，每个 DataReply 的 jsonData 为 {"data": [...]}，客户端边接收边解析
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def queryBatch(self, request, context):
+        """按列返回类型化数据，省去JSON编解码；旧服务端返回 UNIMPLEMENTED 时客户端改用 queryData
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_MarketHistoryServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +82,16 @@ def add_MarketHistoryServiceServicer_to_server(servicer, server):
                     request_deserializer=market__history__pb2.DataRequest.FromString,
                     response_serializer=market__history__pb2.DataReply.SerializeToString,
             ),
+            'streamData': grpc.unary_stream_rpc_method_handler(
+                    servicer.streamData,
+                    request_deserializer=market__history__pb2.DataRequest.FromString,
+                    response_serializer=market__history__pb2.DataReply.SerializeToString,
+            ),
+            'queryBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.queryBatch,
+                    request_deserializer=market__history__pb2.DataRequest.FromString,
+                    response_serializer=market__history__pb2.BatchReply.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'market_history.MarketHistoryService', rpc_method_handlers)
@@ -95,3 +129,57 @@ class MarketHistoryService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def streamData(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/market_history.MarketHistoryService/streamData',
+            market__history__pb2.DataRequest.SerializeToString,
+            market__history__pb2.DataReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def queryBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/market_history.MarketHistoryService/queryBatch',
+            market__history__pb2.DataRequest.SerializeToString,
+            market__history__pb2.BatchReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
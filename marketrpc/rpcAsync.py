@@ -0,0 +1,426 @@
+import os
+import time
+import asyncio
+import logging
+import weakref
+import grpc
+from grpc import aio
+
+from . import rpcUtils
+from . import rpcMetrics
+from .rpcUtils import (
+    GRPC_KEEPALIVE_OPTION,
+    RawMarketHistoryServiceStub,
+    OUTPUT_RECORDS,
+    PageCursor,
+    page_length,
+    check_output,
+    normalize_timestamp,
+    build_kline_request,
+    build_aggtrade_request,
+    build_orderbook_request,
+    parse_reply,
+)
+from .rpcCompress import grpc_compression, check_encodings
+from .rpcBalancer import ENV_ENDPOINTS, ENV_LB_POLICY, POLICIES, POLICY_ROUND_ROBIN, parse_endpoints, _endpoint_options
+from .rpcRetry import RetryPolicy
+from .rpcPacing import page_limit, wait_limiter_async
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMarketRpcClient(object):
+    """
+    基于 grpc.aio 的行情客户端，持有一组长连接channel，只能在创建它的事件循环中使用
+
+    :param address: 服务地址，逗号分隔多个地址时各地址分配相同数量的channel；为空时读取环境变量 MARKETRPC_ENDPOINTS，未设置时使用 rpcUtils.GRPC_SERVER_ADDRESS
+    :param pool_size: channel数量，多个地址时向上取整为地址数的整数倍(default:4)
+    :param options: channel参数，为空时使用 rpcUtils.GRPC_OPTION，会与保活参数合并
+    :param compression: 请求的gRPC传输层压缩 none / gzip / deflate
+    :param payload_encoding: 可接受的响应负载压缩编码，含义同 MarketRpcClient
+    :param retry: query 的超时、重试与对冲策略，为空时使用 RetryPolicy 默认值
+    :param limiter: 请求限流 rpcPacing.RateLimiter，可与同步客户端共用；每次尝试前在事件循环中等待配额，为空时不限流
+    :param policy: channel选择策略 round_robin / least_outstanding，为空时读取环境变量 MARKETRPC_LB_POLICY(default:round_robin)
+    """
+
+    def __init__(self, address: str = None, pool_size: int = 4, options: list = None, compression: str = None,
+                 payload_encoding: any = None, retry: RetryPolicy = None, limiter=None, policy: str = None):
+        if pool_size <= 0:
+            raise ValueError("Pool size must be greater than 0.")
+        policy = policy or os.environ.get(ENV_LB_POLICY) or POLICY_ROUND_ROBIN
+        if policy not in POLICIES:
+            raise ValueError(f"Policy must be one of {', '.join(POLICIES)}.")
+        self.addresses = parse_endpoints(address or os.environ.get(ENV_ENDPOINTS) or rpcUtils.GRPC_SERVER_ADDRESS)
+        self.address = ",".join(self.addresses)
+        self.policy = policy
+        self.pool_size = -(-pool_size // len(self.addresses)) * len(self.addresses)
+        self.options = list(GRPC_KEEPALIVE_OPTION) + list(rpcUtils.GRPC_OPTION if options is None else options)
+        self.compression = grpc_compression(compression)
+        self.accept_encoding = check_encodings(payload_encoding)
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.limiter = limiter
+        self._channels = [None] * self.pool_size
+        self._stubs = [None] * self.pool_size
+        self._outstanding = [0] * self.pool_size
+        self._next = 0
+
+    def _pick(self) -> int:
+        # 第 index 个channel连接 addresses[index % 地址数]，轮询时相邻请求依次落到不同地址
+        index = self._next
+        self._next = (self._next + 1) % self.pool_size
+        if self.policy != POLICY_ROUND_ROBIN:
+            rotated = [(index + offset) % self.pool_size for offset in range(self.pool_size)]
+            index = min(rotated, key=lambda candidate: self._outstanding[candidate])
+        return index
+
+    def _stub(self, index: int):
+        if self._stubs[index] is None:
+            address = self.addresses[index % len(self.addresses)]
+            channel = aio.insecure_channel(address, options=_endpoint_options(address, self.options),
+                                           compression=self.compression)
+            self._channels[index] = channel
+            self._stubs[index] = RawMarketHistoryServiceStub(channel)
+        return self._stubs[index]
+
+    def stub(self):
+        """
+        按客户端的策略获取一个缓存的stub
+
+        :return: RawMarketHistoryServiceStub
+        """
+        return self._stub(self._pick())
+
+    async def _query_once(self, data_request, timeout: float, compression, hedged: bool = False):
+        if self.limiter is not None:
+            timeout = await wait_limiter_async(self.limiter, timeout, hedged)
+        index = self._pick()
+        call = self._stub(index).queryData(data_request, timeout=timeout, compression=compression)
+        self._outstanding[index] += 1
+        try:
+            response = await call
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        finally:
+            self._outstanding[index] -= 1
+        if self.limiter is not None:
+            self.limiter.record(response.ByteSize())
+        return response
+
+    async def query(self, data_request, timeout: float = None, compression: str = None):
+        """
+        发送queryData请求，按客户端的 RetryPolicy 设置超时、重试与对冲；调用方任务被取消时同时取消服务端的RPC
+
+        :param data_request: market_history_pb2.DataRequest
+        :param timeout: 单次尝试的超时时间(秒)，为空时使用 RetryPolicy 的 timeout
+        :param compression: 本次请求的gRPC压缩算法，为空时使用客户端设置
+        :return: market_history_pb2.RawDataReply
+        """
+        if self.accept_encoding and not data_request.accept_encoding:
+            request = type(data_request)()
+            request.CopyFrom(data_request)
+            request.accept_encoding = self.accept_encoding
+            data_request = request
+        compression = grpc_compression(compression)
+        start = lambda attempt_timeout, hedged=False: self._query_once(data_request, attempt_timeout, compression, hedged)
+        return await self.retry.call_async(start, ("queryData", data_request.type), timeout)
+
+    async def close(self):
+        """
+        关闭全部channel
+        """
+        channels = [channel for channel in self._channels if channel is not None]
+        self._channels = [None] * self.pool_size
+        self._stubs = [None] * self.pool_size
+        for channel in channels:
+            await channel.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+# 每个事件循环各自持有一个默认客户端
+_default_clients = weakref.WeakKeyDictionary()
+
+def get_default_client() -> AsyncMarketRpcClient:
+    """
+    获取当前事件循环的默认异步客户端，首次调用时创建；与同步默认客户端相同，设置环境变量 MARKETRPC_ENDPOINTS 时按其中的地址与
+    MARKETRPC_LB_POLICY 分配请求，否则使用 rpcUtils.GRPC_SERVER_ADDRESS
+
+    :return: AsyncMarketRpcClient
+    """
+    loop = asyncio.get_running_loop()
+    client = _default_clients.get(loop)
+    if client is None:
+        client = AsyncMarketRpcClient()
+        _default_clients[loop] = client
+    return client
+
+async def query_data(data_request, client: AsyncMarketRpcClient = None, debug: bool = False, output: str = OUTPUT_RECORDS,
+                     build_start: int = 0, timeout: float = None) -> list:
+    """
+    异步发送查询请求并解析结果
+
+    :param data_request: market_history_pb2.DataRequest
+    :param client: 异步行情客户端，为空时使用当前事件循环的默认客户端
+    :param debug: 是否打印请求内容
+    :param output: 输出格式，records / columns / numpy / pandas
+    :param build_start: 开始构造请求时 rpcMetrics.clock() 的值，用于统计构造请求的耗时
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
+    :return: [数据列表]
+    :raises grpc.RpcError: gRPC请求失败
+    """
+    check_output(output)
+    if debug:
+        logger.info(f"data_request - type: {data_request.type}, json_data: {data_request.jsonData}")
+
+    metrics = rpcMetrics.begin("queryData", data_request.type, build_start)
+    timerStartTimestamp = time.perf_counter_ns()
+
+    try:
+        response = await (client or get_default_client()).query(data_request, timeout=timeout)
+        timerEndTimestamp = time.perf_counter_ns()
+        logger.info(f"Time elapsed: {(timerEndTimestamp - timerStartTimestamp) / 1e9:.2f} seconds")
+        if metrics is not None:
+            metrics.rpc_ns = timerEndTimestamp - timerStartTimestamp
+            metrics.bytes = response.ByteSize()
+        result = parse_reply(response, output, data_request.type, metrics)
+    except grpc.RpcError as e:
+        logger.error(f"gRPC request failed with code {e.code()}: {e.details()}")
+        rpcMetrics.finish(metrics, e)
+        raise
+    except Exception as e:
+        rpcMetrics.finish(metrics, e)
+        raise
+
+    if metrics is not None:
+        metrics.rows = page_length(result[0], output) if result[0] is not None else 0
+        rpcMetrics.finish(metrics)
+    return result
+
+# 异步查询市场K线数据
+async def market_kline(
+    account_type: str,
+    symbol: str,
+    kline_interval_second: int,
+    start_time: any,
+    end_time: any,
+    start_id: int = 0,
+    end_id: int = 0,
+    schema: str = "BINANCE",
+    type: str = "KLINE",
+    limit: int = 10000,
+    exchange: str = "BINANCE",
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: AsyncMarketRpcClient = None,
+    output: str = "records",
+    timeout: float = None
+):
+    """
+    异步查询市场K线数据，参数与返回值同 rpcUtils.market_kline
+
+    :param client: 异步行情客户端，为空时使用当前事件循环的默认客户端
+    :param output: 输出格式，records / columns / numpy / pandas(default:records)
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
+    """
+    build_start = rpcMetrics.clock()
+    data_request = build_kline_request(
+        account_type, symbol, kline_interval_second, start_time, end_time, start_id, end_id,
+        schema, type, limit, exchange, is_asc, is_gzip, debug
+    )
+    return await query_data(data_request, client=client, debug=debug, output=output, build_start=build_start,
+                            timeout=timeout)
+
+# 异步查询市场成交流数据
+async def market_aggtrade(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    start_id: int = 0,
+    end_id: int = 0,
+    schema: str = "BINANCE",
+    type: str = "AGG_TRADE",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: AsyncMarketRpcClient = None,
+    output: str = "records",
+    timeout: float = None
+):
+    """
+    异步查询市场成交流数据，参数与返回值同 rpcUtils.market_aggtrade
+
+    :param client: 异步行情客户端，为空时使用当前事件循环的默认客户端
+    :param output: 输出格式，records / columns / numpy / pandas(default:records)
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
+    """
+    build_start = rpcMetrics.clock()
+    data_request = build_aggtrade_request(
+        exchange, account_type, symbol, start_time, end_time, start_id, end_id,
+        schema, type, limit, is_asc, is_gzip, debug
+    )
+    return await query_data(data_request, client=client, debug=debug, output=output, build_start=build_start,
+                            timeout=timeout)
+
+# 异步查询市场订单簿数据
+async def market_orderbook(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any = 0,
+    end_time: any = 0,
+    start_id: int = 0,
+    end_id: int = 0,
+    schema: str = "BINANCE",
+    type: str = "ORDER_BOOK",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: AsyncMarketRpcClient = None,
+    output: str = "records",
+    timeout: float = None
+):
+    """
+    异步查询市场订单簿数据，参数与返回值同 rpcUtils.market_orderbook
+
+    :param client: 异步行情客户端，为空时使用当前事件循环的默认客户端
+    :param output: 输出格式，records / columns / numpy / pandas(default:records)
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
+    """
+    build_start = rpcMetrics.clock()
+    data_request = build_orderbook_request(
+        exchange, account_type, symbol, start_time, end_time, start_id, end_id,
+        schema, type, limit, is_asc, is_gzip
+    )
+    return await query_data(data_request, client=client, debug=debug, output=output, build_start=build_start,
+                            timeout=timeout)
+
+async def _iter_pages(query, type: str, start_time: any, end_time: any, limit: int, is_asc: bool, prefetch: bool, kwargs: dict):
+    start_time = normalize_timestamp(start_time, "Start time")
+    end_time = normalize_timestamp(end_time, "End time")
+    if start_time > end_time:
+        raise ValueError("Start time must be less than or equal to end time.")
+    cursor = PageCursor(type, start_time, end_time, page_limit(limit, type), is_asc)
+    output = kwargs.get("output", OUTPUT_RECORDS)
+
+    async def fetch(start, end, page_size):
+        page = (await query(start_time=start, end_time=end, type=type, limit=page_size, is_asc=is_asc, **kwargs))[0]
+        return [] if page is None else page
+
+    pending = None
+    try:
+        while not cursor.done:
+            if pending is not None:
+                rows = await pending
+            else:
+                rows = await fetch(cursor.start_time, cursor.end_time, cursor.limit)
+            pending = None
+            rows = cursor.advance_page(rows, output)
+            cursor.limit = page_limit(limit, type)
+            # 在调用方处理当前页时预取下一页
+            if prefetch and not cursor.done:
+                pending = asyncio.ensure_future(fetch(cursor.start_time, cursor.end_time, cursor.limit))
+            if page_length(rows, output):
+                yield rows
+    finally:
+        # 提前退出或被取消时取消预取中的RPC
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+async def _iter_rows(page_iter):
+    async for rows in page_iter:
+        for row in rows:
+            yield row
+
+# 异步分页查询市场K线数据
+def iter_kline(
+    account_type: str,
+    symbol: str,
+    kline_interval_second: int,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "KLINE",
+    limit: int = 10000,
+    exchange: str = "BINANCE",
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: AsyncMarketRpcClient = None,
+    prefetch: bool = True,
+    pages: bool = False,
+    output: str = "records"
+):
+    """
+    异步按页遍历K线数据，参数同 rpcUtils.iter_kline
+
+    :return: 行数据(或每页行列表)的异步生成器
+    """
+    kwargs = dict(account_type=account_type, symbol=symbol, kline_interval_second=kline_interval_second,
+                  schema=schema, exchange=exchange, is_gzip=is_gzip, debug=debug, client=client, output=output)
+    page_iter = _iter_pages(market_kline, type, start_time, end_time, limit, is_asc, prefetch, kwargs)
+    return page_iter if pages or output != OUTPUT_RECORDS else _iter_rows(page_iter)
+
+# 异步分页查询市场成交流数据
+def iter_aggtrade(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "AGG_TRADE",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: AsyncMarketRpcClient = None,
+    prefetch: bool = True,
+    pages: bool = False,
+    output: str = "records"
+):
+    """
+    异步按页遍历成交流数据，参数同 rpcUtils.iter_aggtrade
+
+    :return: 行数据(或每页行列表)的异步生成器
+    """
+    kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                  schema=schema, is_gzip=is_gzip, debug=debug, client=client, output=output)
+    page_iter = _iter_pages(market_aggtrade, type, start_time, end_time, limit, is_asc, prefetch, kwargs)
+    return page_iter if pages or output != OUTPUT_RECORDS else _iter_rows(page_iter)
+
+# 异步分页查询市场订单簿数据
+def iter_orderbook(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "ORDER_BOOK",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: AsyncMarketRpcClient = None,
+    prefetch: bool = True,
+    pages: bool = False,
+    output: str = "records"
+):
+    """
+    异步按页遍历订单簿数据，参数同 rpcUtils.iter_orderbook
+
+    :return: 行数据(或每页行列表)的异步生成器
+    """
+    kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                  schema=schema, is_gzip=is_gzip, debug=debug, client=client, output=output)
+    page_iter = _iter_pages(market_orderbook, type, start_time, end_time, limit, is_asc, prefetch, kwargs)
+    return page_iter if pages or output != OUTPUT_RECORDS else _iter_rows(page_iter)
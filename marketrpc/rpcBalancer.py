@@ -0,0 +1,356 @@
+import os
+import time
+import logging
+import threading
+
+from .rpcLazy import lazy_import
+from .rpcClient import MarketRpcClient
+from .rpcRetry import RetryPolicy, RETRYABLE_CODES
+from .rpcCompress import grpc_compression
+from .rpcPacing import wait_limiter
+
+logger = logging.getLogger(__name__)
+
+grpc = lazy_import("grpc")
+
+# 环境变量：逗号分隔的服务地址列表与负载均衡策略
+ENV_ENDPOINTS = "MARKETRPC_ENDPOINTS"
+ENV_LB_POLICY = "MARKETRPC_LB_POLICY"
+
+POLICY_ROUND_ROBIN = "round_robin"
+POLICY_LEAST_OUTSTANDING = "least_outstanding"
+POLICIES = (POLICY_ROUND_ROBIN, POLICY_LEAST_OUTSTANDING)
+
+# 带解析方案前缀的地址(如 dns:///history.local:19999)由grpc解析为多个后端，并在channel内轮询
+RESOLVER_SCHEMES = ("dns:", "ipv4:", "ipv6:", "unix:")
+GRPC_ROUND_ROBIN_OPTION = [('grpc.lb_policy_name', 'round_robin')]
+
+
+def parse_endpoints(endpoints: any) -> list:
+    """
+    解析服务地址列表
+
+    :param endpoints: 逗号分隔的地址字符串，或地址列表
+    :return: 去重后的地址列表，保持原顺序
+    :raises ValueError: 地址为空
+    """
+    if isinstance(endpoints, str):
+        endpoints = endpoints.split(",")
+    addresses = []
+    for address in endpoints or []:
+        address = address.strip()
+        if address and address not in addresses:
+            addresses.append(address)
+    if not addresses:
+        raise ValueError("Endpoints cannot be empty.")
+    return addresses
+
+
+def _endpoint_options(address: str, options: list) -> list:
+    if address.startswith(RESOLVER_SCHEMES):
+        return list(GRPC_ROUND_ROBIN_OPTION) + list(options or [])
+    return list(options or [])
+
+
+def create_client(endpoints: any = None, policy: str = None, options: list = None, **kwargs):
+    """
+    按地址列表创建客户端：单个地址时为 MarketRpcClient，多个地址时为 BalancedRpcClient
+
+    :param endpoints: 地址字符串或列表，为空时读取环境变量 MARKETRPC_ENDPOINTS
+    :param policy: 负载均衡策略，为空时读取环境变量 MARKETRPC_LB_POLICY(default:round_robin)
+    :param options: channel参数
+    :param kwargs: 传给客户端构造函数的其他参数
+    :return: MarketRpcClient 或 BalancedRpcClient
+    :raises ValueError: 未指定地址
+    """
+    addresses = parse_endpoints(endpoints or os.environ.get(ENV_ENDPOINTS, ""))
+    if len(addresses) == 1:
+        return MarketRpcClient(addresses[0], options=_endpoint_options(addresses[0], options), **kwargs)
+    policy = policy or os.environ.get(ENV_LB_POLICY) or POLICY_ROUND_ROBIN
+    return BalancedRpcClient(addresses, policy=policy, options=options, **kwargs)
+
+
+class _Endpoint(object):
+    def __init__(self, address: str, client: MarketRpcClient):
+        self.address = address
+        self.client = client
+        self.outstanding = 0
+        self.failures = 0
+        self.latency = 0.0
+        self.samples = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.reason = ""
+
+
+class BalancedRpcClient(object):
+    """
+    多服务地址的行情客户端，接口与 MarketRpcClient 相同，可在多线程间共享
+
+    每次尝试按策略选择一个未被摘除的地址，重试与对冲请求因此会落到其他节点。连续失败 max_failures 次、
+    平均耗时超过其他节点中位数 slow_factor 倍、或健康检查连接失败的节点会被摘除 eject_seconds 秒，
+    再次摘除时时间加倍，最长 max_eject_seconds 秒；全部节点被摘除时使用最早恢复的节点。
+
+    :param endpoints: 地址字符串(逗号分隔)或列表
+    :param policy: 负载均衡策略 round_robin / least_outstanding(default:round_robin)
+    :param pool_size: 每个地址的channel数量(default:2)
+    :param options: channel参数，会与保活参数合并
+    :param compression: 请求的gRPC传输层压缩 none / gzip / deflate
+    :param payload_encoding: 可接受的响应负载压缩编码，含义同 MarketRpcClient
+    :param retry: 超时、重试与对冲策略，为空时使用 RetryPolicy 默认值
+    :param limiter: 请求限流 rpcPacing.RateLimiter，各节点共享同一份配额，每次尝试前等待(不超过本次尝试的超时)，为空时不限流
+    :param max_failures: 连续失败多少次后摘除节点(default:3)
+    :param eject_seconds: 首次摘除时间(秒)(default:30)
+    :param max_eject_seconds: 最长摘除时间(秒)(default:300)
+    :param slow_factor: 慢节点判定倍数，为空时不按耗时摘除(default:3)
+    :param min_samples: 按耗时判定慢节点所需的最少成功请求数(default:20)
+    :param health_interval: 健康检查间隔(秒)，为空时不做主动检查(default:10)
+    :param health_timeout: 健康检查的连接等待时间(秒)(default:1)
+    """
+
+    def __init__(self, endpoints: any, policy: str = POLICY_ROUND_ROBIN, pool_size: int = 2, options: list = None,
+                 compression: str = None, payload_encoding: any = None, retry: RetryPolicy = None,
+                 limiter=None, max_failures: int = 3, eject_seconds: float = 30.0, max_eject_seconds: float = 300.0,
+                 slow_factor: float = 3.0, min_samples: int = 20, health_interval: float = 10.0,
+                 health_timeout: float = 1.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Policy must be one of {', '.join(POLICIES)}.")
+        if max_failures <= 0:
+            raise ValueError("Max failures must be greater than 0.")
+        if eject_seconds <= 0 or max_eject_seconds < eject_seconds:
+            raise ValueError("Eject seconds must satisfy 0 < eject_seconds <= max_eject_seconds.")
+        addresses = parse_endpoints(endpoints)
+        self.address = ",".join(addresses)
+        self.policy = policy
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.limiter = limiter
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.slow_factor = slow_factor
+        self.min_samples = min_samples
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._endpoints = [
+            _Endpoint(address, MarketRpcClient(address, pool_size=pool_size, options=_endpoint_options(address, options),
+                                               compression=compression, payload_encoding=payload_encoding))
+            for address in addresses
+        ]
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stop = threading.Event()
+        self._health_thread = None
+        self._pid = os.getpid()
+
+    def _ensure_health_thread(self):
+        # 健康检查线程在首次请求时启动，fork后的子进程重新启动
+        if self.health_interval is None or self._stop.is_set():
+            return
+        if self._health_thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._health_thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._health_thread = threading.Thread(target=self._health_loop, name="marketrpc-health", daemon=True)
+                self._health_thread.start()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            for endpoint in self._endpoints:
+                if self._stop.is_set():
+                    return
+                try:
+                    ready = endpoint.client.wait_ready(self.health_timeout)
+                except ValueError:
+                    return
+                with self._lock:
+                    if ready and endpoint.reason == "unreachable" and endpoint.ejected_until > time.monotonic():
+                        logger.info(f"Endpoint {endpoint.address} reachable again, restoring")
+                        endpoint.ejected_until = 0.0
+                        endpoint.reason = ""
+                    elif not ready and endpoint.ejected_until <= time.monotonic():
+                        self._eject(endpoint, "unreachable")
+
+    def _eject(self, endpoint: _Endpoint, reason: str):
+        # 调用方需持有 self._lock
+        seconds = min(self.max_eject_seconds, self.eject_seconds * 2 ** endpoint.ejections)
+        endpoint.ejections += 1
+        endpoint.ejected_until = time.monotonic() + seconds
+        endpoint.failures = 0
+        endpoint.reason = reason
+        logger.warning(f"Endpoint {endpoint.address} ejected for {seconds:.0f} seconds: {reason}")
+
+    def _pick(self) -> _Endpoint:
+        self._ensure_health_thread()
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints if endpoint.ejected_until <= now]
+            if not candidates:
+                candidates = [min(self._endpoints, key=lambda endpoint: endpoint.ejected_until)]
+            offset = self._next % len(candidates)
+            self._next += 1
+            if self.policy == POLICY_LEAST_OUTSTANDING:
+                # 从轮询位置开始比较，请求数相同的节点之间仍然轮流分配
+                rotated = candidates[offset:] + candidates[:offset]
+                endpoint = min(rotated, key=lambda candidate: candidate.outstanding)
+            else:
+                endpoint = candidates[offset]
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _done(self, endpoint: _Endpoint, started: float, future, record_latency: bool = True):
+        # 在grpc回调线程中执行
+        elapsed = time.monotonic() - started
+        with self._lock:
+            endpoint.outstanding -= 1
+            if future.cancelled():
+                return
+            code = future.code()
+            if code == grpc.StatusCode.OK:
+                endpoint.failures = 0
+                endpoint.ejections = 0
+                if record_latency:
+                    self._record_latency(endpoint, elapsed)
+            elif code.name in RETRYABLE_CODES:
+                endpoint.failures += 1
+                if endpoint.failures >= self.max_failures and endpoint.ejected_until <= time.monotonic():
+                    self._eject(endpoint, f"{endpoint.failures} consecutive failures, last {code.name}")
+
+    def _record_latency(self, endpoint: _Endpoint, elapsed: float):
+        # 调用方需持有 self._lock；耗时为指数移动平均
+        endpoint.latency = elapsed if not endpoint.samples else 0.8 * endpoint.latency + 0.2 * elapsed
+        endpoint.samples += 1
+        if self.slow_factor is None or endpoint.samples < self.min_samples:
+            return
+        now = time.monotonic()
+        others = sorted(other.latency for other in self._endpoints
+                        if other is not endpoint and other.ejected_until <= now and other.samples >= self.min_samples)
+        if not others:
+            return
+        median = others[len(others) // 2]
+        if endpoint.latency > self.slow_factor * median:
+            self._eject(endpoint, f"average latency {endpoint.latency * 1000:.1f} ms, median {median * 1000:.1f} ms")
+            endpoint.samples = 0
+
+    def _record_bytes(self, future):
+        if not future.cancelled() and future.code() == grpc.StatusCode.OK:
+            self.limiter.record(future.result().ByteSize())
+
+    def _start(self, method: str, data_request, timeout: float, compression, hedged: bool = False):
+        # 在选择节点前等待限流配额，等待时间不计入节点耗时
+        if self.limiter is not None:
+            timeout = wait_limiter(self.limiter, timeout, hedged)
+        endpoint = self._pick()
+        started = time.monotonic()
+        try:
+            future = endpoint.client._start(method, data_request, timeout, compression)
+        except Exception:
+            with self._lock:
+                endpoint.outstanding -= 1
+            raise
+        future.add_done_callback(lambda f: self._done(endpoint, started, f))
+        if self.limiter is not None:
+            future.add_done_callback(self._record_bytes)
+        return future
+
+    def _call(self, method: str, data_request, timeout: float = None, compression: str = None):
+        data_request = self._endpoints[0].client._prepare(data_request)
+        compression = grpc_compression(compression)
+        start = lambda attempt_timeout, hedged=False: self._start(method, data_request, attempt_timeout, compression, hedged)
+        return self.retry.call(start, (method, data_request.type), timeout)
+
+    def query(self, data_request, timeout: float = None, compression: str = None):
+        """
+        发送queryData请求，按策略选择节点，超时、重试与对冲同 MarketRpcClient.query
+
+        :param data_request: market_history_pb2.DataRequest
+        :param timeout: 单次尝试的超时时间(秒)，为空时使用 RetryPolicy 的 timeout
+        :param compression: 本次请求的gRPC压缩算法，为空时使用客户端设置
+        :return: market_history_pb2.RawDataReply
+        """
+        return self._call("queryData", data_request, timeout, compression)
+
+    def query_batch(self, data_request, timeout: float = None, compression: str = None):
+        """
+        发送queryBatch请求，按策略选择节点
+
+        :param data_request: market_history_pb2.DataRequest
+        :param timeout: 单次尝试的超时时间(秒)，为空时使用 RetryPolicy 的 timeout
+        :param compression: 本次请求的gRPC压缩算法，为空时使用客户端设置
+        :return: market_history_pb2.BatchReply
+        :raises grpc.RpcError: 服务端不支持时状态码为 UNIMPLEMENTED
+        """
+        return self._call("queryBatch", data_request, timeout, compression)
+
+    def stream(self, data_request, timeout: float = None):
+        """
+        发送streamData请求，按策略选择节点，不做重试
+
+        :param data_request: market_history_pb2.DataRequest
+        :param timeout: 整个流的超时时间(秒)
+        :return: RawDataReply 迭代器，可调用 cancel() 提前结束
+        """
+        if self.limiter is not None:
+            timeout = wait_limiter(self.limiter, timeout)
+        endpoint = self._pick()
+        started = time.monotonic()
+        try:
+            call = endpoint.client.stream(data_request, timeout=timeout)
+        except Exception:
+            with self._lock:
+                endpoint.outstanding -= 1
+            raise
+        call.add_done_callback(lambda f: self._done(endpoint, started, f, record_latency=False))
+        return call
+
+    def stub(self):
+        """
+        按策略选择节点并获取一个缓存的stub，不统计请求数
+
+        :return: RawMarketHistoryServiceStub
+        """
+        endpoint = self._pick()
+        with self._lock:
+            endpoint.outstanding -= 1
+        return endpoint.client.stub()
+
+    def status(self) -> list:
+        """
+        各节点状态
+
+        :return: [{"address", "outstanding", "failures", "latency_ms", "samples", "ejected", "reason"}]
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "address": endpoint.address,
+                "outstanding": endpoint.outstanding,
+                "failures": endpoint.failures,
+                "latency_ms": round(endpoint.latency * 1000, 3),
+                "samples": endpoint.samples,
+                "ejected": endpoint.ejected_until > now,
+                "reason": endpoint.reason if endpoint.ejected_until > now else "",
+            } for endpoint in self._endpoints]
+
+    def reset(self, index: int = None):
+        """
+        关闭并重建全部节点的channel
+
+        :param index: channel序号，为空时重建全部
+        """
+        for endpoint in self._endpoints:
+            endpoint.client.reset(index)
+
+    def close(self):
+        """
+        停止健康检查并关闭全部channel
+        """
+        self._stop.set()
+        for endpoint in self._endpoints:
+            endpoint.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,244 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .rpcUtils import (OUTPUT_RECORDS, get_default_client, normalize_timestamp, page_length,
+                       iter_kline, iter_aggtrade, iter_orderbook)
+from .rpcColumns import concat_columns
+
+logger = logging.getLogger(__name__)
+
+# 分页遍历函数对应的默认数据类型
+_ITER_TYPES = {iter_kline: "KLINE", iter_aggtrade: "AGG_TRADE", iter_orderbook: "ORDER_BOOK"}
+
+
+class _CountingClient(object):
+    # 共享底层客户端的channel，只统计经由本对象收到的响应字节数
+    def __init__(self, client):
+        self.client = client
+        self.bytes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def query(self, data_request, **kwargs):
+        response = self.client.query(data_request, **kwargs)
+        self.bytes += response.ByteSize()
+        return response
+
+    def query_batch(self, data_request, **kwargs):
+        response = self.client.query_batch(data_request, **kwargs)
+        self.bytes += response.ByteSize()
+        return response
+
+
+def _as_list(value) -> list:
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def iter_batch(
+    iter_func,
+    tasks: dict,
+    start_time: any,
+    end_time: any,
+    max_workers: int = 8,
+    max_bytes: int = None,
+    max_retries: int = 2,
+    **kwargs
+):
+    """
+    在线程池中并发拉取多组相同时间范围的数据，每组完成后立即产出
+
+    所有请求共用同一个客户端的长连接。已完成但调用方尚未取走的结果超过 max_bytes 时暂停发起新的请求，
+    已在进行中的请求不受影响。全部任务结束后如仍有失败的任务则抛出异常。
+
+    :param iter_func: 分页遍历函数，iter_kline / iter_aggtrade / iter_orderbook
+    :param tasks: 任务键到 iter_func 参数的映射，如 {"btcusdt": {"symbol": "btcusdt"}}
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param max_workers: 最大并发请求数(default:8)
+    :param max_bytes: 未取走结果的响应字节数上限，为空时不限制
+    :param max_retries: 失败任务的最大重试次数(default:2)
+    :param kwargs: 透传给 iter_func 的公共参数，output 非 records 时各页列式数据按顺序拼接
+    :return: (任务键, [数据列表]) 生成器，按完成顺序产出
+    :raises RuntimeError: 存在重试后仍失败的任务
+    """
+    if max_workers <= 0:
+        raise ValueError("Max workers must be greater than 0.")
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError("Max bytes must be greater than 0.")
+    start_time = normalize_timestamp(start_time, "Start time")
+    end_time = normalize_timestamp(end_time, "End time")
+    if start_time > end_time:
+        raise ValueError("Start time must be less than or equal to end time.")
+    client = kwargs.pop("client", None) or get_default_client()
+    output = kwargs.get("output", OUTPUT_RECORDS)
+    type = kwargs.get("type") or _ITER_TYPES.get(iter_func, "")
+
+    def fetch(key):
+        counting = _CountingClient(client)
+        timer_start = time.perf_counter()
+        pages = list(iter_func(start_time=start_time, end_time=end_time, prefetch=False, pages=True,
+                               client=counting, **dict(kwargs, **tasks[key])))
+        if output == OUTPUT_RECORDS:
+            data = [row for rows in pages for row in rows]
+        else:
+            data = concat_columns(pages, type, output)
+        rows = sum(page_length(page, output) for page in pages)
+        logger.info(f"Batch {key}: {rows} rows, {counting.bytes} bytes in {time.perf_counter() - timer_start:.2f} seconds")
+        with lock:
+            budget["buffered"] += counting.bytes
+        return [data], counting.bytes
+
+    pending = list(tasks.keys())
+    attempts = dict.fromkeys(pending, 0)
+    errors = {}
+    running = {}
+    # 已完成但尚未产出的结果字节数，由工作线程累加
+    lock = threading.Lock()
+    budget = {"buffered": 0}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while pending or running:
+                # 缓冲超出预算时只等待进行中的请求，不再发起新请求
+                while pending and len(running) < max_workers and (max_bytes is None or budget["buffered"] < max_bytes):
+                    key = pending.pop(0)
+                    attempts[key] += 1
+                    running[executor.submit(fetch, key)] = key
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        result, size = future.result()
+                    except Exception as e:
+                        if attempts[key] <= max_retries:
+                            logger.warning(f"Batch {key} failed on attempt {attempts[key]}: {e}")
+                            pending.append(key)
+                        else:
+                            errors[key] = repr(e)
+                        continue
+                    try:
+                        yield key, result
+                    finally:
+                        with lock:
+                            budget["buffered"] -= size
+        finally:
+            for future in running:
+                future.cancel()
+
+    if errors:
+        raise RuntimeError(f"Failed to fetch {len(errors)} batch task(s) after {max_retries + 1} attempts: "
+                           + ", ".join(f"{key}: {error}" for key, error in errors.items()))
+
+
+def batch_query(iter_func, tasks: dict, start_time: any, end_time: any, stream: bool = False, **kwargs):
+    """
+    并发拉取多组数据，参数含义同 iter_batch
+
+    :param stream: 为True时返回按完成顺序产出 (任务键, [数据列表]) 的生成器，否则等待全部完成后返回字典
+    :return: {任务键: [数据列表]}，顺序与 tasks 一致；stream 为True时返回生成器
+    """
+    results = iter_batch(iter_func, tasks, start_time, end_time, **kwargs)
+    if stream:
+        return results
+    # 全部结果保留在内存中，max_bytes 此时只约束拉取过程中的缓冲
+    completed = dict(results)
+    return {key: completed[key] for key in tasks}
+
+
+# 批量查询多个交易对的市场K线数据
+def batch_kline(
+    account_type: any,
+    symbols: list,
+    kline_interval_second: any,
+    start_time: any,
+    end_time: any,
+    max_workers: int = 8,
+    max_bytes: int = None,
+    max_retries: int = 2,
+    stream: bool = False,
+    **kwargs
+):
+    """
+    并发查询多个交易对同一时间范围的全部K线数据，其余参数含义同 market_kline 与 iter_batch
+
+    :param account_type: 账户类型，可传入列表同时查询多个账户类型
+    :param symbols: 交易对列表，如 ["btcusdt", "ethusdt"] 或A股代码 ["000001", "600519"]
+    :param kline_interval_second: K线时间间隔，可传入列表同时查询多个间隔
+    :param stream: 为True时按完成顺序产出 (键, [数据列表])
+    :return: {交易对: [数据列表]}；account_type 或 kline_interval_second 为列表时键为 (账户类型, 交易对, 时间间隔)
+    """
+    multi = isinstance(account_type, (list, tuple, set)) or isinstance(kline_interval_second, (list, tuple, set))
+    tasks = {}
+    for account in _as_list(account_type):
+        for symbol in symbols:
+            for interval in _as_list(kline_interval_second):
+                key = (account, symbol, interval) if multi else symbol
+                tasks[key] = dict(account_type=account, symbol=symbol, kline_interval_second=interval)
+    return batch_query(iter_kline, tasks, start_time, end_time, stream=stream, max_workers=max_workers,
+                       max_bytes=max_bytes, max_retries=max_retries, **kwargs)
+
+
+# 批量查询多个交易对的市场成交流数据
+def batch_aggtrade(
+    exchange: str,
+    account_type: any,
+    symbols: list,
+    start_time: any,
+    end_time: any,
+    max_workers: int = 8,
+    max_bytes: int = None,
+    max_retries: int = 2,
+    stream: bool = False,
+    **kwargs
+):
+    """
+    并发查询多个交易对同一时间范围的全部成交流数据，其余参数含义同 market_aggtrade 与 iter_batch
+
+    :param account_type: 账户类型，可传入列表同时查询多个账户类型
+    :param symbols: 交易对列表
+    :param stream: 为True时按完成顺序产出 (键, [数据列表])
+    :return: {交易对: [数据列表]}；account_type 为列表时键为 (账户类型, 交易对)
+    """
+    multi = isinstance(account_type, (list, tuple, set))
+    tasks = {}
+    for account in _as_list(account_type):
+        for symbol in symbols:
+            key = (account, symbol) if multi else symbol
+            tasks[key] = dict(exchange=exchange, account_type=account, symbol=symbol)
+    return batch_query(iter_aggtrade, tasks, start_time, end_time, stream=stream, max_workers=max_workers,
+                       max_bytes=max_bytes, max_retries=max_retries, **kwargs)
+
+
+# 批量查询多个交易对的市场订单簿数据
+def batch_orderbook(
+    exchange: str,
+    account_type: any,
+    symbols: list,
+    start_time: any,
+    end_time: any,
+    max_workers: int = 8,
+    max_bytes: int = None,
+    max_retries: int = 2,
+    stream: bool = False,
+    **kwargs
+):
+    """
+    并发查询多个交易对同一时间范围的全部订单簿数据，其余参数含义同 market_orderbook 与 iter_batch
+
+    :param account_type: 账户类型，可传入列表同时查询多个账户类型
+    :param symbols: 交易对列表
+    :param stream: 为True时按完成顺序产出 (键, [数据列表])
+    :return: {交易对: [数据列表]}；account_type 为列表时键为 (账户类型, 交易对)
+    """
+    multi = isinstance(account_type, (list, tuple, set))
+    tasks = {}
+    for account in _as_list(account_type):
+        for symbol in symbols:
+            key = (account, symbol) if multi else symbol
+            tasks[key] = dict(exchange=exchange, account_type=account, symbol=symbol)
+    return batch_query(iter_orderbook, tasks, start_time, end_time, stream=stream, max_workers=max_workers,
+                       max_bytes=max_bytes, max_retries=max_retries, **kwargs)
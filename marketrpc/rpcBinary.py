@@ -0,0 +1,174 @@
+import time
+from array import array
+
+from .rpcLazy import lazy_import
+from .rpcTime import SHANGHAI_OFFSET_SECONDS
+from .rpcColumns import (OUTPUT_RECORDS, OUTPUT_COLUMNS, OUTPUT_NUMPY, OUTPUT_BOOK, COLUMN_SCHEMAS, _ARRAY_CODES,
+                         _NUMPY_DTYPES, to_output_pandas)
+
+market_history_pb2 = lazy_import(".market_history_pb2", __package__)
+
+# 各数据类型对应的 BatchReply 字段，以及列名到批量消息字段的映射，顺序与JSON行字段一致
+BATCH_FIELDS = {
+    "KLINE": ("kline", {
+        "Timestamp": "timestamp",
+        "IntervalSecond": "interval_second",
+        "Open": "open",
+        "High": "high",
+        "Low": "low",
+        "Close": "close",
+        "Volume": "volume",
+        "EndTimestamp": "end_timestamp",
+        "TransactionNumber": "transaction_number",
+        "TransactionVolume": "transaction_volume",
+        "BuyTransactionVolume": "buy_transaction_volume",
+        "BuyTransactionAmount": "buy_transaction_amount",
+        "StartId": "start_id",
+        "EndId": "end_id",
+    }),
+    "AGG_TRADE": ("agg_trade", {
+        "Timestamp": "timestamp",
+        "AId": "a_id",
+        "First": "first",
+        "Last": "last",
+        "Price": "price",
+        "Quantity": "quantity",
+        "IsBuyer": "is_buyer",
+    }),
+    "ORDER_BOOK": ("order_book", {
+        "Timestamp": "timestamp",
+        "UId": "u_id",
+        "PreUId": "pre_u_id",
+    }),
+}
+
+# 订单簿档位列及其在 OrderBookBatch 中的 (档位数, 价格, 数量) 字段
+BOOK_SIDES = {
+    "Bids": ("bid_depth", "bid_price", "bid_quantity"),
+    "Asks": ("ask_depth", "ask_price", "ask_quantity"),
+}
+
+
+
+def batch_supported(type: str) -> bool:
+    """
+    数据类型是否有对应的类型化批量消息
+
+    :param type: 数据类型
+    :return: 是否支持
+    """
+    return (type or "").upper() in BATCH_FIELDS
+
+
+def _format_times(timestamps) -> list:
+    # 与服务端JSON中的 Time 字段一致，为秒级精度的上海时间；相邻行常在同一秒内，复用上一次的结果
+    times = []
+    last_second = None
+    text = None
+    for timestamp in timestamps:
+        second = timestamp // 1000
+        if second != last_second:
+            text = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(second + SHANGHAI_OFFSET_SECONDS))
+            last_second = second
+        times.append(text)
+    return times
+
+
+def _book_levels(depths, prices, quantities) -> list:
+    levels = []
+    position = 0
+    for depth in depths:
+        levels.append([[prices[i], quantities[i]] for i in range(position, position + depth)])
+        position += depth
+    return levels
+
+
+def encode_batch(rows: list, type: str, **reply_fields):
+    """
+    将行字典列表编码为 BatchReply，供服务端与测试使用
+
+    :param rows: 行字典列表
+    :param type: 数据类型，KLINE / AGG_TRADE / ORDER_BOOK
+    :param reply_fields: BatchReply 的其他字段，如 code、msg
+    :return: market_history_pb2.BatchReply
+    :raises ValueError: 不支持的数据类型
+    """
+    type = type.upper()
+    if type not in BATCH_FIELDS:
+        raise ValueError(f"Type must be one of {', '.join(BATCH_FIELDS)}.")
+    field, names = BATCH_FIELDS[type]
+    values = {proto_name: [row[name] for row in rows] for name, proto_name in names.items()}
+    if type == "ORDER_BOOK":
+        for name, (depth_field, price_field, quantity_field) in BOOK_SIDES.items():
+            levels = [row.get(name) or [] for row in rows]
+            values[depth_field] = [len(side) for side in levels]
+            values[price_field] = [float(level[0]) for side in levels for level in side]
+            values[quantity_field] = [float(level[1]) for side in levels for level in side]
+    reply_fields.setdefault("success", True)
+    reply = market_history_pb2.BatchReply(type=type, **reply_fields)
+    batch = getattr(reply, field)
+    # 空页也要设置 oneof，客户端据此判断数据类型
+    batch.SetInParent()
+    for proto_name, column in values.items():
+        getattr(batch, proto_name).extend(column)
+    return reply
+
+
+def decode_batch(response, type: str = None, output: str = OUTPUT_RECORDS):
+    """
+    将 BatchReply 解析为与JSON路径相同结构的数据；整数列(含 BuyTransactionAmount 等计数)为 int，
+    订单簿档位价格与数量为 float(JSON中为十进制字符串)
+
+    :param response: market_history_pb2.BatchReply
+    :param type: 数据类型，为空时使用响应中的类型
+    :param output: 输出格式，records / columns / numpy / pandas / book
+    :return: 对应格式的数据
+    :raises ValueError: 服务端返回失败或响应中没有对应类型的数据
+    """
+    if not response.success:
+        raise ValueError(f"Server returned error {response.code}: {response.msg}")
+    type = (type or response.type).upper()
+    if type not in BATCH_FIELDS:
+        raise ValueError(f"Type must be one of {', '.join(BATCH_FIELDS)}.")
+    field, names = BATCH_FIELDS[type]
+    if response.WhichOneof("batch") not in (field, None):
+        raise ValueError(f"Batch reply does not contain {type} data.")
+    batch = getattr(response, field)
+    if output == OUTPUT_BOOK:
+        if type != "ORDER_BOOK":
+            raise ValueError(f"Output '{OUTPUT_BOOK}' is only supported for ORDER_BOOK.")
+        # 平铺的档位数组直接写入三维数组，不生成嵌套列表
+        from .rpcOrderbook import OrderBookFrame
+        return OrderBookFrame.from_batch(batch)
+    schema = COLUMN_SCHEMAS[type]
+    timestamps = batch.timestamp
+
+    if output == OUTPUT_RECORDS:
+        columns = {"Time": _format_times(timestamps)}
+        for name, proto_name in names.items():
+            columns[name] = list(getattr(batch, proto_name))
+    elif output == OUTPUT_COLUMNS:
+        columns = {"Time": _format_times(timestamps)}
+        for name, proto_name in names.items():
+            columns[name] = array(_ARRAY_CODES[schema[name]], getattr(batch, proto_name))
+    else:
+        import numpy as np
+        arrays = {"Time": np.empty(len(timestamps), dtype=object)}
+        arrays["Time"][:] = _format_times(timestamps)
+        for name, proto_name in names.items():
+            values = getattr(batch, proto_name)
+            kind = schema[name]
+            arrays[name] = np.fromiter(values, dtype=np.bool_ if kind == "bool" else _NUMPY_DTYPES[kind], count=len(values))
+        if type == "ORDER_BOOK":
+            for name, fields in BOOK_SIDES.items():
+                arrays[name] = np.empty(len(timestamps), dtype=object)
+                arrays[name][:] = _book_levels(*[getattr(batch, proto_name) for proto_name in fields])
+        return arrays if output == OUTPUT_NUMPY else to_output_pandas(arrays)
+
+    if type == "ORDER_BOOK":
+        for name, fields in BOOK_SIDES.items():
+            columns[name] = _book_levels(*[list(getattr(batch, proto_name)) for proto_name in fields])
+    if output == OUTPUT_COLUMNS:
+        return columns
+    names = list(columns.keys())
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
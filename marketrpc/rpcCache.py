@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from .rpcColumns import OUTPUT_NUMPY, concat_columns, from_numpy
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "catalog.json"
+
+
+def _remove_dir(path: str):
+    # shutil 仅在淘汰或清空缓存时导入
+    import shutil
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class MarketDataCache(object):
+    """
+    历史行情本地磁盘缓存
+
+    按 (服务地址, schema, exchange, account_type, symbol, type, interval) 分目录保存已拉取的时间段，不同服务(如测试与生产环境)的数据互不混用，每段数据按列保存为
+    .npy 文件(对象列保存为 .json)，命中时以内存映射方式读取；查询时只向服务端请求未覆盖的时间段。
+    结束时间晚于 now - settle_ms 的部分视为尚未收盘，照常拉取但不写入缓存。
+    同一缓存目录只应由一个进程使用。
+
+    :param root: 缓存根目录
+    :param max_bytes: 缓存大小上限，超出后按最近最少使用淘汰(default:10GB)
+    :param settle_ms: 数据落定所需的时间(毫秒)(default:60000)
+    """
+
+    def __init__(self, root: str, max_bytes: int = 10 * 1024 ** 3, settle_ms: int = 60 * 1000):
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError("MarketDataCache requires numpy to be installed.") from e
+        if max_bytes <= 0:
+            raise ValueError("Max bytes must be greater than 0.")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.settle_ms = settle_ms
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._chunks = self._load_catalog()
+
+    def _load_catalog(self) -> list:
+        path = os.path.join(self.root, CATALOG_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            chunks = json.load(f)
+        # 丢弃目录已丢失的数据段，空数据段没有目录
+        return [chunk for chunk in chunks
+                if chunk["rows"] == 0 or os.path.isdir(os.path.join(self.root, chunk["path"]))]
+
+    def _save_catalog(self):
+        path = os.path.join(self.root, CATALOG_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._chunks, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _key_dir(key: tuple) -> str:
+        # 服务地址中的 ':' 在部分文件系统上不能用作目录名
+        return os.path.join(*[str(part).replace(os.sep, "_").replace(":", "_") or "_" for part in key])
+
+    @property
+    def size(self) -> int:
+        """
+        当前缓存占用的字节数
+        """
+        with self._lock:
+            return sum(chunk["bytes"] for chunk in self._chunks)
+
+    def coverage(self, key: tuple) -> list:
+        """
+        已缓存的时间段
+
+        :param key: 缓存键
+        :return: [(开始时间戳, 结束时间戳), ...]，已合并相邻时间段
+        """
+        key_dir = self._key_dir(key)
+        with self._lock:
+            ranges = sorted((chunk["start"], chunk["end"]) for chunk in self._chunks if chunk["key"] == key_dir)
+        merged = []
+        for lower, upper in ranges:
+            if merged and lower <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], upper))
+            else:
+                merged.append((lower, upper))
+        return merged
+
+    def _plan(self, key_dir: str, start_time: int, end_time: int, cacheable_end: int) -> list:
+        # 按时间升序返回 ("chunk", 数据段, 开始, 结束) / ("gap", None, 开始, 结束) / ("live", None, 开始, 结束)
+        chunks = sorted((chunk for chunk in self._chunks
+                         if chunk["key"] == key_dir and chunk["end"] >= start_time and chunk["start"] <= cacheable_end),
+                        key=lambda chunk: chunk["start"])
+        segments = []
+        position = start_time
+        for chunk in chunks:
+            # 数据段之间可能重叠，每个时间点只从一个数据段读取
+            lower = max(chunk["start"], position)
+            upper = min(chunk["end"], cacheable_end)
+            if lower > upper:
+                continue
+            if lower > position:
+                segments.append(("gap", None, position, lower - 1))
+            segments.append(("chunk", chunk, lower, upper))
+            position = upper + 1
+        if position <= cacheable_end:
+            segments.append(("gap", None, position, cacheable_end))
+        if cacheable_end < end_time:
+            segments.append(("live", None, max(start_time, cacheable_end + 1), end_time))
+        return segments
+
+    def _read(self, chunk: dict, lower: int, upper: int) -> dict:
+        import numpy as np
+        chunk["atime"] = time.time()
+        if chunk["rows"] == 0:
+            return {}
+        path = os.path.join(self.root, chunk["path"])
+        arrays = {}
+        for name in chunk["columns"]:
+            file = os.path.join(path, name)
+            if os.path.exists(f"{file}.npy"):
+                arrays[name] = np.load(f"{file}.npy", mmap_mode="r")
+            else:
+                with open(f"{file}.json", "r") as f:
+                    values = np.empty(chunk["rows"], dtype=object)
+                    values[:] = json.load(f)
+                    arrays[name] = values
+        timestamps = arrays["Timestamp"]
+        begin = int(np.searchsorted(timestamps, lower, side="left"))
+        stop = int(np.searchsorted(timestamps, upper, side="right"))
+        return {name: values[begin:stop] for name, values in arrays.items()}
+
+    def _store(self, key_dir: str, lower: int, upper: int, arrays: dict):
+        import numpy as np
+        rows = len(arrays["Timestamp"]) if arrays else 0
+        chunk = {
+            "key": key_dir,
+            "path": None,
+            "start": lower,
+            "end": upper,
+            "rows": rows,
+            "columns": list(arrays.keys()),
+            "bytes": 0,
+            "atime": time.time(),
+        }
+        if rows:
+            chunk["path"] = os.path.join(key_dir, f"{lower}-{upper}-{os.urandom(4).hex()}")
+            path = os.path.join(self.root, chunk["path"])
+            os.makedirs(path, exist_ok=True)
+            for name, values in arrays.items():
+                file = os.path.join(path, name)
+                if values.dtype == object:
+                    with open(f"{file}.json", "w") as f:
+                        json.dump(values.tolist(), f)
+                    chunk["bytes"] += os.path.getsize(f"{file}.json")
+                else:
+                    np.save(f"{file}.npy", np.ascontiguousarray(values))
+                    chunk["bytes"] += os.path.getsize(f"{file}.npy")
+        with self._lock:
+            self._chunks.append(chunk)
+            self._evict(keep=chunk)
+            self._save_catalog()
+
+    def _evict(self, keep: dict = None):
+        total = sum(chunk["bytes"] for chunk in self._chunks)
+        if total <= self.max_bytes:
+            return
+        for chunk in sorted(self._chunks, key=lambda chunk: chunk["atime"]):
+            if total <= self.max_bytes:
+                break
+            if chunk is keep or not chunk["bytes"]:
+                continue
+            self._chunks.remove(chunk)
+            _remove_dir(os.path.join(self.root, chunk["path"]))
+            total -= chunk["bytes"]
+            logger.info(f"Evicted cache chunk {chunk['path']} ({chunk['bytes']} bytes)")
+
+    def _fetch(self, fetch, type: str, lower: int, upper: int, is_asc: bool, remaining: int = None):
+        # 拉取 [lower, upper]，达到 remaining 行后提前结束；返回 (查询顺序的数据, 用于写入的升序数据, 完整覆盖的时间段)
+        pages = []
+        count = 0
+        complete = True
+        for page in fetch(lower, upper, is_asc):
+            pages.append(page)
+            count += len(page["Timestamp"])
+            if remaining is not None and count >= remaining:
+                complete = False
+                break
+        arrays = concat_columns(pages, type, OUTPUT_NUMPY)
+        ascending = arrays if is_asc else {name: values[::-1] for name, values in arrays.items()}
+        covered = (lower, upper)
+        if not complete:
+            # 提前结束时最后一个时间戳的数据可能不完整，不计入覆盖范围
+            boundary = int(arrays["Timestamp"][-1])
+            keep = ascending["Timestamp"] != boundary
+            ascending = {name: values[keep] for name, values in ascending.items()}
+            covered = (lower, boundary - 1) if is_asc else (boundary + 1, upper)
+        return arrays, ascending, covered
+
+    def query(self, key: tuple, start_time: int, end_time: int, fetch, limit: int = None,
+              is_asc: bool = True, output: str = "records"):
+        """
+        查询 [start_time, end_time] 内的数据，缓存未覆盖的部分通过 fetch 拉取并写入缓存
+
+        :param key: 缓存键 (服务地址, schema, exchange, account_type, symbol, type, interval)
+        :param start_time: 开始毫秒时间戳
+        :param end_time: 结束毫秒时间戳
+        :param fetch: fetch(开始, 结束, 是否升序)，返回 numpy 格式的分页迭代器
+        :param limit: 最多返回的行数，为空时返回全部
+        :param is_asc: 是否升序排列
+        :param output: 输出格式，records / columns / numpy / pandas
+        :return: 对应格式的数据
+        """
+        type = key[5]
+        key_dir = self._key_dir(key)
+        cacheable_end = min(end_time, int(time.time() * 1000) - self.settle_ms)
+        with self._lock:
+            segments = self._plan(key_dir, start_time, end_time, cacheable_end)
+        if not is_asc:
+            segments.reverse()
+
+        pages = []
+        count = 0
+        for kind, chunk, lower, upper in segments:
+            remaining = None if limit is None else limit - count
+            if remaining is not None and remaining <= 0:
+                break
+            if kind == "chunk":
+                arrays = self._read(chunk, lower, upper)
+                if arrays and not is_asc:
+                    arrays = {name: values[::-1] for name, values in arrays.items()}
+            else:
+                arrays, stored, covered = self._fetch(fetch, type, lower, upper, is_asc, remaining)
+                if kind == "gap" and covered[0] <= covered[1]:
+                    self._store(key_dir, covered[0], covered[1], stored)
+            if arrays:
+                pages.append(arrays)
+                count += len(arrays["Timestamp"])
+
+        with self._lock:
+            self._save_catalog()
+        arrays = pages[0] if len(pages) == 1 else concat_columns(pages, type, OUTPUT_NUMPY)
+        if limit is not None and arrays:
+            arrays = {name: values[:limit] for name, values in arrays.items()}
+        return from_numpy(arrays, type, output)
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            for chunk in self._chunks:
+                if chunk["path"]:
+                    _remove_dir(os.path.join(self.root, chunk["path"]))
+            self._chunks = []
+            self._save_catalog()
@@ -0,0 +1,237 @@
+import os
+import logging
+import threading
+
+from .rpcLazy import lazy_import
+from .rpcCompress import grpc_compression, check_encodings
+from .rpcRetry import RetryPolicy
+from .rpcPacing import wait_limiter
+
+logger = logging.getLogger(__name__)
+
+# grpc 与 protobuf 生成模块在首次创建channel或请求时才导入
+grpc = lazy_import("grpc")
+market_history_pb2 = lazy_import(".market_history_pb2", __package__)
+
+# 长连接保活参数，避免空闲连接被中间设备断开后首个请求失败
+GRPC_KEEPALIVE_OPTION = [
+    ('grpc.keepalive_time_ms', 30 * 1000),
+    ('grpc.keepalive_timeout_ms', 10 * 1000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.initial_reconnect_backoff_ms', 200),
+    ('grpc.max_reconnect_backoff_ms', 5 * 1000),
+]
+
+
+class RawMarketHistoryServiceStub(object):
+    """
+    与 MarketHistoryServiceStub 调用方式相同，响应按 RawDataReply 解析，jsonData 为原始UTF-8字节，
+    省去protobuf的UTF-8校验与str拷贝，可直接交给JSON解析器
+    """
+
+    def __init__(self, channel):
+        self.queryData = channel.unary_unary(
+            '/market_history.MarketHistoryService/queryData',
+            request_serializer=market_history_pb2.DataRequest.SerializeToString,
+            response_deserializer=market_history_pb2.RawDataReply.FromString)
+        self.streamData = channel.unary_stream(
+            '/market_history.MarketHistoryService/streamData',
+            request_serializer=market_history_pb2.DataRequest.SerializeToString,
+            response_deserializer=market_history_pb2.RawDataReply.FromString)
+        self.queryBatch = channel.unary_unary(
+            '/market_history.MarketHistoryService/queryBatch',
+            request_serializer=market_history_pb2.DataRequest.SerializeToString,
+            response_deserializer=market_history_pb2.BatchReply.FromString)
+
+
+class MarketRpcClient(object):
+    """
+    行情gRPC客户端，持有一组长连接channel及其stub，可在多线程间共享
+
+    :param address: 服务地址，如 '10.100.52.41:19999'
+    :param pool_size: channel数量，请求按轮询方式分配(default:4)
+    :param options: channel参数，会与保活参数合并
+    :param compression: 请求的gRPC传输层压缩 none / gzip / deflate，响应是否压缩由服务端决定
+    :param payload_encoding: 可接受的响应负载压缩编码，如 "zstd" 或 ["lz4", "gzip"]，请求未指定时使用
+    :param retry: query / query_batch 的超时、重试与对冲策略，为空时使用 RetryPolicy 默认值
+    :param limiter: 请求限流 rpcPacing.RateLimiter，每次尝试前等待配额(不超过本次尝试的超时)，为空时不限流
+    """
+
+    def __init__(self, address: str, pool_size: int = 4, options: list = None, compression: str = None,
+                 payload_encoding: any = None, retry: RetryPolicy = None, limiter=None):
+        if not address:
+            raise ValueError("Address cannot be empty.")
+        if pool_size <= 0:
+            raise ValueError("Pool size must be greater than 0.")
+        self.address = address
+        self.pool_size = pool_size
+        self.options = list(GRPC_KEEPALIVE_OPTION) + list(options or [])
+        self.compression = grpc_compression(compression)
+        self.accept_encoding = check_encodings(payload_encoding)
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._channels = [None] * pool_size
+        self._stubs = [None] * pool_size
+        self._next = 0
+        self._broken = set()
+        self._pid = os.getpid()
+        self._closed = False
+
+    def _open(self, index: int):
+        channel = grpc.insecure_channel(self.address, options=self.options, compression=self.compression)
+        self._channels[index] = channel
+        self._stubs[index] = RawMarketHistoryServiceStub(channel)
+
+    def _acquire(self):
+        with self._lock:
+            if self._closed:
+                raise ValueError("Client is closed.")
+            # fork后的子进程不能复用父进程的channel
+            if self._pid != os.getpid():
+                self._channels = [None] * self.pool_size
+                self._stubs = [None] * self.pool_size
+                self._broken = set()
+                self._pid = os.getpid()
+            index = self._next
+            self._next = (self._next + 1) % self.pool_size
+            if index in self._broken:
+                self._broken.discard(index)
+                self._close(index)
+            if self._stubs[index] is None:
+                self._open(index)
+            return index, self._stubs[index]
+
+    def stub(self):
+        """
+        按轮询获取一个缓存的stub
+
+        :return: RawMarketHistoryServiceStub
+        """
+        return self._acquire()[1]
+
+    def reset(self, index: int = None):
+        """
+        关闭并重建channel，下次使用时重新建立连接
+
+        :param index: channel序号，为空时重建全部
+        """
+        with self._lock:
+            indexes = range(self.pool_size) if index is None else [index]
+            for i in indexes:
+                self._close(i)
+
+    def _close(self, index: int):
+        channel = self._channels[index]
+        if channel is not None:
+            channel.close()
+        self._channels[index] = None
+        self._stubs[index] = None
+
+    def _mark_broken(self, index: int, future):
+        # 在grpc回调线程中执行，只做标记，channel在下次分配到该序号时重建
+        if future.cancelled() or future.code() != grpc.StatusCode.UNAVAILABLE:
+            return
+        logger.warning(f"Channel {index} to {self.address} unavailable, reconnecting: {future.details()}")
+        with self._lock:
+            self._broken.add(index)
+
+    def _prepare(self, data_request):
+        # 请求未指定负载编码时使用客户端的设置，不修改调用方的请求对象
+        if not self.accept_encoding or data_request.accept_encoding:
+            return data_request
+        request = market_history_pb2.DataRequest()
+        request.CopyFrom(data_request)
+        request.accept_encoding = self.accept_encoding
+        return request
+
+    def _record_bytes(self, future):
+        # 在grpc回调线程中执行，按响应字节数扣除限流器的字节配额
+        if not future.cancelled() and future.code() == grpc.StatusCode.OK:
+            self.limiter.record(future.result().ByteSize())
+
+    def _start(self, method: str, data_request, timeout: float, compression, hedged: bool = False):
+        # 发起一次异步尝试；每次按轮询取stub，重试与对冲请求因此落在不同的channel上
+        if self.limiter is not None:
+            timeout = wait_limiter(self.limiter, timeout, hedged)
+        index, stub = self._acquire()
+        future = getattr(stub, method).future(data_request, timeout=timeout, compression=compression)
+        future.add_done_callback(lambda f: self._mark_broken(index, f))
+        if self.limiter is not None:
+            future.add_done_callback(self._record_bytes)
+        return future
+
+    def _call(self, method: str, data_request, timeout: float = None, compression: str = None):
+        data_request = self._prepare(data_request)
+        compression = grpc_compression(compression)
+        start = lambda attempt_timeout, hedged=False: self._start(method, data_request, attempt_timeout, compression, hedged)
+        return self.retry.call(start, (method, data_request.type), timeout)
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """
+        等待一个channel连接就绪，用于健康检查
+
+        :param timeout: 等待时间(秒)，为空时一直等待
+        :return: 是否在超时前就绪
+        """
+        index, _ = self._acquire()
+        channel = self._channels[index]
+        if channel is None:
+            return False
+        try:
+            grpc.channel_ready_future(channel).result(timeout=timeout)
+        except grpc.FutureTimeoutError:
+            return False
+        return True
+
+    def query(self, data_request, timeout: float = None, compression: str = None):
+        """
+        发送queryData请求，按客户端的 RetryPolicy 设置超时、重试与对冲；连接不可用时重建channel
+
+        :param data_request: market_history_pb2.DataRequest
+        :param timeout: 单次尝试的超时时间(秒)，为空时使用 RetryPolicy 的 timeout
+        :param compression: 本次请求的gRPC压缩算法，为空时使用客户端设置
+        :return: market_history_pb2.RawDataReply
+        """
+        return self._call("queryData", data_request, timeout, compression)
+
+    def query_batch(self, data_request, timeout: float = None, compression: str = None):
+        """
+        发送queryBatch请求，响应为按列保存的类型化数据，重试方式同 query
+
+        :param data_request: market_history_pb2.DataRequest
+        :param timeout: 单次尝试的超时时间(秒)，为空时使用 RetryPolicy 的 timeout
+        :param compression: 本次请求的gRPC压缩算法，为空时使用客户端设置
+        :return: market_history_pb2.BatchReply
+        :raises grpc.RpcError: 服务端不支持时状态码为 UNIMPLEMENTED
+        """
+        return self._call("queryBatch", data_request, timeout, compression)
+
+    def stream(self, data_request, timeout: float = None):
+        """
+        发送streamData请求，按块返回响应；调用方按需读取，未读取的数据由HTTP/2流控暂停在服务端
+
+        已收到部分数据后连接中断无法安全续传，因此不做重试。
+
+        :param data_request: market_history_pb2.DataRequest
+        :param timeout: 整个流的超时时间(秒)
+        :return: RawDataReply 迭代器，可调用 cancel() 提前结束
+        """
+        if self.limiter is not None:
+            timeout = wait_limiter(self.limiter, timeout)
+        return self.stub().streamData(self._prepare(data_request), timeout=timeout)
+
+    def close(self):
+        """
+        关闭全部channel
+        """
+        self.reset()
+        with self._lock:
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
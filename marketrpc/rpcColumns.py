@@ -0,0 +1,349 @@
+import json
+import math
+from array import array
+
+from . import rpcDecode
+
+# 输出格式：records 为原始的行字典列表，columns 为标准库 array 组成的列字典，
+# numpy 为 numpy 数组组成的列字典，pandas 为 DataFrame，book 为订单簿专用的 OrderBookFrame
+OUTPUT_RECORDS = "records"
+OUTPUT_COLUMNS = "columns"
+OUTPUT_NUMPY = "numpy"
+OUTPUT_PANDAS = "pandas"
+OUTPUT_BOOK = "book"
+OUTPUTS = (OUTPUT_RECORDS, OUTPUT_COLUMNS, OUTPUT_NUMPY, OUTPUT_PANDAS, OUTPUT_BOOK)
+
+# 各数据类型已知列的取值类型，未列出的列按原始对象保存
+COLUMN_SCHEMAS = {
+    "KLINE": {
+        "Timestamp": "int",
+        "IntervalSecond": "int",
+        "Open": "float",
+        "High": "float",
+        "Low": "float",
+        "Close": "float",
+        "Volume": "float",
+        "EndTimestamp": "int",
+        "TransactionNumber": "int",
+        "TransactionVolume": "float",
+        "BuyTransactionVolume": "float",
+        "BuyTransactionAmount": "int",
+        "StartId": "int",
+        "EndId": "int",
+    },
+    "AGG_TRADE": {
+        "Timestamp": "int",
+        "AId": "int",
+        "First": "int",
+        "Last": "int",
+        "Price": "float",
+        "Quantity": "float",
+        "IsBuyer": "bool",
+    },
+    "ORDER_BOOK": {
+        "Timestamp": "int",
+        "UId": "int",
+        "PreUId": "int",
+    },
+}
+
+# 行内没有嵌套对象的数据类型，可在JSON解析过程中直接写入列，不生成行字典
+FLAT_TYPES = ("KLINE", "AGG_TRADE")
+
+_ARRAY_CODES = {"int": "q", "float": "d", "bool": "b"}
+_CASTS = {"int": int, "float": float, "bool": bool}
+_NUMPY_DTYPES = {"int": "int64", "float": "float64", "bool": "int8"}
+_NUMPY_ARRAY_CODES = {"i": "q", "u": "q", "f": "d", "b": "b"}
+_NUMPY_KINDS = {"q": "int", "d": "float", "b": "bool"}
+
+
+def check_output(output: str):
+    """
+    校验输出格式
+
+    :param output: 输出格式
+    :raises ValueError: 不支持的输出格式
+    """
+    if output not in OUTPUTS:
+        raise ValueError(f"Output must be one of {', '.join(OUTPUTS)}.")
+
+
+def _book_frame(arrays: dict, type: str):
+    # OrderBookFrame 依赖 numpy，在使用时导入
+    if (type or "").upper() != "ORDER_BOOK":
+        raise ValueError(f"Output '{OUTPUT_BOOK}' is only supported for ORDER_BOOK.")
+    from .rpcOrderbook import OrderBookFrame
+    return OrderBookFrame.from_arrays(arrays)
+
+
+def _is_book(data) -> bool:
+    from .rpcOrderbook import OrderBookFrame
+    return isinstance(data, OrderBookFrame)
+
+
+class ColumnBuilder(object):
+    """
+    逐行追加数据并按列保存，已知数值列使用紧凑的 array 存储
+
+    :param type: 数据类型，用于查找 COLUMN_SCHEMAS
+    """
+
+    def __init__(self, type: str):
+        self.schema = COLUMN_SCHEMAS.get(type.upper(), {})
+        self.columns = {}
+        self.rows = 0
+
+    def _new_column(self, name):
+        kind = self.schema.get(name)
+        if kind in _ARRAY_CODES:
+            column = array(_ARRAY_CODES[kind])
+            if self.rows:
+                if kind != "float":
+                    column = [None] * self.rows
+                else:
+                    column.extend([math.nan] * self.rows)
+        else:
+            column = [None] * self.rows
+        self.columns[name] = column
+        return column
+
+    def _append(self, name, value):
+        column = self.columns.get(name)
+        if column is None:
+            column = self._new_column(name)
+        if isinstance(column, list):
+            column.append(value)
+            return
+        try:
+            column.append(_CASTS[self.schema[name]](value))
+        except (TypeError, ValueError):
+            # 出现空值或无法转换的值时退化为对象列
+            column = self.columns[name] = column.tolist()
+            column.append(value)
+
+    def add(self, pairs):
+        """
+        追加一行
+
+        :param pairs: (列名, 值) 序列
+        """
+        seen = 0
+        for name, value in pairs:
+            self._append(name, value)
+            seen += 1
+        self.rows += 1
+        if seen != len(self.columns):
+            # 本行缺少部分列，补齐空值保持各列等长
+            for name, column in list(self.columns.items()):
+                if len(column) < self.rows:
+                    self._append(name, math.nan if self.schema.get(name) == "float" else None)
+
+    def hook(self, pairs):
+        """
+        json.loads 的 object_pairs_hook，行对象直接写入列，不生成字典
+
+        :param pairs: JSON对象的 (键, 值) 列表
+        :return: 行对象返回None，其他对象返回字典
+        """
+        if any(name == "Timestamp" for name, _ in pairs):
+            self.add(pairs)
+            return None
+        return dict(pairs)
+
+
+def to_output(columns: dict, type: str, output: str):
+    """
+    将 array/list 列转换为指定的输出格式
+
+    :param columns: 列名到 array 或 list 的映射
+    :param type: 数据类型
+    :param output: 输出格式，columns / numpy / pandas / book
+    :return: 对应格式的列式数据
+    """
+    if output == OUTPUT_COLUMNS:
+        return columns
+    if output == OUTPUT_BOOK:
+        return _book_frame(columns, type)
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError(f"Output '{output}' requires numpy to be installed.") from e
+    schema = COLUMN_SCHEMAS.get(type.upper(), {})
+    arrays = {}
+    for name, column in columns.items():
+        kind = schema.get(name)
+        if isinstance(column, array):
+            # array 与 numpy 共享内存，不发生拷贝
+            values = np.frombuffer(column, dtype=_NUMPY_DTYPES[kind])
+            arrays[name] = values.view(np.bool_) if kind == "bool" else values
+        else:
+            values = np.empty(len(column), dtype=object)
+            values[:] = column
+            arrays[name] = values
+    if output == OUTPUT_NUMPY:
+        return arrays
+    return to_output_pandas(arrays)
+
+
+def from_numpy(arrays: dict, type: str, output: str):
+    """
+    将 numpy 数组组成的列字典转换为指定的输出格式
+
+    :param arrays: 列名到 numpy 数组的映射
+    :param type: 数据类型
+    :param output: 输出格式，records / columns / numpy / pandas / book
+    :return: 对应格式的数据
+    """
+    if output == OUTPUT_NUMPY:
+        return arrays
+    if output == OUTPUT_BOOK:
+        return _book_frame(arrays, type)
+    if output == OUTPUT_PANDAS:
+        return to_output_pandas(arrays)
+    if output == OUTPUT_COLUMNS:
+        columns = {}
+        for name, values in arrays.items():
+            code = _NUMPY_ARRAY_CODES.get(values.dtype.kind)
+            if code is None:
+                columns[name] = values.tolist()
+            else:
+                column = array(code)
+                column.frombytes(values.astype(_NUMPY_DTYPES[_NUMPY_KINDS[code]]).tobytes())
+                columns[name] = column
+        return columns
+    names = list(arrays.keys())
+    return [dict(zip(names, values)) for values in zip(*[arrays[name].tolist() for name in names])]
+
+
+def to_output_pandas(arrays: dict):
+    """
+    将 numpy 列字典转换为 DataFrame
+
+    :param arrays: 列名到 numpy 数组的映射
+    :return: DataFrame
+    """
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise ImportError("Output 'pandas' requires pandas to be installed.") from e
+    return pd.DataFrame(arrays, copy=False)
+
+
+def decode_columns(json_data, type: str, output: str = OUTPUT_COLUMNS):
+    """
+    将响应中的JSON数据直接解析为列式数据
+
+    :param json_data: 响应中的JSON字符串或UTF-8字节
+    :param type: 数据类型
+    :param output: 输出格式，columns / numpy / pandas
+    :return: 对应格式的列式数据
+    :raises ValueError: 响应不是合法的JSON或缺少data字段
+    """
+    builder = ColumnBuilder(type)
+    # 标准库解析时通过 object_pairs_hook 直接写入列；更快的解析器先生成整页行字典再转置
+    hooked = type.upper() in FLAT_TYPES and rpcDecode.get_decoder_name() == rpcDecode.DECODER_JSON
+    try:
+        if hooked:
+            payload = json.loads(json_data, object_pairs_hook=builder.hook)
+        else:
+            payload = rpcDecode.loads(json_data)
+    except ValueError as e:
+        raise ValueError("Failed to decode JSON from server response.") from e
+    if not isinstance(payload, dict) or "data" not in payload:
+        raise ValueError("Invalid JSON response format.")
+    if not hooked:
+        for row in payload["data"] or []:
+            builder.add(row.items())
+    return to_output(builder.columns, type, output)
+
+
+def records_to_columns(rows: list, type: str, output: str = OUTPUT_COLUMNS):
+    """
+    将行字典列表转换为列式数据
+
+    :param rows: 行字典列表
+    :param type: 数据类型
+    :param output: 输出格式，columns / numpy / pandas
+    :return: 对应格式的列式数据
+    """
+    builder = ColumnBuilder(type)
+    for row in rows:
+        builder.add(row.items())
+    return to_output(builder.columns, type, output)
+
+
+def column_values(data, name: str):
+    """
+    获取某一列，DataFrame 返回 numpy 数组，便于按位置访问
+
+    :param data: 列式数据
+    :param name: 列名
+    :return: 列数据
+    """
+    if hasattr(data, "iloc"):
+        return data[name].to_numpy()
+    if _is_book(data):
+        return data.column(name)
+    return data.get(name, [])
+
+
+def column_length(data) -> int:
+    """
+    列式数据的行数
+
+    :param data: 列式数据
+    :return: 行数
+    """
+    if hasattr(data, "iloc") or _is_book(data):
+        return len(data)
+    return len(next(iter(data.values()))) if data else 0
+
+
+def slice_columns(data, start: int = None, stop: int = None):
+    """
+    按行位置切片列式数据，numpy/pandas 返回视图
+
+    :param data: 列式数据
+    :param start: 开始位置
+    :param stop: 结束位置
+    :return: 切片后的列式数据
+    """
+    if hasattr(data, "iloc"):
+        return data.iloc[start:stop]
+    if _is_book(data):
+        return data.slice(start, stop)
+    return {name: column[start:stop] for name, column in data.items()}
+
+
+def concat_columns(pages: list, type: str, output: str = OUTPUT_COLUMNS):
+    """
+    按顺序拼接多页列式数据
+
+    :param pages: 列式数据列表
+    :param type: 数据类型
+    :param output: 输出格式，columns / numpy / pandas / book
+    :return: 拼接后的列式数据
+    """
+    pages = [page for page in pages if column_length(page)]
+    if output == OUTPUT_BOOK:
+        from .rpcOrderbook import OrderBookFrame
+        return OrderBookFrame.concat(pages)
+    if output == OUTPUT_PANDAS:
+        import pandas as pd
+        return pd.concat(pages, ignore_index=True) if pages else to_output({}, type, output)
+    if output == OUTPUT_NUMPY:
+        import numpy as np
+        names = list(pages[0].keys()) if pages else []
+        return {name: np.concatenate([page[name] for page in pages]) for name in names}
+    merged = {}
+    for page in pages:
+        for name, column in page.items():
+            target = merged.get(name)
+            if target is None:
+                merged[name] = column[:]
+            elif isinstance(target, array) and isinstance(column, array):
+                target.extend(column)
+            else:
+                target = merged[name] = list(target)
+                target.extend(column)
+    return merged
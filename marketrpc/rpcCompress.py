@@ -0,0 +1,209 @@
+import time
+import zlib
+import logging
+import threading
+
+from .rpcLazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+grpc = lazy_import("grpc")
+
+# gRPC传输层压缩，作用于整个protobuf消息，由grpc自动解压；值为 grpc.Compression 的成员名
+GRPC_COMPRESSIONS = {
+    "none": "NoCompression",
+    "gzip": "Gzip",
+    "deflate": "Deflate",
+}
+
+# 响应负载压缩，作用于 DataReply 中的JSON，客户端在解析前解压；按压缩速度排列
+ENCODING_IDENTITY = "identity"
+ENCODING_LZ4 = "lz4"
+ENCODING_ZSTD = "zstd"
+ENCODING_GZIP = "gzip"
+ENCODING_DEFLATE = "deflate"
+ENCODINGS = (ENCODING_LZ4, ENCODING_ZSTD, ENCODING_GZIP, ENCODING_DEFLATE)
+
+# gzip 数据的魔数，用于识别未声明编码但已压缩的 jsonData
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def grpc_compression(name: str):
+    """
+    将压缩算法名称转换为 grpc.Compression
+
+    :param name: none / gzip / deflate，为空时返回None(使用channel默认值)
+    :return: grpc.Compression
+    :raises ValueError: 不支持的压缩算法
+    """
+    if name is None:
+        return None
+    if not isinstance(name, str):
+        return name
+    if name.lower() not in GRPC_COMPRESSIONS:
+        raise ValueError(f"Compression must be one of {', '.join(GRPC_COMPRESSIONS)}.")
+    return getattr(grpc.Compression, GRPC_COMPRESSIONS[name.lower()])
+
+
+def _codec(encoding: str):
+    # 返回 (压缩函数, 解压函数)，可选依赖未安装时抛出 ImportError
+    if encoding == ENCODING_GZIP:
+        return (lambda data: zlib.compress(data, wbits=31)), (lambda data: zlib.decompress(data, wbits=31))
+    if encoding == ENCODING_DEFLATE:
+        return zlib.compress, zlib.decompress
+    if encoding == ENCODING_ZSTD:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("Encoding 'zstd' requires zstandard to be installed.") from e
+        return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+    if encoding == ENCODING_LZ4:
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ImportError("Encoding 'lz4' requires lz4 to be installed.") from e
+        return lz4.frame.compress, lz4.frame.decompress
+    raise ValueError(f"Encoding must be one of {', '.join(ENCODINGS)}.")
+
+
+def available_encodings() -> list:
+    """
+    当前环境可用的负载压缩编码
+
+    :return: 编码名称列表
+    """
+    names = []
+    for name in ENCODINGS:
+        try:
+            _codec(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def check_encodings(encodings) -> str:
+    """
+    校验并规范化客户端可接受的负载编码
+
+    :param encodings: 编码名称，或按优先级排列的列表，为空时不压缩
+    :return: 逗号分隔的编码字符串，可直接写入 DataRequest.accept_encoding
+    :raises ValueError: 不支持的编码
+    :raises ImportError: 编码依赖的库未安装
+    """
+    if not encodings:
+        return ""
+    if isinstance(encodings, str):
+        encodings = encodings.split(",")
+    names = [name.strip().lower() for name in encodings if name.strip()]
+    for name in names:
+        _codec(name)
+    return ",".join(names)
+
+
+def compress_payload(data: bytes, encoding: str) -> bytes:
+    """
+    压缩负载
+
+    :param data: 原始字节
+    :param encoding: 编码名称
+    :return: 压缩后的字节
+    """
+    return _codec(encoding)[0](data)
+
+
+def decompress_payload(data: bytes, encoding: str) -> bytes:
+    """
+    解压负载
+
+    :param data: 压缩后的字节
+    :param encoding: 编码名称
+    :return: 原始字节
+    """
+    return _codec(encoding)[1](data)
+
+
+class TransferStats(object):
+    """
+    按负载编码累计响应的传输字节数与解压后字节数，用于比较不同压缩设置
+
+    payload_bytes 为消息中JSON负载的字节数，未压缩时与 decoded_bytes 相同；开启gRPC传输层压缩时，
+    grpc 在交给应用前已完成解压，实际线上字节数需以负载压缩或 benchmarks/compress_bench.py 估算。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, encoding: str, payload_bytes: int, decoded_bytes: int, elapsed: float):
+        """
+        记录一次响应
+
+        :param encoding: 负载编码，未压缩为 identity
+        :param payload_bytes: 负载字节数
+        :param decoded_bytes: 解压后的字节数
+        :param elapsed: 解压耗时(秒)
+        """
+        with self._lock:
+            totals = self._totals.get(encoding)
+            if totals is None:
+                totals = self._totals[encoding] = {"calls": 0, "payload_bytes": 0, "decoded_bytes": 0, "decompress_seconds": 0.0}
+            totals["calls"] += 1
+            totals["payload_bytes"] += payload_bytes
+            totals["decoded_bytes"] += decoded_bytes
+            totals["decompress_seconds"] += elapsed
+
+    def snapshot(self) -> dict:
+        """
+        当前累计值
+
+        :return: {编码: {"calls", "payload_bytes", "decoded_bytes", "decompress_seconds", "ratio"}}
+        """
+        with self._lock:
+            result = {}
+            for encoding, totals in self._totals.items():
+                result[encoding] = dict(totals)
+                result[encoding]["ratio"] = totals["payload_bytes"] / totals["decoded_bytes"] if totals["decoded_bytes"] else 1.0
+            return result
+
+    def reset(self):
+        """
+        清空累计值
+        """
+        with self._lock:
+            self._totals = {}
+
+
+transfer_stats = TransferStats()
+
+
+def reply_json(response):
+    """
+    取出响应中的JSON数据，按 encoding 字段解压并记录传输统计
+
+    服务端未声明编码、但 jsonData 为gzip数据时(如旧服务端响应 is_gzip 请求)同样解压。
+
+    :param response: DataReply 或 RawDataReply
+    :return: JSON字符串或UTF-8字节
+    :raises ValueError: 负载无法解压
+    """
+    encoding = getattr(response, "encoding", "")
+    if encoding:
+        payload = response.payload
+    else:
+        payload = response.jsonData
+        if isinstance(payload, bytes) and payload[:2] == GZIP_MAGIC:
+            encoding = ENCODING_GZIP
+    if not encoding:
+        transfer_stats.record(ENCODING_IDENTITY, len(payload), len(payload), 0.0)
+        return payload
+    decompress = _codec(encoding)[1]
+    timer_start = time.perf_counter()
+    try:
+        data = decompress(payload)
+    except Exception as e:
+        raise ValueError(f"Failed to decompress {encoding} payload: {e}") from e
+    elapsed = time.perf_counter() - timer_start
+    transfer_stats.record(encoding, len(payload), len(data), elapsed)
+    logger.debug(f"Payload {encoding}: {len(payload)} bytes on wire, {len(data)} bytes decoded in {elapsed * 1000:.2f} ms")
+    return data
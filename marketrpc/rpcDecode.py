@@ -0,0 +1,90 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 可选的JSON解析器，按优先级排列；未安装时回退到标准库 json
+DECODER_ORJSON = "orjson"
+DECODER_SIMDJSON = "simdjson"
+DECODER_JSON = "json"
+DECODERS = (DECODER_ORJSON, DECODER_SIMDJSON, DECODER_JSON)
+
+_decoder_name = None
+_decoder = None
+
+
+def _load_decoder(name: str):
+    if name == DECODER_ORJSON:
+        import orjson
+
+        def loads(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError as e:
+                raise ValueError(str(e)) from e
+        return loads
+    if name == DECODER_SIMDJSON:
+        import simdjson
+
+        def loads(data):
+            return simdjson.loads(data)
+        return loads
+    if name == DECODER_JSON:
+        return json.loads
+    raise ValueError(f"Decoder must be one of {', '.join(DECODERS)}.")
+
+
+def available_decoders() -> list:
+    """
+    当前环境可用的JSON解析器
+
+    :return: 解析器名称列表，按优先级排列
+    """
+    names = []
+    for name in DECODERS:
+        try:
+            _load_decoder(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_decoder(name: str = None):
+    """
+    设置全局JSON解析器
+
+    :param name: 解析器名称 orjson / simdjson / json，为空时自动选择可用的最快解析器
+    :raises ImportError: 指定的解析器未安装
+    """
+    global _decoder_name, _decoder
+    if name is None:
+        name = available_decoders()[0]
+    decoder = _load_decoder(name)
+    _decoder_name, _decoder = name, decoder
+    logger.debug(f"Using JSON decoder: {name}")
+
+
+def get_decoder_name() -> str:
+    """
+    当前使用的JSON解析器名称
+
+    :return: 解析器名称
+    """
+    if _decoder is None:
+        set_decoder()
+    return _decoder_name
+
+
+def loads(data):
+    """
+    使用当前解析器解析JSON，接受 str 或 UTF-8 bytes
+
+    :param data: JSON字符串或字节
+    :return: 解析结果
+    :raises ValueError: 不是合法的JSON
+    """
+    if _decoder is None:
+        set_decoder()
+    return _decoder(data)
+
@@ -0,0 +1,296 @@
+from . import rpcUtils
+from .rpcColumns import OUTPUT_NUMPY, OUTPUT_BOOK, check_output, from_numpy, records_to_columns
+from .rpcOrderbook import OrderBookFrame, book_levels
+
+# 成交bar类型：tick 按成交笔数、volume 按成交量、dollar 按成交额切分
+BAR_TICK = "tick"
+BAR_VOLUME = "volume"
+BAR_DOLLAR = "dollar"
+BAR_KINDS = (BAR_TICK, BAR_VOLUME, BAR_DOLLAR)
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("Derived series require numpy to be installed.") from e
+    return np
+
+
+def _to_arrays(data, type: str) -> dict:
+    # 任意输出格式的一页数据转换为 numpy 列字典
+    np = _numpy()
+    if isinstance(data, list):
+        data = records_to_columns(data, type, OUTPUT_NUMPY)
+    elif hasattr(data, "iloc"):
+        data = {name: data[name].to_numpy() for name in data.columns}
+    return {name: values if isinstance(values, np.ndarray) else np.asarray(values) for name, values in data.items()}
+
+
+class TradeBarBuilder(object):
+    """
+    将逐笔成交增量合并为 tick / volume / dollar bar，输入需按时间升序
+
+    自开始累计成交笔数、成交量或成交额，每跨过一次 threshold 的整数倍结束一根bar，成交归入其累计值所在的bar。
+    每次 update 返回已完整的bar，未完整的bar保留到下一页，内存占用不超过一根bar的成交数。
+
+    :param kind: bar类型 tick / volume / dollar
+    :param threshold: 每根bar的成交笔数、成交量或成交额
+    :param output: 输出格式，records / columns / numpy / pandas(default:numpy)
+    :return Timestamp: 首笔成交时间戳
+    :return EndTimestamp: 末笔成交时间戳
+    :return Open / High / Low / Close: 开高低收价格
+    :return Volume: 成交量
+    :return BuyerVolume: IsBuyer 为真的成交量
+    :return Amount: 成交额
+    :return Vwap: 成交量加权均价
+    :return Trades: 成交笔数
+    :return StartId / EndId: 首末笔成交的 AId
+    """
+
+    def __init__(self, kind: str, threshold: float, output: str = OUTPUT_NUMPY):
+        if kind not in BAR_KINDS:
+            raise ValueError(f"Kind must be one of {', '.join(BAR_KINDS)}.")
+        if threshold <= 0:
+            raise ValueError("Threshold must be greater than 0.")
+        check_output(output)
+        _numpy()
+        self.kind = kind
+        self.threshold = threshold
+        self.output = output
+        self._pending = None
+        self._pending_bars = None
+        self._total = 0.0
+
+    def _measure(self, arrays: dict):
+        np = _numpy()
+        if self.kind == BAR_TICK:
+            return np.ones(len(arrays["Timestamp"]), dtype=np.float64)
+        if self.kind == BAR_VOLUME:
+            return arrays["Quantity"]
+        return arrays["Price"] * arrays["Quantity"]
+
+    def update(self, page) -> any:
+        """
+        追加一页成交
+
+        :param page: 任意输出格式的一页成交，如 iter_aggtrade 产出的页
+        :return: 已完整的bar，格式由 output 决定
+        """
+        np = _numpy()
+        arrays = _to_arrays(page, "AGG_TRADE")
+        if not arrays or not len(arrays.get("Timestamp", ())):
+            return self._emit({})
+        arrays = {
+            "Timestamp": arrays["Timestamp"].astype(np.int64),
+            "AId": arrays["AId"].astype(np.int64) if "AId" in arrays else np.zeros(len(arrays["Timestamp"]), dtype=np.int64),
+            "Price": arrays["Price"].astype(np.float64),
+            "Quantity": arrays["Quantity"].astype(np.float64),
+            "IsBuyer": arrays["IsBuyer"].astype(np.bool_),
+        }
+        # bar编号为自开始的累计值跨过的 threshold 整数倍个数，跨页保持连续
+        cumulative = self._total + np.cumsum(self._measure(arrays))
+        bars = np.maximum(np.ceil(cumulative / self.threshold - 1e-9).astype(np.int64) - 1, 0)
+        self._total = float(cumulative[-1])
+        if self._pending is not None:
+            bars = np.concatenate((self._pending_bars, bars))
+            arrays = {name: np.concatenate((self._pending[name], values)) for name, values in arrays.items()}
+        # 最后一根bar的累计值未到达 threshold 的整数倍时留到下一页
+        cut = len(bars)
+        if self._total < (bars[-1] + 1) * self.threshold * (1 - 1e-9):
+            cut = int(np.searchsorted(bars, bars[-1], side="left"))
+        self._pending = {name: values[cut:] for name, values in arrays.items()} if cut < len(bars) else None
+        self._pending_bars = bars[cut:]
+        if not cut:
+            return self._emit({})
+        return self._emit(_trade_bars({name: values[:cut] for name, values in arrays.items()}, bars[:cut]))
+
+    def flush(self) -> any:
+        """
+        取出最后一根未完整的bar
+
+        :return: bar数据，格式由 output 决定
+        """
+        pending, self._pending = self._pending, None
+        if not pending:
+            return self._emit({})
+        return self._emit(_trade_bars(pending, self._pending_bars))
+
+    def _emit(self, bars: dict):
+        return from_numpy(bars, "AGG_TRADE", self.output)
+
+
+def _trade_bars(arrays: dict, bars) -> dict:
+    np = _numpy()
+    count = len(bars)
+    starts = np.concatenate(([0], np.flatnonzero(bars[1:] != bars[:-1]) + 1))
+    ends = np.concatenate((starts[1:], [count])) - 1
+    prices = arrays["Price"]
+    quantities = arrays["Quantity"]
+    amounts = prices * quantities
+    volume = np.add.reduceat(quantities, starts)
+    amount = np.add.reduceat(amounts, starts)
+    return {
+        "Timestamp": arrays["Timestamp"][starts],
+        "EndTimestamp": arrays["Timestamp"][ends],
+        "Open": prices[starts],
+        "High": np.maximum.reduceat(prices, starts),
+        "Low": np.minimum.reduceat(prices, starts),
+        "Close": prices[ends],
+        "Volume": volume,
+        "BuyerVolume": np.add.reduceat(np.where(arrays["IsBuyer"], quantities, 0.0), starts),
+        "Amount": amount,
+        "Vwap": np.divide(amount, volume, out=np.full(len(starts), np.nan), where=volume != 0),
+        "Trades": ends - starts + 1,
+        "StartId": arrays["AId"][starts],
+        "EndId": arrays["AId"][ends],
+    }
+
+
+def book_features(page, depth: int = 5, levels: bool = False, output: str = OUTPUT_NUMPY) -> any:
+    """
+    由订单簿快照计算盘口序列
+
+    :param page: 任意输出格式的一页订单簿，包括 OrderBookFrame
+    :param depth: 计算深度与不平衡度使用的档位数(default:5)
+    :param levels: 是否输出各档价格与数量列 Bid1Price / Bid1Quantity / Ask1Price ...
+    :param output: 输出格式(default:numpy)
+    :return Timestamp / UId: 快照时间戳与ID
+    :return BestBid / BestAsk: 买一、卖一价
+    :return MidPrice: 中间价
+    :return Spread: 买卖价差
+    :return MicroPrice: 按买一卖一数量加权的价格
+    :return BidDepth / AskDepth: 前 depth 档累计数量
+    :return Imbalance: (BidDepth - AskDepth) / (BidDepth + AskDepth)
+    """
+    if depth <= 0:
+        raise ValueError("Depth must be greater than 0.")
+    check_output(output)
+    if output == OUTPUT_BOOK:
+        raise ValueError(f"Output '{OUTPUT_BOOK}' is not supported for orderbook features.")
+    np = _numpy()
+    if isinstance(page, OrderBookFrame):
+        # 档位已是二维数组，不足 depth 档时补 NaN
+        frame = page.resize(depth)
+        arrays = {"Timestamp": frame.timestamp, "UId": frame.uid}
+        bid_prices, bid_quantities = frame.bid_prices, frame.bid_quantities
+        ask_prices, ask_quantities = frame.ask_prices, frame.ask_quantities
+    else:
+        arrays = _to_arrays(page, "ORDER_BOOK")
+        if arrays and len(arrays.get("Timestamp", ())):
+            bid_prices, bid_quantities = book_levels(arrays["Bids"], depth)
+            ask_prices, ask_quantities = book_levels(arrays["Asks"], depth)
+    if not len(arrays.get("Timestamp", ())):
+        return from_numpy({}, "ORDER_BOOK", output)
+    best_bid = bid_prices[:, 0]
+    best_ask = ask_prices[:, 0]
+    bid_depth = np.nansum(bid_quantities, axis=1)
+    ask_depth = np.nansum(ask_quantities, axis=1)
+    total = bid_depth + ask_depth
+    top = bid_quantities[:, 0] + ask_quantities[:, 0]
+    features = {
+        "Timestamp": arrays["Timestamp"].astype(np.int64),
+        "UId": arrays["UId"].astype(np.int64) if "UId" in arrays else None,
+        "BestBid": best_bid,
+        "BestAsk": best_ask,
+        "MidPrice": (best_bid + best_ask) / 2,
+        "Spread": best_ask - best_bid,
+        "MicroPrice": np.divide(best_bid * ask_quantities[:, 0] + best_ask * bid_quantities[:, 0], top,
+                                out=np.full(len(top), np.nan), where=top > 0),
+        "BidDepth": bid_depth,
+        "AskDepth": ask_depth,
+        "Imbalance": np.divide(bid_depth - ask_depth, total, out=np.full(len(total), np.nan), where=total > 0),
+    }
+    if features["UId"] is None:
+        del features["UId"]
+    if levels:
+        for level in range(depth):
+            features[f"Bid{level + 1}Price"] = bid_prices[:, level]
+            features[f"Bid{level + 1}Quantity"] = bid_quantities[:, level]
+            features[f"Ask{level + 1}Price"] = ask_prices[:, level]
+            features[f"Ask{level + 1}Quantity"] = ask_quantities[:, level]
+    return from_numpy(features, "ORDER_BOOK", output)
+
+
+def iter_trade_bars(pages, kind: str, threshold: float, output: str = OUTPUT_NUMPY):
+    """
+    按页将成交合并为bar
+
+    :param pages: 按时间升序的成交页迭代器，如 iter_aggtrade(..., output="numpy")
+    :param kind: bar类型 tick / volume / dollar
+    :param threshold: 每根bar的成交笔数、成交量或成交额
+    :param output: 输出格式(default:numpy)
+    :return: bar页的生成器，最后一页包含未完整的bar
+    """
+    builder = TradeBarBuilder(kind, threshold, output)
+    for page in pages:
+        bars = builder.update(page)
+        if _length(bars):
+            yield bars
+    bars = builder.flush()
+    if _length(bars):
+        yield bars
+
+
+def iter_book_features(pages, depth: int = 5, levels: bool = False, output: str = OUTPUT_NUMPY):
+    """
+    按页计算订单簿盘口序列
+
+    :param pages: 订单簿页迭代器，如 iter_orderbook(..., output="numpy")
+    :param depth: 档位数(default:5)
+    :param levels: 是否输出各档价格与数量列
+    :param output: 输出格式(default:numpy)
+    :return: 盘口序列页的生成器
+    """
+    for page in pages:
+        features = book_features(page, depth, levels, output)
+        if _length(features):
+            yield features
+
+
+def _length(data) -> int:
+    if isinstance(data, (list, OrderBookFrame)) or hasattr(data, "iloc"):
+        return len(data)
+    return len(data.get("Timestamp", ())) if data else 0
+
+
+# 分页查询成交流并合并为bar
+def aggtrade_bars(exchange: str, account_type: str, symbol: str, start_time: any, end_time: any, kind: str,
+                  threshold: float, output: str = OUTPUT_NUMPY, **kwargs):
+    """
+    分页拉取 [start_time, end_time] 内的成交并合并为 tick / volume / dollar bar
+
+    :param exchange: 交易所名称
+    :param account_type: 账户类型
+    :param symbol: 交易对
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param kind: bar类型 tick / volume / dollar
+    :param threshold: 每根bar的成交笔数、成交量或成交额
+    :param output: 输出格式(default:numpy)
+    :param kwargs: 传给 iter_aggtrade 的其他参数，如 limit、client
+    :return: bar页的生成器
+    """
+    pages = rpcUtils.iter_aggtrade(exchange, account_type, symbol, start_time, end_time, output=OUTPUT_NUMPY, **kwargs)
+    return iter_trade_bars(pages, kind, threshold, output)
+
+
+# 分页查询订单簿并计算盘口序列
+def orderbook_features(exchange: str, account_type: str, symbol: str, start_time: any, end_time: any, depth: int = 5,
+                       levels: bool = False, output: str = OUTPUT_NUMPY, **kwargs):
+    """
+    分页拉取 [start_time, end_time] 内的订单簿快照并计算盘口序列
+
+    :param exchange: 交易所名称
+    :param account_type: 账户类型
+    :param symbol: 交易对
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param depth: 档位数(default:5)
+    :param levels: 是否输出各档价格与数量列
+    :param output: 输出格式(default:numpy)
+    :param kwargs: 传给 iter_orderbook 的其他参数，如 limit、client
+    :return: 盘口序列页的生成器
+    """
+    pages = rpcUtils.iter_orderbook(exchange, account_type, symbol, start_time, end_time, output=OUTPUT_NUMPY, **kwargs)
+    return iter_book_features(pages, depth, levels, output)
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import logging
+import argparse
+
+from . import rpcUtils
+from .rpcColumns import OUTPUT_NUMPY, OUTPUT_BOOK, _is_book
+from .rpcOrderbook import _numpy
+from .rpcTime import SHANGHAI_OFFSET_SECONDS, interval_windows
+
+logger = logging.getLogger(__name__)
+
+# 导出格式与文件扩展名
+FORMAT_PARQUET = "parquet"
+FORMAT_ARROW = "arrow"
+FORMATS = {FORMAT_PARQUET: ".parquet", FORMAT_ARROW: ".arrow"}
+
+# 命令行类型名与数据类型
+EXPORT_TYPES = {"kline": "KLINE", "aggtrade": "AGG_TRADE", "orderbook": "ORDER_BOOK"}
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Exporting to Parquet/Arrow requires pyarrow to be installed.") from e
+    return pa
+
+
+def _data_type(type: str) -> str:
+    data_type = EXPORT_TYPES.get(type.lower(), type.upper())
+    if data_type not in EXPORT_TYPES.values():
+        raise ValueError(f"Type must be one of {', '.join(EXPORT_TYPES)}.")
+    return data_type
+
+
+def _book_levels(pa, levels):
+    # (n, depth, 2) 档位数组转换为 list<fixed_size_list<double, 2>>，去掉不足深度时填充的NaN档位
+    np = _numpy()
+    valid = ~np.isnan(levels[:, :, 0])
+    offsets = np.zeros(len(levels) + 1, dtype=np.int32)
+    np.cumsum(valid.sum(axis=1), out=offsets[1:])
+    values = pa.FixedSizeListArray.from_arrays(pa.array(levels[valid].reshape(-1)), 2)
+    return pa.ListArray.from_arrays(pa.array(offsets), values)
+
+
+def to_record_batch(page, schema=None):
+    """
+    将一页数据转换为 pyarrow.RecordBatch，数值列零拷贝
+
+    :param page: numpy 输出的列字典，或 OrderBookFrame
+    :param schema: 目标 pyarrow.Schema，为空时按数据推断；同一文件的各页需使用相同的 schema
+    :return: pyarrow.RecordBatch
+    """
+    pa = _pyarrow()
+    if _is_book(page):
+        columns = {name: pa.array(page.column(name)) for name in ("Time", "Timestamp", "UId", "PreUId")}
+        columns["Bids"] = _book_levels(pa, page.bids)
+        columns["Asks"] = _book_levels(pa, page.asks)
+    else:
+        columns = {name: pa.array(values) for name, values in page.items()}
+    if schema is None:
+        return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns))
+    return pa.RecordBatch.from_arrays([columns[field.name].cast(field.type) for field in schema], schema=schema)
+
+
+class _PartitionWriter(object):
+    # 按页追加写入一个分区文件，先写临时文件，完成后原子替换
+
+    def __init__(self, path: str, format: str, compression: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.format = format
+        self.compression = compression
+        self.schema = None
+        self.rows = 0
+        self._writer = None
+
+    def write(self, page):
+        batch = to_record_batch(page, self.schema)
+        if self._writer is None:
+            self.schema = batch.schema
+            self._writer = self._open(batch.schema)
+        self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def _open(self, schema):
+        pa = _pyarrow()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if self.format == FORMAT_PARQUET:
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.tmp_path, schema, compression=self.compression or "none")
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(self.tmp_path, schema, options=options)
+
+    def commit(self) -> int:
+        if self._writer is None:
+            return 0
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+        return os.path.getsize(self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.remove(self.tmp_path)
+
+
+class MarketDataExporter(object):
+    """
+    按页拉取行情并写入按 类型/交易对/日期 分区的 Parquet 或 Arrow IPC 文件
+
+    每页数据转换为 Arrow RecordBatch 后立即写入，内存占用与页大小相当。分区按上海时间自然日划分，
+    路径为 root/type=KLINE/interval=1/symbol=btcusdt/date=2024-12-02/part-0.parquet(非K线没有 interval 层)；
+    每个分区先写临时文件，完成后原子替换并记录到 root/_checkpoint.json，重新运行时跳过已完整导出的分区。
+    结束时间晚于 now - settle_ms 的分区数据可能尚未落定，照常导出但不记录检查点，重新运行时会再次导出。
+
+    :param root: 导出根目录
+    :param format: parquet / arrow(default:parquet)
+    :param compression: 压缩算法，parquet 支持 zstd / snappy / gzip / lz4 / none，arrow 支持 zstd / lz4 / None(default:zstd)
+    :param page_size: 每页数据数量(default:10000)
+    :param resume: 是否跳过检查点中已完成的分区(default:True)
+    :param client: MarketRpcClient，为空时使用默认客户端
+    :param settle_ms: 数据落定所需的时间(毫秒)，与 MarketDataCache 相同(default:60000)
+    """
+
+    def __init__(self, root: str, format: str = FORMAT_PARQUET, compression: str = "zstd", page_size: int = 10000,
+                 resume: bool = True, client=None, settle_ms: int = 60 * 1000):
+        if format not in FORMATS:
+            raise ValueError(f"Format must be one of {', '.join(FORMATS)}.")
+        _pyarrow()
+        self.root = root
+        self.format = format
+        self.compression = compression
+        self.page_size = page_size
+        self.resume = resume
+        self.client = client
+        self.settle_ms = settle_ms
+        os.makedirs(root, exist_ok=True)
+        self._checkpoint = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> dict:
+        path = os.path.join(self.root, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save_checkpoint(self):
+        path = os.path.join(self.root, CHECKPOINT_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._checkpoint, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _completed(self, key: str, start_time: int, end_time: int) -> bool:
+        entry = self._checkpoint.get(key)
+        if not self.resume or entry is None:
+            return False
+        if entry["start_time"] > start_time or entry["end_time"] < end_time:
+            return False
+        return not entry["rows"] or os.path.exists(os.path.join(self.root, key))
+
+    def partition_path(self, type: str, symbol: str, date: str, kline_interval_second: int = None) -> str:
+        """
+        分区文件相对 root 的路径
+
+        :param type: 数据类型，KLINE / AGG_TRADE / ORDER_BOOK
+        :param symbol: 交易对
+        :param date: 日期，YYYY-MM-DD
+        :param kline_interval_second: K线时间间隔，仅K线使用
+        :return: 相对路径
+        """
+        parts = [f"type={type}"]
+        if type == "KLINE":
+            parts.append(f"interval={kline_interval_second}")
+        parts += [f"symbol={symbol}", f"date={date}", f"part-0{FORMATS[self.format]}"]
+        return "/".join(parts)
+
+    def _pages(self, type: str, symbol: str, start_time: int, end_time: int, exchange: str, account_type: str,
+               kline_interval_second: int, kwargs: dict):
+        common = dict(limit=self.page_size, client=self.client, **kwargs)
+        if type == "KLINE":
+            return rpcUtils.iter_kline(account_type, symbol, kline_interval_second, start_time, end_time,
+                                       exchange=exchange.upper(), output=OUTPUT_NUMPY, **common)
+        if type == "AGG_TRADE":
+            return rpcUtils.iter_aggtrade(exchange, account_type, symbol, start_time, end_time,
+                                          output=OUTPUT_NUMPY, **common)
+        return rpcUtils.iter_orderbook(exchange, account_type, symbol, start_time, end_time,
+                                       output=OUTPUT_BOOK, **common)
+
+    def export_partition(self, type: str, symbol: str, start_time: int, end_time: int, exchange: str = "binance",
+                         account_type: str = "future", kline_interval_second: int = 1, **kwargs) -> dict:
+        """
+        导出一个交易日分区
+
+        :param type: 数据类型，kline / aggtrade / orderbook 或 KLINE / AGG_TRADE / ORDER_BOOK
+        :param symbol: 交易对
+        :param start_time: 开始毫秒时间戳，需与 end_time 位于同一上海时间自然日
+        :param end_time: 结束毫秒时间戳
+        :param exchange: 交易所(default:binance)
+        :param account_type: 账户类型(default:future)
+        :param kline_interval_second: K线时间间隔(default:1)
+        :param kwargs: 传给 iter_kline / iter_aggtrade / iter_orderbook 的其他参数，如 schema
+        :return: 分区统计 {type, symbol, date, path, rows, bytes, elapsed, skipped}
+        """
+        type = _data_type(type)
+        date = time.strftime("%Y-%m-%d", time.gmtime(start_time // 1000 + SHANGHAI_OFFSET_SECONDS))
+        key = self.partition_path(type, symbol, date, kline_interval_second)
+        stat = {"type": type, "symbol": symbol, "date": date, "path": key, "rows": 0, "bytes": 0,
+                "elapsed": 0.0, "skipped": False}
+        if self._completed(key, start_time, end_time):
+            stat.update(rows=self._checkpoint[key]["rows"], bytes=self._checkpoint[key]["bytes"], skipped=True)
+            return stat
+
+        timer_start = time.perf_counter()
+        writer = _PartitionWriter(os.path.join(self.root, key), self.format, self.compression)
+        try:
+            for page in self._pages(type, symbol, start_time, end_time, exchange, account_type,
+                                    kline_interval_second, kwargs):
+                if len(page) if _is_book(page) else len(page.get("Timestamp", ())):
+                    writer.write(page)
+            stat["bytes"] = writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        stat["rows"] = writer.rows
+        stat["elapsed"] = time.perf_counter() - timer_start
+        if end_time <= time.time() * 1000 - self.settle_ms:
+            self._checkpoint[key] = {"start_time": start_time, "end_time": end_time, "rows": writer.rows,
+                                     "bytes": stat["bytes"]}
+            self._save_checkpoint()
+        logger.info(f"Exported {key}: {writer.rows} rows, {stat['bytes']} bytes in {stat['elapsed']:.2f} seconds")
+        return stat
+
+    def export(self, types: any, symbols: any, start_time: any, end_time: any, exchange: str = "binance",
+               account_type: str = "future", kline_interval_second: int = 1, **kwargs) -> list:
+        """
+        按 类型 × 交易对 × 日期 逐个分区导出
+
+        :param types: 数据类型或其列表
+        :param symbols: 交易对或其列表
+        :param start_time: 开始时间
+        :param end_time: 结束时间
+        :param exchange: 交易所(default:binance)
+        :param account_type: 账户类型(default:future)
+        :param kline_interval_second: K线时间间隔(default:1)
+        :param kwargs: 传给分页遍历函数的其他参数
+        :return: 各分区统计列表
+        """
+        types = [types] if isinstance(types, str) else list(types)
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        start_time = rpcUtils.normalize_timestamp(start_time, "Start time")
+        end_time = rpcUtils.normalize_timestamp(end_time, "End time")
+        days = interval_windows(start_time, end_time, 86400, 1, SHANGHAI_OFFSET_SECONDS)
+        stats = []
+        for type in types:
+            for symbol in symbols:
+                for lower, upper in days:
+                    stats.append(self.export_partition(type, symbol, lower, upper, exchange, account_type,
+                                                       kline_interval_second, **kwargs))
+        return stats
+
+
+# 导出行情数据到 Parquet / Arrow IPC 文件
+def export_range(
+    types: any,
+    symbols: any,
+    start_time: any,
+    end_time: any,
+    root: str,
+    format: str = FORMAT_PARQUET,
+    exchange: str = "binance",
+    account_type: str = "future",
+    kline_interval_second: int = 1,
+    page_size: int = 10000,
+    compression: str = "zstd",
+    resume: bool = True,
+    client=None,
+    settle_ms: int = 60 * 1000,
+    **kwargs
+) -> list:
+    """
+    分页拉取 [start_time, end_time] 内的行情并写入分区文件，参数含义同 MarketDataExporter
+
+    :return: 各分区统计列表
+    """
+    exporter = MarketDataExporter(root, format, compression, page_size, resume, client, settle_ms)
+    return exporter.export(types, symbols, start_time, end_time, exchange, account_type, kline_interval_second,
+                           **kwargs)
+
+
+def main(argv: list = None):
+    """
+    命令行入口：marketrpc-export 或 python -m marketrpc.rpcExport
+    """
+    parser = argparse.ArgumentParser(description="分页导出行情数据到按 类型/交易对/日期 分区的 Parquet 或 Arrow IPC 文件")
+    parser.add_argument("--types", default="kline", help="逗号分隔的数据类型，kline / aggtrade / orderbook")
+    parser.add_argument("--symbols", required=True, help="逗号分隔的交易对")
+    parser.add_argument("--start", required=True, help="开始时间，如 2024-12-01 或 2024-12-01 08:00:00")
+    parser.add_argument("--end", required=True, help="结束时间")
+    parser.add_argument("--root", required=True, help="导出根目录")
+    parser.add_argument("--format", default=FORMAT_PARQUET, choices=list(FORMATS), help="文件格式")
+    parser.add_argument("--exchange", default="binance", help="交易所")
+    parser.add_argument("--account-type", default="future", help="账户类型")
+    parser.add_argument("--interval", type=int, default=1, help="K线时间间隔(秒)")
+    parser.add_argument("--page-size", type=int, default=10000, help="每页数据数量")
+    parser.add_argument("--compression", default="zstd", help="压缩算法")
+    parser.add_argument("--endpoints", default=None, help="逗号分隔的服务地址，为空时使用默认客户端")
+    parser.add_argument("--settle-ms", type=int, default=60 * 1000, help="结束时间在最近多少毫秒内的分区不记录检查点")
+    parser.add_argument("--no-resume", action="store_true", help="忽略检查点，重新导出全部分区")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,format="[%(name)s][%(asctime)s][%(filename)s:%(lineno)d]\t%(levelname)s\t%(message)s",)
+    # 逐页请求的耗时日志过多，只保留导出进度
+    logging.getLogger(rpcUtils.__name__).setLevel(logging.WARNING)
+    client = None
+    if args.endpoints:
+        from .rpcBalancer import create_client
+        client = create_client(args.endpoints, options=rpcUtils.GRPC_OPTION)
+    stats = export_range(args.types.split(","), args.symbols.split(","), args.start, args.end, args.root,
+                         format=args.format, exchange=args.exchange, account_type=args.account_type,
+                         kline_interval_second=args.interval, page_size=args.page_size,
+                         compression=None if args.compression.lower() == "none" else args.compression,
+                         resume=not args.no_resume, client=client, settle_ms=args.settle_ms)
+    skipped = sum(1 for stat in stats if stat["skipped"])
+    logger.info(f"Exported {len(stats) - skipped} partition(s), skipped {skipped}, "
+                f"{sum(stat['rows'] for stat in stats)} rows in total")
+
+
+if __name__ == '__main__':
+    main()
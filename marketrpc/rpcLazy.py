@@ -0,0 +1,44 @@
+import sys
+import types
+import importlib
+import importlib.util
+
+
+class LazyModule(types.ModuleType):
+    """
+    延迟导入的模块代理，首次访问属性时才真正导入模块
+
+    导入后模块属性复制到代理自身，之后的属性访问不再经过 __getattr__。
+
+    :param name: 模块的完整名称
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_name = name
+
+    def _load(self):
+        module = importlib.import_module(self._lazy_name)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        return f"<lazy module {self._lazy_name!r}>"
+
+
+def lazy_import(name: str, package: str = None):
+    """
+    返回模块或其延迟导入代理；模块已导入时直接返回模块本身
+
+    :param name: 模块名，如 grpc、.market_history_pb2
+    :param package: 相对导入的基准包名，通常传入 __package__
+    :return: 模块或 LazyModule
+    """
+    fullname = importlib.util.resolve_name(name, package) if name.startswith(".") else name
+    module = sys.modules.get(fullname)
+    if module is not None:
+        return module
+    return LazyModule(fullname)
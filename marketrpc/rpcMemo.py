@@ -0,0 +1,150 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .rpcColumns import OUTPUT_RECORDS, OUTPUT_COLUMNS, OUTPUT_NUMPY, OUTPUT_PANDAS, OUTPUT_BOOK
+
+
+def _copy_data(data, output: str):
+    # 缓存保存的对象不交给调用方：行字典与列逐个复制，订单簿档位等嵌套列表仍共享
+    if data is None:
+        return None
+    if output == OUTPUT_RECORDS:
+        return [dict(row) for row in data]
+    if output == OUTPUT_COLUMNS:
+        return {name: values[:] for name, values in data.items()}
+    if output == OUTPUT_NUMPY:
+        return {name: values.copy() for name, values in data.items()}
+    if output == OUTPUT_PANDAS:
+        return data.copy()
+    if output == OUTPUT_BOOK:
+        return type(data)(data.timestamp.copy(), data.uid.copy(), data.pre_uid.copy(), data.bids.copy(), data.asks.copy())
+    return data
+
+
+def _copy_result(value: list, output: str) -> list:
+    return [_copy_data(data, output) for data in value]
+
+
+class QueryMemo(object):
+    """
+    进程内查询结果缓存，按服务地址与规范化后的请求JSON去重，按最近最少使用淘汰
+
+    结束时间落在最近 live_window_ms 内的查询结果可能随新数据变化，只保留 live_ttl 秒；
+    更早的时间段结果不过期。并发的相同请求只会发出一次RPC，其余调用等待该结果。
+    每次返回缓存结果的副本(行字典、列数组逐个复制)，调用方修改返回值不影响缓存；订单簿 records 中的档位列表仍与缓存共享。
+
+    :param max_bytes: 缓存的响应字节数上限(default:256MB)
+    :param live_ttl: 涉及最新数据的结果的有效期(秒)(default:5)
+    :param live_window_ms: 判定为最新数据的时间窗口(毫秒)(default:60000)
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, live_ttl: float = 5.0, live_window_ms: int = 60 * 1000):
+        if max_bytes <= 0:
+            raise ValueError("Max bytes must be greater than 0.")
+        self.max_bytes = max_bytes
+        self.live_ttl = live_ttl
+        self.live_window_ms = live_window_ms
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _expires_at(self, data_request) -> float:
+        try:
+            end_time = json.loads(data_request.jsonData).get("end_time") or 0
+        except ValueError:
+            return time.monotonic() + self.live_ttl
+        if end_time >= time.time() * 1000 - self.live_window_ms:
+            return time.monotonic() + self.live_ttl
+        return None
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, size: int, expires_at: float):
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, expires_at)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def query(self, data_request, output: str, fetch, address: str = ""):
+        """
+        返回缓存结果的副本，未命中时调用 fetch 获取并缓存
+
+        :param data_request: market_history_pb2.DataRequest
+        :param output: 输出格式，作为缓存键的一部分
+        :param fetch: 无参函数，返回 ([数据], 响应字节数)
+        :param address: 服务地址，不同服务的相同请求分别缓存
+        :return: [数据]
+        """
+        key = (address, data_request.type, data_request.jsonData, output)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return _copy_result(entry[0], output)
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return _copy_result(future.result(), output)
+        try:
+            value, size = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            self._store(key, value, size, self._expires_at(data_request))
+        future.set_result(value)
+        return _copy_result(value, output)
+
+    def stats(self) -> dict:
+        """
+        命中统计
+
+        :return: {"hits", "misses", "coalesced", "evictions", "entries", "bytes"}
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+            }
+
+    def clear(self):
+        """
+        清空缓存，不影响进行中的请求
+        """
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
@@ -0,0 +1,316 @@
+import time
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 已注册的指标回调；为空时各调用点不计时也不创建指标对象
+_hooks = []
+_hooks_lock = threading.Lock()
+
+# 请求的各阶段：构造请求、等待RPC响应、解压与JSON解析、转换输出格式
+PHASES = ("build", "rpc", "decode", "post", "total")
+
+# 直方图默认分桶上界(毫秒)
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+def add_hook(hook):
+    """
+    注册指标回调，每个请求结束后以 RequestMetrics 调用一次；回调在请求线程中同步执行，应尽量轻量
+
+    :param hook: 可调用对象，如 HistogramSink、PrometheusSink 实例
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + [hook]
+
+
+def remove_hook(hook):
+    """
+    移除指标回调
+
+    :param hook: 已注册的回调
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = [registered for registered in _hooks if registered is not hook]
+
+
+def clear_hooks():
+    """
+    移除全部指标回调
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = []
+
+
+def enabled() -> bool:
+    """
+    是否有已注册的指标回调
+
+    :return: 是否开启
+    """
+    return bool(_hooks)
+
+
+def clock() -> int:
+    """
+    开启指标时返回 perf_counter_ns，否则返回0，供调用方标记请求构造的开始时间
+
+    :return: 纳秒时间戳
+    """
+    return time.perf_counter_ns() if _hooks else 0
+
+
+class RequestMetrics(object):
+    """
+    单次请求的指标，各阶段耗时单位为纳秒
+
+    :param method: 调用方式 queryData / queryBatch / streamData / memo
+    :param type: 数据类型
+    :param start_ns: 请求开始时间(perf_counter_ns)，包含构造请求的时间
+    """
+
+    __slots__ = ("method", "type", "start_ns", "build_ns", "rpc_ns", "decode_ns", "post_ns", "total_ns",
+                 "bytes", "rows", "code", "error")
+
+    def __init__(self, method: str, type: str, start_ns: int):
+        self.method = method
+        self.type = type
+        self.start_ns = start_ns
+        self.build_ns = 0
+        self.rpc_ns = 0
+        self.decode_ns = 0
+        self.post_ns = 0
+        self.total_ns = 0
+        self.bytes = 0
+        self.rows = 0
+        self.code = "OK"
+        self.error = None
+
+    def as_dict(self) -> dict:
+        """
+        转换为字典
+
+        :return: 字段名到值的映射
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def begin(method: str, type: str, build_start: int = 0):
+    """
+    开始记录一次请求，未开启指标时返回None
+
+    :param method: 调用方式
+    :param type: 数据类型
+    :param build_start: 构造请求开始的 clock() 值，为0时不统计构造耗时
+    :return: RequestMetrics 或 None
+    """
+    if not _hooks:
+        return None
+    now = time.perf_counter_ns()
+    metrics = RequestMetrics(method, type, build_start or now)
+    if build_start:
+        metrics.build_ns = now - build_start
+    return metrics
+
+
+def finish(metrics: RequestMetrics, error: BaseException = None):
+    """
+    结束记录并调用全部回调，回调抛出的异常只记录日志
+
+    :param metrics: begin 返回的指标对象，为None时直接返回
+    :param error: 请求失败时的异常
+    """
+    if metrics is None:
+        return
+    metrics.total_ns = time.perf_counter_ns() - metrics.start_ns
+    if error is not None:
+        code = getattr(error, "code", None)
+        metrics.code = code().name if callable(code) else type(error).__name__
+        metrics.error = str(error)
+    for hook in _hooks:
+        try:
+            hook(metrics)
+        except Exception:
+            logger.exception(f"Metrics hook {hook!r} failed")
+
+
+class _Histogram(object):
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        # 在所在分桶内线性插值，超出最大分桶时返回最大上界
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.bounds):
+                    return float(self.bounds[-1])
+                lower = self.bounds[index - 1] if index else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return float(self.bounds[-1])
+
+
+class HistogramSink(object):
+    """
+    指标回调，按 (调用方式, 数据类型) 汇总各阶段耗时直方图、请求数、错误码、字节数与行数
+
+    :param buckets: 分桶上界(毫秒)，升序
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS_MS):
+        if list(buckets) != sorted(buckets) or not buckets:
+            raise ValueError("Buckets must be a non-empty ascending sequence.")
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def __call__(self, metrics: RequestMetrics):
+        key = (metrics.method, metrics.type)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "requests": 0,
+                    "codes": {},
+                    "bytes": 0,
+                    "rows": 0,
+                    "phases": {phase: _Histogram(self.buckets) for phase in PHASES},
+                }
+            series["requests"] += 1
+            series["codes"][metrics.code] = series["codes"].get(metrics.code, 0) + 1
+            series["bytes"] += metrics.bytes
+            series["rows"] += metrics.rows
+            for phase in PHASES:
+                series["phases"][phase].observe(getattr(metrics, f"{phase}_ns") / 1e6)
+
+    def snapshot(self) -> dict:
+        """
+        当前汇总值
+
+        :return: {(调用方式, 数据类型): {"requests", "codes", "bytes", "rows", "phases": {阶段: {"count", "sum_ms", "p50_ms", "p90_ms", "p99_ms"}}}}
+        """
+        with self._lock:
+            result = {}
+            for key, series in self._series.items():
+                result[key] = {
+                    "requests": series["requests"],
+                    "codes": dict(series["codes"]),
+                    "bytes": series["bytes"],
+                    "rows": series["rows"],
+                    "phases": {phase: {
+                        "count": histogram.count,
+                        "sum_ms": histogram.sum,
+                        "p50_ms": histogram.quantile(0.5),
+                        "p90_ms": histogram.quantile(0.9),
+                        "p99_ms": histogram.quantile(0.99),
+                    } for phase, histogram in series["phases"].items()},
+                }
+            return result
+
+    def reset(self):
+        """
+        清空汇总值
+        """
+        with self._lock:
+            self._series = {}
+
+
+class PrometheusSink(HistogramSink):
+    """
+    以Prometheus文本格式导出汇总指标的回调，耗时单位为秒
+
+    :param buckets: 分桶上界(毫秒)，升序
+    :param prefix: 指标名前缀(default:marketrpc)
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS_MS, prefix: str = "marketrpc"):
+        super().__init__(buckets)
+        self.prefix = prefix
+
+    def render(self) -> str:
+        """
+        生成Prometheus文本格式的指标
+
+        :return: 指标文本
+        """
+        prefix = self.prefix
+        lines = [
+            f"# HELP {prefix}_requests_total Requests by method, type and status code.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        with self._lock:
+            series = {key: (dict(value["codes"]), value["bytes"], value["rows"],
+                            {phase: (list(h.counts), h.count, h.sum) for phase, h in value["phases"].items()})
+                      for key, value in self._series.items()}
+        for (method, type), (codes, _, _, _) in series.items():
+            for code, count in codes.items():
+                lines.append(f'{prefix}_requests_total{{method="{method}",type="{type}",code="{code}"}} {count}')
+        for name, index, help_text in (("received_bytes", 1, "Response bytes received."),
+                                       ("rows", 2, "Rows returned.")):
+            lines.append(f"# HELP {prefix}_{name}_total {help_text}")
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (method, type), values in series.items():
+                lines.append(f'{prefix}_{name}_total{{method="{method}",type="{type}"}} {values[index]}')
+        lines.append(f"# HELP {prefix}_phase_seconds Request latency by phase.")
+        lines.append(f"# TYPE {prefix}_phase_seconds histogram")
+        for (method, type), (_, _, _, phases) in series.items():
+            for phase, (counts, count, total) in phases.items():
+                labels = f'method="{method}",type="{type}",phase="{phase}"'
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{prefix}_phase_seconds_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'{prefix}_phase_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{prefix}_phase_seconds_sum{{{labels}}} {total / 1000:.9f}")
+                lines.append(f"{prefix}_phase_seconds_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def start_http_server(sink: PrometheusSink, port: int, address: str = "0.0.0.0"):
+    """
+    在后台线程启动HTTP服务，在 /metrics 路径提供 sink 的指标文本
+
+    :param sink: PrometheusSink 实例
+    :param port: 监听端口，为0时自动分配
+    :param address: 监听地址(default:0.0.0.0)
+    :return: ThreadingHTTPServer，调用 shutdown() 停止
+    """
+    # http.server 仅在启动导出服务时导入
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = sink.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    threading.Thread(target=server.serve_forever, name="marketrpc-metrics", daemon=True).start()
+    logger.info(f"Metrics server listening on port {server.server_address[1]}")
+    return server
@@ -0,0 +1,661 @@
+import os
+import json
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 订单簿的标量列；档位数据按 (快照, 档位, 价格/数量) 保存在 bids / asks 三维数组中
+BOOK_COLUMNS = ("Timestamp", "UId", "PreUId")
+PRICE = 0
+QUANTITY = 1
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("OrderBookFrame requires numpy to be installed.") from e
+    return np
+
+
+def book_levels(values, depth: int) -> tuple:
+    """
+    将一列 Bids 或 Asks 转换为二维价格与数量数组
+
+    :param values: 每行为 [[价格, 数量], ...] 的序列，价格与数量可以是字符串
+    :param depth: 保留的档位数
+    :return: (价格, 数量)，形状为 (行数, depth) 的 float64 数组，档位不足时为 NaN
+    """
+    np = _numpy()
+    count = len(values)
+    try:
+        # 各行档位数都不少于 depth 时整体转换
+        levels = np.array([row[:depth] for row in values], dtype=np.float64)
+        if levels.shape == (count, depth, 2):
+            return levels[:, :, PRICE], levels[:, :, QUANTITY]
+    except (ValueError, TypeError):
+        pass
+    prices = np.full((count, depth), np.nan)
+    quantities = np.full((count, depth), np.nan)
+    for index, row in enumerate(values):
+        size = min(depth, len(row))
+        if size:
+            levels = np.asarray(row[:size], dtype=np.float64)
+            prices[index, :size] = levels[:, PRICE]
+            quantities[index, :size] = levels[:, QUANTITY]
+    return prices, quantities
+
+
+class OrderBookFrame(object):
+    """
+    订单簿的紧凑列式表示：Timestamp / UId / PreUId 为一维 int64 数组，买卖档位为形状 (快照数, 档位数, 2) 的
+    float64 数组，最后一维依次为价格与数量，档位不足时为 NaN
+
+    按位置、时间或档位切片时返回共享内存的视图，可保存为目录并以内存映射方式加载。
+
+    :param timestamp: 快照时间戳
+    :param uid: 快照 UId
+    :param pre_uid: 快照 PreUId
+    :param bids: 买盘档位
+    :param asks: 卖盘档位
+    """
+
+    def __init__(self, timestamp, uid, pre_uid, bids, asks):
+        if not (len(timestamp) == len(uid) == len(pre_uid) == len(bids) == len(asks)):
+            raise ValueError("All columns must have the same length.")
+        if bids.ndim != 3 or asks.ndim != 3 or bids.shape[2] != 2 or asks.shape[2] != 2:
+            raise ValueError("Bids and asks must have shape (snapshots, levels, 2).")
+        self.timestamp = timestamp
+        self.uid = uid
+        self.pre_uid = pre_uid
+        self.bids = bids
+        self.asks = asks
+
+    @classmethod
+    def empty(cls, depth: int = 0):
+        """
+        空的订单簿
+
+        :param depth: 档位数
+        :return: OrderBookFrame
+        """
+        np = _numpy()
+        ids = np.empty(0, dtype=np.int64)
+        return cls(ids, ids, ids, np.empty((0, depth, 2)), np.empty((0, depth, 2)))
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, depth: int = None):
+        """
+        由列字典创建，Bids / Asks 列为每行的 [[价格, 数量], ...]
+
+        :param arrays: 列名到数组或列表的映射，如 numpy / columns 格式的订单簿
+        :param depth: 保留的档位数，为空时取最大档位数
+        :return: OrderBookFrame
+        """
+        np = _numpy()
+        if not arrays or not len(arrays.get("Timestamp", ())):
+            return cls.empty(depth or 0)
+        count = len(arrays["Timestamp"])
+        if depth is None:
+            depth = max((len(row) for side in ("Bids", "Asks") for row in arrays.get(side, ())), default=0)
+        sides = []
+        for side in ("Bids", "Asks"):
+            values = arrays.get(side)
+            levels = np.full((count, depth, 2), np.nan)
+            if values is not None and depth:
+                prices, quantities = book_levels(values, depth)
+                levels[:, :, PRICE] = prices
+                levels[:, :, QUANTITY] = quantities
+            sides.append(levels)
+        columns = [np.asarray(arrays.get(name, np.zeros(count)), dtype=np.int64) for name in BOOK_COLUMNS]
+        return cls(*columns, *sides)
+
+    @classmethod
+    def from_records(cls, rows: list, depth: int = None):
+        """
+        由行字典列表创建
+
+        :param rows: market_orderbook 返回的行字典列表
+        :param depth: 保留的档位数，为空时取最大档位数
+        :return: OrderBookFrame
+        """
+        arrays = {name: [row.get(name, 0) for row in rows] for name in BOOK_COLUMNS}
+        arrays["Bids"] = [row.get("Bids") or [] for row in rows]
+        arrays["Asks"] = [row.get("Asks") or [] for row in rows]
+        return cls.from_arrays(arrays if rows else {}, depth)
+
+    @classmethod
+    def from_batch(cls, batch, depth: int = None):
+        """
+        由 OrderBookBatch 的平铺档位直接创建，不生成嵌套列表
+
+        :param batch: market_history_pb2.OrderBookBatch
+        :param depth: 保留的档位数，为空时取最大档位数
+        :return: OrderBookFrame
+        """
+        np = _numpy()
+        count = len(batch.timestamp)
+        columns = [np.fromiter(getattr(batch, field), dtype=np.int64, count=count)
+                   for field in ("timestamp", "u_id", "pre_u_id")]
+        sides = []
+        side_depths = []
+        for prefix in ("bid", "ask"):
+            depths = np.fromiter(getattr(batch, f"{prefix}_depth"), dtype=np.int64, count=count)
+            side_depths.append(depths)
+        if depth is None:
+            depth = int(max((depths.max() for depths in side_depths if len(depths)), default=0))
+        for prefix, depths in zip(("bid", "ask"), side_depths):
+            levels = np.full((count, depth, 2), np.nan)
+            total = int(depths.sum())
+            if total and depth:
+                prices = np.fromiter(getattr(batch, f"{prefix}_price"), dtype=np.float64, count=total)
+                quantities = np.fromiter(getattr(batch, f"{prefix}_quantity"), dtype=np.float64, count=total)
+                # 每个档位所属的快照与在快照内的序号，超过 depth 的档位丢弃
+                rows = np.repeat(np.arange(count), depths)
+                offsets = np.concatenate(([0], np.cumsum(depths)[:-1]))
+                positions = np.arange(total) - np.repeat(offsets, depths)
+                keep = positions < depth
+                levels[rows[keep], positions[keep], PRICE] = prices[keep]
+                levels[rows[keep], positions[keep], QUANTITY] = quantities[keep]
+            sides.append(levels)
+        return cls(*columns, *sides)
+
+    @classmethod
+    def concat(cls, frames: list):
+        """
+        按顺序拼接多个订单簿，档位数不同时按最大档位数补 NaN
+
+        :param frames: OrderBookFrame 列表
+        :return: OrderBookFrame
+        """
+        np = _numpy()
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls.empty()
+        if len(frames) == 1:
+            return frames[0]
+        depth = max(frame.depth for frame in frames)
+        frames = [frame.resize(depth) for frame in frames]
+        return cls(np.concatenate([frame.timestamp for frame in frames]),
+                   np.concatenate([frame.uid for frame in frames]),
+                   np.concatenate([frame.pre_uid for frame in frames]),
+                   np.concatenate([frame.bids for frame in frames]),
+                   np.concatenate([frame.asks for frame in frames]))
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __repr__(self) -> str:
+        return f"OrderBookFrame(snapshots={len(self)}, depth={self.depth})"
+
+    @property
+    def depth(self) -> int:
+        """
+        档位数
+        """
+        return self.bids.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        数组占用的字节数
+        """
+        return sum(values.nbytes for values in (self.timestamp, self.uid, self.pre_uid, self.bids, self.asks))
+
+    @property
+    def bid_prices(self):
+        """
+        买盘价格，形状 (快照数, 档位数) 的视图
+        """
+        return self.bids[:, :, PRICE]
+
+    @property
+    def bid_quantities(self):
+        """
+        买盘数量，形状 (快照数, 档位数) 的视图
+        """
+        return self.bids[:, :, QUANTITY]
+
+    @property
+    def ask_prices(self):
+        """
+        卖盘价格，形状 (快照数, 档位数) 的视图
+        """
+        return self.asks[:, :, PRICE]
+
+    @property
+    def ask_quantities(self):
+        """
+        卖盘数量，形状 (快照数, 档位数) 的视图
+        """
+        return self.asks[:, :, QUANTITY]
+
+    def column(self, name: str):
+        """
+        获取标量列，Time 列按需生成
+
+        :param name: Timestamp / UId / PreUId / Time
+        :return: 数组
+        """
+        if name == "Timestamp":
+            return self.timestamp
+        if name == "UId":
+            return self.uid
+        if name == "PreUId":
+            return self.pre_uid
+        if name == "Time":
+            from .rpcBinary import _format_times
+            np = _numpy()
+            times = np.empty(len(self), dtype=object)
+            times[:] = _format_times(self.timestamp.tolist())
+            return times
+        raise KeyError(name)
+
+    def slice(self, start: int = None, stop: int = None):
+        """
+        按位置切片，返回视图
+
+        :param start: 开始位置
+        :param stop: 结束位置
+        :return: OrderBookFrame
+        """
+        return OrderBookFrame(self.timestamp[start:stop], self.uid[start:stop], self.pre_uid[start:stop],
+                              self.bids[start:stop], self.asks[start:stop])
+
+    def between(self, start_time: int, end_time: int):
+        """
+        按时间切片 [start_time, end_time]，需按时间升序，返回视图
+
+        :param start_time: 开始毫秒时间戳
+        :param end_time: 结束毫秒时间戳
+        :return: OrderBookFrame
+        """
+        np = _numpy()
+        start = int(np.searchsorted(self.timestamp, start_time, side="left"))
+        stop = int(np.searchsorted(self.timestamp, end_time, side="right"))
+        return self.slice(start, stop)
+
+    def top(self, depth: int):
+        """
+        只保留前 depth 档，返回视图
+
+        :param depth: 档位数
+        :return: OrderBookFrame
+        """
+        return OrderBookFrame(self.timestamp, self.uid, self.pre_uid, self.bids[:, :depth], self.asks[:, :depth])
+
+    def resize(self, depth: int):
+        """
+        调整档位数：减少时返回视图，增加时复制并补 NaN
+
+        :param depth: 档位数
+        :return: OrderBookFrame
+        """
+        if depth <= self.depth:
+            return self.top(depth)
+        np = _numpy()
+        sides = []
+        for levels in (self.bids, self.asks):
+            padded = np.full((len(levels), depth, 2), np.nan)
+            padded[:, :levels.shape[1]] = levels
+            sides.append(padded)
+        return OrderBookFrame(self.timestamp, self.uid, self.pre_uid, *sides)
+
+    def at(self, timestamp: int) -> int:
+        """
+        时间戳之前(含)最后一个快照的位置，需按时间升序
+
+        :param timestamp: 毫秒时间戳
+        :return: 位置，没有更早的快照时为 -1
+        """
+        np = _numpy()
+        return int(np.searchsorted(self.timestamp, timestamp, side="right")) - 1
+
+    def to_numpy(self) -> dict:
+        """
+        转换为与 market_orderbook(output="numpy") 相同结构的列字典，档位为 [[价格, 数量], ...] 列表
+
+        :return: 列名到 numpy 数组的映射
+        """
+        np = _numpy()
+        arrays = {"Time": self.column("Time"), "Timestamp": self.timestamp, "UId": self.uid, "PreUId": self.pre_uid}
+        for name, levels in (("Bids", self.bids), ("Asks", self.asks)):
+            values = np.empty(len(self), dtype=object)
+            values[:] = [[level for level in row if level[PRICE] == level[PRICE]] for row in levels.tolist()]
+            arrays[name] = values
+        return arrays
+
+    def save(self, path: str):
+        """
+        保存为目录，每列一个 .npy 文件
+
+        :param path: 目录路径，不存在时创建
+        """
+        np = _numpy()
+        os.makedirs(path, exist_ok=True)
+        for name, values in (("Timestamp", self.timestamp), ("UId", self.uid), ("PreUId", self.pre_uid),
+                             ("Bids", self.bids), ("Asks", self.asks)):
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(values))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"snapshots": len(self), "depth": self.depth}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """
+        从 save 保存的目录加载
+
+        :param path: 目录路径
+        :param mmap: 是否以只读内存映射方式加载，按需从磁盘读取(default:True)
+        :return: OrderBookFrame
+        """
+        np = _numpy()
+        mode = "r" if mmap else None
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+                  for name in ("Timestamp", "UId", "PreUId", "Bids", "Asks")]
+        return cls(*arrays)
+
+
+# 遇到 PreUId 不连续时的处理方式：refetch 重新拉取缺失区间，reset 以当前行重建订单簿，raise 抛出异常
+GAP_REFETCH = "refetch"
+GAP_RESET = "reset"
+GAP_RAISE = "raise"
+GAP_POLICIES = (GAP_REFETCH, GAP_RESET, GAP_RAISE)
+
+# 行的应用方式：diff 为增量更新(数量为0时删除该档)，snapshot 为整体替换
+MODE_DIFF = "diff"
+MODE_SNAPSHOT = "snapshot"
+MODES = (MODE_DIFF, MODE_SNAPSHOT)
+
+
+class BookSide(object):
+    """
+    订单簿一侧的价格档位，价格到数量的字典加有序价格列表，最优价在前
+
+    :param descending: 是否按价格降序排列(买盘为True)
+    """
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        self._quantities = {}
+        # 买盘保存负价格，使两侧都按升序维护且最优价在列表开头
+        self._keys = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _key(self, price: float) -> float:
+        return -price if self.descending else price
+
+    def set(self, price: float, quantity: float):
+        """
+        设置档位数量，数量为0时删除该档
+
+        :param price: 价格
+        :param quantity: 数量
+        """
+        key = self._key(price)
+        if quantity == 0:
+            if self._quantities.pop(price, None) is not None:
+                del self._keys[bisect.bisect_left(self._keys, key)]
+            return
+        if price not in self._quantities:
+            bisect.insort(self._keys, key)
+        self._quantities[price] = quantity
+
+    def replace(self, levels):
+        """
+        整体替换档位
+
+        :param levels: [[价格, 数量], ...]
+        """
+        self._quantities = {}
+        for price, quantity in levels:
+            price = float(price)
+            quantity = float(quantity)
+            if quantity:
+                self._quantities[price] = quantity
+        self._keys = sorted(self._key(price) for price in self._quantities)
+
+    def best(self):
+        """
+        最优价格档位
+
+        :return: (价格, 数量)，没有档位时为None
+        """
+        if not self._keys:
+            return None
+        price = self._key(self._keys[0])
+        return price, self._quantities[price]
+
+    def levels(self, depth: int = None) -> list:
+        """
+        从最优价开始的前 depth 档
+
+        :param depth: 档位数，为空时返回全部
+        :return: [[价格, 数量], ...]
+        """
+        keys = self._keys if depth is None else self._keys[:depth]
+        return [[self._key(key), self._quantities[self._key(key)]] for key in keys]
+
+
+class BookBuilder(object):
+    """
+    按 UId / PreUId 链重建订单簿，输入需按 UId 升序
+
+    每行的 PreUId 应等于上一行的 UId：UId 不大于当前 UId 的重复行被跳过；出现缺口时按 on_gap 处理，
+    refetch 通过 fetch 拉取缺失时间段并补上缺失的行，仍无法衔接时以当前行重建订单簿并计入 gaps。
+
+    :param mode: 行的应用方式 diff(增量更新，数量为0删除该档) / snapshot(整体替换)(default:diff)
+    :param on_gap: 缺口处理方式 refetch / reset / raise(default:refetch)
+    :param fetch: fetch(开始时间戳, 结束时间戳)，返回该区间内的行字典列表，用于补齐缺口
+    """
+
+    def __init__(self, mode: str = MODE_DIFF, on_gap: str = GAP_REFETCH, fetch=None):
+        if mode not in MODES:
+            raise ValueError(f"Mode must be one of {', '.join(MODES)}.")
+        if on_gap not in GAP_POLICIES:
+            raise ValueError(f"On gap must be one of {', '.join(GAP_POLICIES)}.")
+        self.mode = mode
+        self.on_gap = on_gap
+        self.fetch = fetch
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.uid = None
+        self.timestamp = None
+        self.updates = 0
+        self.skipped = 0
+        self.gaps = 0
+        self.refetched = 0
+
+    def _apply(self, row: dict, replace: bool = False):
+        if replace or self.mode == MODE_SNAPSHOT:
+            self.bids.replace(row.get("Bids") or [])
+            self.asks.replace(row.get("Asks") or [])
+        else:
+            for side, name in ((self.bids, "Bids"), (self.asks, "Asks")):
+                for price, quantity in row.get(name) or []:
+                    side.set(float(price), float(quantity))
+        self.uid = int(row["UId"])
+        self.timestamp = int(row["Timestamp"])
+        self.updates += 1
+
+    def _refetch(self, row: dict) -> bool:
+        # 拉取上一行与当前行之间的数据，按链补上缺失的行；成功衔接到当前行时返回True
+        try:
+            missing = self.fetch(self.timestamp, int(row["Timestamp"])) or []
+        except Exception as e:
+            logger.warning(f"Failed to refetch orderbook gap {self.uid} -> {row['PreUId']}: {e}")
+            return False
+        by_pre_uid = {int(item["PreUId"]): item for item in missing}
+        pending = []
+        uid = self.uid
+        while uid != int(row["PreUId"]):
+            item = by_pre_uid.get(uid)
+            if item is None or int(item["UId"]) >= int(row["UId"]):
+                return False
+            pending.append(item)
+            uid = int(item["UId"])
+        for item in pending:
+            self._apply(item)
+        self.refetched += len(pending)
+        return True
+
+    def apply(self, row: dict) -> bool:
+        """
+        应用一行订单簿数据
+
+        :param row: 含 Timestamp / UId / PreUId / Bids / Asks 的行字典
+        :return: 是否已应用，重复的旧行返回False
+        :raises ValueError: on_gap 为 raise 时出现缺口
+        """
+        uid = int(row["UId"])
+        if self.uid is None:
+            self._apply(row, replace=True)
+            return True
+        if uid <= self.uid:
+            self.skipped += 1
+            return False
+        if int(row["PreUId"]) != self.uid:
+            if self.on_gap == GAP_RAISE:
+                raise ValueError(f"Orderbook gap: expected PreUId {self.uid}, got {row['PreUId']} at UId {uid}.")
+            if not (self.on_gap == GAP_REFETCH and self.fetch is not None and self._refetch(row)):
+                logger.warning(f"Orderbook gap {self.uid} -> {row['PreUId']}, rebuilding from UId {uid}")
+                self.gaps += 1
+                self._apply(row, replace=True)
+                return True
+        self._apply(row)
+        return True
+
+    def update(self, page):
+        """
+        按顺序应用一页数据
+
+        :param page: 任意输出格式的一页订单簿，包括 OrderBookFrame
+        """
+        for row in _iter_rows(page):
+            self.apply(row)
+
+    def best_bid(self):
+        """
+        买一档
+
+        :return: (价格, 数量)，没有档位时为None
+        """
+        return self.bids.best()
+
+    def best_ask(self):
+        """
+        卖一档
+
+        :return: (价格, 数量)，没有档位时为None
+        """
+        return self.asks.best()
+
+    def snapshot(self, depth: int = None) -> dict:
+        """
+        当前订单簿，结构与 market_orderbook 的行相同
+
+        :param depth: 档位数，为空时返回全部
+        :return: {"Timestamp", "UId", "Bids", "Asks"}
+        """
+        return {"Timestamp": self.timestamp, "UId": self.uid,
+                "Bids": self.bids.levels(depth), "Asks": self.asks.levels(depth)}
+
+
+def _iter_rows(page):
+    # 将任意输出格式的一页订单簿逐行转换为行字典
+    if isinstance(page, list):
+        yield from page
+        return
+    if isinstance(page, OrderBookFrame):
+        page = page.to_numpy()
+    elif hasattr(page, "iloc"):
+        page = {name: page[name].to_numpy() for name in page.columns}
+    names = [name for name in ("Timestamp", "UId", "PreUId", "Bids", "Asks") if name in page]
+    for values in zip(*[page[name] for name in names]):
+        yield dict(zip(names, values))
+
+
+class OrderBookReplay(object):
+    """
+    按时间前进的订单簿回放，消费分页数据并维护 BookBuilder，可查询任意时刻(不早于上次查询)的订单簿
+
+    :param rows: 按 UId 升序的行字典迭代器
+    :param builder: BookBuilder
+    """
+
+    def __init__(self, rows, builder: BookBuilder):
+        self.builder = builder
+        self._rows = iter(rows)
+        self._next = None
+        self._position = None
+
+    def advance(self, timestamp: int) -> BookBuilder:
+        """
+        应用时间戳不晚于 timestamp 的全部行
+
+        :param timestamp: 毫秒时间戳
+        :return: BookBuilder
+        :raises ValueError: 时间早于上次查询
+        """
+        if self._position is not None and timestamp < self._position:
+            raise ValueError("Timestamp must not be earlier than the previous query.")
+        self._position = timestamp
+        while True:
+            if self._next is None:
+                self._next = next(self._rows, None)
+                if self._next is None:
+                    break
+            if int(self._next["Timestamp"]) > timestamp:
+                break
+            self.builder.apply(self._next)
+            self._next = None
+        return self.builder
+
+    def at(self, timestamp: int, depth: int = None) -> dict:
+        """
+        timestamp 时刻的订单簿
+
+        :param timestamp: 毫秒时间戳
+        :param depth: 档位数，为空时返回全部
+        :return: {"Timestamp", "UId", "Bids", "Asks"}，Timestamp 为最后应用的行的时间戳
+        """
+        return self.advance(timestamp).snapshot(depth)
+
+    def best(self, timestamp: int) -> tuple:
+        """
+        timestamp 时刻的买一与卖一
+
+        :param timestamp: 毫秒时间戳
+        :return: ((买一价, 数量), (卖一价, 数量))
+        """
+        builder = self.advance(timestamp)
+        return builder.best_bid(), builder.best_ask()
+
+
+# 查询订单簿并按 UId 链重建
+def orderbook_replay(exchange: str, account_type: str, symbol: str, start_time: any, end_time: any,
+                     mode: str = MODE_DIFF, on_gap: str = GAP_REFETCH, **kwargs) -> OrderBookReplay:
+    """
+    分页拉取 [start_time, end_time] 内的订单簿数据并按 UId / PreUId 链回放，缺口通过 market_orderbook 补齐
+
+    :param exchange: 交易所名称
+    :param account_type: 账户类型
+    :param symbol: 交易对
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param mode: 行的应用方式 diff / snapshot(default:diff)
+    :param on_gap: 缺口处理方式 refetch / reset / raise(default:refetch)
+    :param kwargs: 传给 iter_orderbook / market_orderbook 的其他参数，如 schema、client
+    :return: OrderBookReplay
+    """
+    from . import rpcUtils
+
+    def fetch(start: int, end: int) -> list:
+        page = rpcUtils.market_orderbook(exchange, account_type, symbol, start, end, cache=False, **kwargs)[0]
+        return [] if page is None else list(_iter_rows(page))
+
+    pages = rpcUtils.iter_orderbook(exchange, account_type, symbol, start_time, end_time, pages=True, **kwargs)
+    rows = (row for page in pages for row in _iter_rows(page))
+    return OrderBookReplay(rows, BookBuilder(mode, on_gap, fetch))
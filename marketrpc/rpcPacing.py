@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import threading
+
+from . import rpcMetrics
+
+# iter_kline 等分页函数的 limit 取该值时按 AdaptivePageSize 自动调整每页数据数量
+LIMIT_AUTO = "auto"
+
+# 各数据类型的初始页大小；订单簿单行较大，从较小的页开始
+DEFAULT_INITIAL_ROWS = {
+    "KLINE": 10000,
+    "AGG_TRADE": 10000,
+    "ORDER_BOOK": 1000,
+}
+
+
+class AdaptivePageSize(object):
+    """
+    按数据类型自适应的分页大小
+
+    注册为 rpcMetrics 回调后，从每个成功请求的行数、响应字节数与总耗时学习：接近满页的请求按
+    rows * target_seconds / 耗时 平滑调整页大小(每次最多减半或翻倍)，同时按每行平均字节数限制单页不超过 max_bytes。
+
+    :param target_seconds: 目标单页耗时(秒)，包含等待RPC与解析(default:0.5)
+    :param max_bytes: 单页响应字节数上限(default:8MB)
+    :param min_rows: 页大小下限(default:100)
+    :param max_rows: 页大小上限，不超过服务端限制10000(default:10000)
+    :param initial: 各数据类型的初始页大小，为空时使用 DEFAULT_INITIAL_ROWS
+    """
+
+    def __init__(self, target_seconds: float = 0.5, max_bytes: int = 8 * 1024 * 1024, min_rows: int = 100,
+                 max_rows: int = 10000, initial: dict = None):
+        if target_seconds <= 0:
+            raise ValueError("Target seconds must be greater than 0.")
+        if max_bytes <= 0:
+            raise ValueError("Max bytes must be greater than 0.")
+        if not 1 <= min_rows <= max_rows <= 10000:
+            raise ValueError("Rows must satisfy 1 <= min_rows <= max_rows <= 10000.")
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.initial = dict(DEFAULT_INITIAL_ROWS if initial is None else initial)
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def _get_state(self, type: str) -> dict:
+        # 调用方需持有 self._lock
+        state = self._state.get(type)
+        if state is None:
+            size = self._clamp(self.initial.get(type, self.max_rows))
+            state = self._state[type] = {"rows": size, "bytes_per_row": None, "seconds": None, "samples": 0}
+        return state
+
+    def _clamp(self, rows: float) -> int:
+        return int(min(self.max_rows, max(self.min_rows, rows)))
+
+    def page_size(self, type: str) -> int:
+        """
+        当前建议的页大小
+
+        :param type: 数据类型
+        :return: 每页数据数量
+        """
+        with self._lock:
+            return self._get_state((type or "").upper())["rows"]
+
+    def record(self, type: str, rows: int, seconds: float, nbytes: int):
+        """
+        记录一次请求的观测值
+
+        :param type: 数据类型
+        :param rows: 返回行数
+        :param seconds: 请求总耗时(秒)
+        :param nbytes: 响应字节数
+        """
+        if rows <= 0:
+            return
+        with self._lock:
+            state = self._get_state((type or "").upper())
+            current = state["rows"]
+            state["samples"] += 1
+            state["seconds"] = seconds if state["seconds"] is None else 0.8 * state["seconds"] + 0.2 * seconds
+            size = current
+            if nbytes:
+                bytes_per_row = nbytes / rows
+                previous = state["bytes_per_row"]
+                state["bytes_per_row"] = bytes_per_row if previous is None else 0.8 * previous + 0.2 * bytes_per_row
+            # 不足半页的请求(如区间末尾)不能反映页大小与耗时的关系
+            if rows * 2 >= current and seconds > 0:
+                scaled = rows * self.target_seconds / seconds
+                size = min(current * 2, max(current / 2, 0.7 * current + 0.3 * scaled))
+            if state["bytes_per_row"]:
+                size = min(size, self.max_bytes / state["bytes_per_row"])
+            state["rows"] = self._clamp(size)
+
+    def __call__(self, metrics):
+        # 作为 rpcMetrics 回调，只学习成功的 queryData / queryBatch 请求
+        if metrics.code != "OK" or metrics.method not in ("queryData", "queryBatch"):
+            return
+        self.record(metrics.type, metrics.rows, metrics.total_ns / 1e9, metrics.bytes)
+
+    def stats(self) -> dict:
+        """
+        各数据类型的学习状态
+
+        :return: {数据类型: {rows, bytes_per_row, seconds, samples}}
+        """
+        with self._lock:
+            return {type: dict(state) for type, state in self._state.items()}
+
+
+_default_page_sizer = None
+_default_page_sizer_lock = threading.Lock()
+
+
+def get_page_sizer() -> AdaptivePageSize:
+    """
+    获取 limit="auto" 使用的共享 AdaptivePageSize，首次调用时创建并注册为 rpcMetrics 回调
+
+    :return: AdaptivePageSize
+    """
+    global _default_page_sizer
+    if _default_page_sizer is None:
+        with _default_page_sizer_lock:
+            if _default_page_sizer is None:
+                sizer = AdaptivePageSize()
+                rpcMetrics.add_hook(sizer)
+                _default_page_sizer = sizer
+    return _default_page_sizer
+
+
+def set_page_sizer(sizer: AdaptivePageSize):
+    """
+    替换 limit="auto" 使用的 AdaptivePageSize，新对象注册为 rpcMetrics 回调，旧对象随之移除
+
+    :param sizer: AdaptivePageSize，为None时仅移除当前对象
+    """
+    global _default_page_sizer
+    with _default_page_sizer_lock:
+        if _default_page_sizer is not None:
+            rpcMetrics.remove_hook(_default_page_sizer)
+        if sizer is not None:
+            rpcMetrics.add_hook(sizer)
+        _default_page_sizer = sizer
+
+
+def page_limit(limit: any, type: str) -> int:
+    """
+    分页函数每页请求的数据数量
+
+    :param limit: 整数，或 "auto" 表示按共享的 AdaptivePageSize 取值
+    :param type: 数据类型
+    :return: 每页数据数量
+    """
+    if limit == LIMIT_AUTO:
+        return get_page_sizer().page_size(type)
+    return limit
+
+
+class TokenBucket(object):
+    """
+    令牌桶，可在线程间共享；指定 path 时桶的状态保存在文件中并以文件锁同步，同一主机上使用相同 path 的进程共享配额
+
+    :param rate: 每秒补充的令牌数
+    :param burst: 桶容量，为空时等于 rate
+    :param path: 共享状态文件路径，为空时只在本进程内共享；各进程应使用相同的 rate 与 burst
+    """
+
+    def __init__(self, rate: float, burst: float = None, path: str = None):
+        if rate <= 0:
+            raise ValueError("Rate must be greater than 0.")
+        burst = rate if burst is None else burst
+        if burst <= 0:
+            raise ValueError("Burst must be greater than 0.")
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {"tokens": burst, "time": time.monotonic()}
+        if path is not None:
+            # fcntl 仅在 POSIX 上可用
+            try:
+                import fcntl
+            except ImportError as e:
+                raise ImportError("Sharing a token bucket across processes requires fcntl (POSIX).") from e
+            self._fcntl = fcntl
+
+    def _apply(self, state: dict, tokens: float, need: float, now: float) -> float:
+        # 补充令牌后尝试扣除，返回还需等待的秒数；need 为None时无条件扣除，余额可为负
+        state["tokens"] = min(self.burst, state["tokens"] + max(0.0, now - state["time"]) * self.rate)
+        state["time"] = now
+        if need is not None and state["tokens"] < need:
+            return (need - state["tokens"]) / self.rate
+        state["tokens"] -= tokens
+        return 0.0
+
+    def _transact(self, tokens: float, need: float) -> float:
+        if self.path is None:
+            with self._lock:
+                return self._apply(self._state, tokens, need, time.monotonic())
+        # 跨进程共享时使用墙上时间
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, "r+") as f:
+                self._fcntl.flock(f, self._fcntl.LOCK_EX)
+                text = f.read()
+                now = time.time()
+                state = json.loads(text) if text else {"tokens": self.burst, "time": now}
+                wait = self._apply(state, tokens, need, now)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+        return wait
+
+    def _try_acquire(self, tokens: float, deadline: float) -> float:
+        # 取得令牌时返回0，超时返回None，否则返回下次尝试前的等待时间
+        wait = self._transact(tokens, min(tokens, self.burst))
+        if not wait:
+            return 0.0
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or wait > remaining:
+                # 截止前无法补足时不再等待
+                return None
+        return wait
+
+    def acquire(self, tokens: float = 1.0, timeout: float = None) -> bool:
+        """
+        等待桶中有足够的令牌后扣除；余额为负(此前 charge 透支)时先等待补足
+
+        :param tokens: 令牌数，超过 burst 时只需等到桶满即可扣除
+        :param timeout: 最长等待时间(秒)，为空时一直等待；截止前无法补足时立即返回
+        :return: 是否在超时前取得令牌
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire(tokens, deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0, timeout: float = None) -> bool:
+        """
+        acquire 的协程版本，等待时不阻塞事件循环
+
+        :param tokens: 令牌数
+        :param timeout: 最长等待时间(秒)，为空时一直等待
+        :return: 是否在超时前取得令牌
+        """
+        import asyncio
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire(tokens, deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            await asyncio.sleep(wait)
+
+    def charge(self, tokens: float):
+        """
+        不等待直接扣除令牌，用于请求完成后才知道的用量(如响应字节数)，透支部分由后续 acquire 等待补足
+
+        :param tokens: 令牌数
+        """
+        self._transact(tokens, None)
+
+
+class RateLimiter(object):
+    """
+    客户端请求限流，传给 MarketRpcClient / BalancedRpcClient / AsyncMarketRpcClient 的 limiter 参数
+
+    每次RPC尝试(含重试与对冲)前取一个请求令牌，等待时间不超过本次尝试的超时，超时后该次尝试以 DEADLINE_EXCEEDED 失败；
+    对冲请求不等待，没有空闲配额时不发出；
+    响应到达后按字节数扣除字节令牌，透支时后续请求等待。
+    批量回填使用带限流的独立客户端，交互式查询使用默认客户端，回填就不会占满同一历史服务的处理能力；
+    多个回填进程使用相同的 path 时共享同一份配额。
+
+    :param requests_per_second: 每秒请求数上限，为空时不限制
+    :param bytes_per_second: 每秒响应字节数上限，为空时不限制
+    :param burst_seconds: 桶容量相当于多少秒的配额(default:1)
+    :param path: 共享状态文件路径前缀，为空时只在本进程内共享
+    """
+
+    def __init__(self, requests_per_second: float = None, bytes_per_second: float = None, burst_seconds: float = 1.0,
+                 path: str = None):
+        if requests_per_second is None and bytes_per_second is None:
+            raise ValueError("At least one of requests_per_second and bytes_per_second must be set.")
+        if burst_seconds <= 0:
+            raise ValueError("Burst seconds must be greater than 0.")
+        self.requests = None
+        self.bytes = None
+        if requests_per_second is not None:
+            self.requests = TokenBucket(requests_per_second, max(1.0, requests_per_second * burst_seconds),
+                                        None if path is None else f"{path}.requests")
+        if bytes_per_second is not None:
+            self.bytes = TokenBucket(bytes_per_second, bytes_per_second * burst_seconds,
+                                     None if path is None else f"{path}.bytes")
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        发出请求前调用，等待请求配额，并等待此前透支的字节配额补足
+
+        :param timeout: 最长等待时间(秒)，为空时一直等待
+        :return: 是否在超时前取得配额
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.bytes is not None and not self.bytes.acquire(0.0, timeout):
+            return False
+        if self.requests is not None:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            return self.requests.acquire(1.0, remaining)
+        return True
+
+    async def acquire_async(self, timeout: float = None) -> bool:
+        """
+        acquire 的协程版本，等待时不阻塞事件循环
+
+        :param timeout: 最长等待时间(秒)，为空时一直等待
+        :return: 是否在超时前取得配额
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.bytes is not None and not await self.bytes.acquire_async(0.0, timeout):
+            return False
+        if self.requests is not None:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            return await self.requests.acquire_async(1.0, remaining)
+        return True
+
+    def record(self, nbytes: int):
+        """
+        响应到达后记录字节数
+
+        :param nbytes: 响应字节数
+        """
+        if self.bytes is not None and nbytes:
+            self.bytes.charge(nbytes)
+
+
+_limit_error_class = None
+
+
+def limit_timeout_error(timeout: float):
+    """
+    限流等待超时的错误，为 grpc.RpcError 子类，状态码 DEADLINE_EXCEEDED，RetryPolicy 按超时处理
+
+    :param timeout: 等待的超时时间(秒)
+    :return: grpc.RpcError
+    """
+    global _limit_error_class
+    if _limit_error_class is None:
+        # grpc 在首次超时时才导入，导入本模块不加载 grpc
+        import grpc
+
+        class RateLimitTimeout(grpc.RpcError):
+            def __init__(self, details: str):
+                super().__init__(details)
+                self._details = details
+
+            def code(self):
+                return grpc.StatusCode.DEADLINE_EXCEEDED
+
+            def details(self):
+                return self._details
+
+        RateLimitTimeout.__qualname__ = RateLimitTimeout.__name__
+        _limit_error_class = RateLimitTimeout
+    return _limit_error_class(f"Rate limiter did not grant a request within {timeout:.3f} seconds.")
+
+
+def wait_limiter(limiter: RateLimiter, timeout: float, hedged: bool = False) -> float:
+    """
+    发出一次RPC尝试前等待限流配额
+
+    :param limiter: RateLimiter
+    :param timeout: 本次尝试的超时时间(秒)，为空时一直等待
+    :param hedged: 是否为对冲请求；对冲请求不等待，没有空闲配额时直接失败
+    :return: 扣除等待时间后的剩余超时(秒)，timeout 为空时为None
+    :raises grpc.RpcError: 超时前未取得配额，状态码 DEADLINE_EXCEEDED
+    """
+    started = time.monotonic()
+    wait = 0.0 if hedged else timeout
+    if not limiter.acquire(wait):
+        raise limit_timeout_error(wait)
+    return None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+
+
+async def wait_limiter_async(limiter: RateLimiter, timeout: float, hedged: bool = False) -> float:
+    """
+    wait_limiter 的协程版本
+
+    :param limiter: RateLimiter
+    :param timeout: 本次尝试的超时时间(秒)，为空时一直等待
+    :param hedged: 是否为对冲请求；对冲请求不等待，没有空闲配额时直接失败
+    :return: 扣除等待时间后的剩余超时(秒)，timeout 为空时为None
+    :raises grpc.RpcError: 超时前未取得配额，状态码 DEADLINE_EXCEEDED
+    """
+    started = time.monotonic()
+    wait = 0.0 if hedged else timeout
+    if not await limiter.acquire_async(wait):
+        raise limit_timeout_error(wait)
+    return None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
@@ -0,0 +1,247 @@
+from . import rpcUtils
+from .rpcBinary import _format_times
+from .rpcTime import floor_interval, interval_windows
+from .rpcColumns import OUTPUT_NUMPY, check_output, from_numpy, records_to_columns, concat_columns
+
+# 各列合并为粗周期K线时的聚合方式
+KLINE_AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+    "TransactionNumber": "sum",
+    "TransactionVolume": "sum",
+    "BuyTransactionVolume": "sum",
+    "BuyTransactionAmount": "sum",
+    "StartId": "first",
+    "EndId": "last",
+}
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("Kline resampling requires numpy to be installed.") from e
+    return np
+
+
+def _to_arrays(data) -> dict:
+    # 任意输出格式的一页K线转换为 numpy 列字典
+    np = _numpy()
+    if isinstance(data, list):
+        data = records_to_columns(data, "KLINE", OUTPUT_NUMPY)
+    elif hasattr(data, "iloc"):
+        data = {name: data[name].to_numpy() for name in data.columns}
+    arrays = {}
+    for name, values in data.items():
+        arrays[name] = values if isinstance(values, np.ndarray) else np.asarray(values)
+    return arrays
+
+
+def _aggregate(arrays: dict, buckets, interval_ms: int) -> dict:
+    # arrays 按时间升序且 buckets 非递减，每个分组合并为一根K线
+    np = _numpy()
+    count = len(buckets)
+    starts = np.concatenate(([0], np.flatnonzero(buckets[1:] != buckets[:-1]) + 1))
+    ends = np.concatenate((starts[1:], [count])) - 1
+    bars = {"Timestamp": buckets[starts]}
+    if "Time" in arrays:
+        times = np.empty(len(starts), dtype=object)
+        times[:] = _format_times(bars["Timestamp"].tolist())
+        bars["Time"] = times
+    bars["IntervalSecond"] = np.full(len(starts), interval_ms // 1000, dtype=np.int64)
+    for name, how in KLINE_AGGREGATIONS.items():
+        values = arrays.get(name)
+        if values is None:
+            continue
+        if values.dtype == object:
+            values = values.astype(np.float64)
+        if how == "first":
+            bars[name] = values[starts]
+        elif how == "last":
+            bars[name] = values[ends]
+        elif how == "max":
+            bars[name] = np.maximum.reduceat(values, starts)
+        elif how == "min":
+            bars[name] = np.minimum.reduceat(values, starts)
+        else:
+            bars[name] = np.add.reduceat(values, starts)
+    bars["EndTimestamp"] = bars["Timestamp"] + (interval_ms - 1)
+    return bars
+
+
+class KlineResampler(object):
+    """
+    将细周期K线增量合并为粗周期K线，输入需按时间升序
+
+    每次 update 返回已完整的K线，最后一个未完整的周期保留到下一页，全部输入结束后调用 flush 取出。
+    周期按 (Timestamp + offset_second) 对齐到 interval_second 的整数倍，如日线按上海时间零点对齐时 offset_second 为 8 * 3600。
+
+    :param interval_second: 目标周期(秒)，如 5 / 60 / 900 / 3600
+    :param offset_second: 周期对齐偏移(秒)(default:0，按UTC对齐)
+    :param output: 输出格式，records / columns / numpy / pandas(default:numpy)
+    """
+
+    def __init__(self, interval_second: int, offset_second: int = 0, output: str = OUTPUT_NUMPY):
+        if interval_second <= 0:
+            raise ValueError("Interval second must be greater than 0.")
+        check_output(output)
+        _numpy()
+        self.interval_second = interval_second
+        self.offset_second = offset_second
+        self.output = output
+        self._interval_ms = interval_second * 1000
+        self._pending = None
+        self._last_timestamp = None
+
+    def _buckets(self, timestamps):
+        return floor_interval(timestamps, self.interval_second, self.offset_second)
+
+    def update(self, page) -> any:
+        """
+        追加一页细周期K线
+
+        :param page: 任意输出格式的一页K线，如 iter_kline 产出的页
+        :return: 已完整的粗周期K线，格式由 output 决定；没有完整K线时为空数据
+        """
+        np = _numpy()
+        arrays = _to_arrays(page)
+        if not arrays or not len(arrays.get("Timestamp", ())):
+            return self._emit({})
+        timestamps = arrays["Timestamp"].astype(np.int64)
+        if len(timestamps) > 1 and (timestamps[1:] < timestamps[:-1]).any():
+            raise ValueError("Klines must be in ascending order.")
+        if self._last_timestamp is not None and timestamps[0] < self._last_timestamp:
+            raise ValueError("Klines must be in ascending order.")
+        self._last_timestamp = int(timestamps[-1])
+        arrays["Timestamp"] = timestamps
+
+        if self._pending is not None:
+            names = [name for name in self._pending if name in arrays]
+            arrays = {name: np.concatenate((self._pending[name], arrays[name])) for name in names}
+        buckets = self._buckets(arrays["Timestamp"])
+        # 最后一个周期可能还有后续数据，留到下一页
+        cut = int(np.searchsorted(buckets, buckets[-1], side="left"))
+        self._pending = {name: values[cut:] for name, values in arrays.items()}
+        if not cut:
+            return self._emit({})
+        complete = {name: values[:cut] for name, values in arrays.items()}
+        return self._emit(_aggregate(complete, buckets[:cut], self._interval_ms))
+
+    def flush(self) -> any:
+        """
+        取出最后一个未完整周期合并的K线
+
+        :return: 粗周期K线，格式由 output 决定
+        """
+        pending, self._pending = self._pending, None
+        if not pending:
+            return self._emit({})
+        return self._emit(_aggregate(pending, self._buckets(pending["Timestamp"]), self._interval_ms))
+
+    def _emit(self, bars: dict):
+        return from_numpy(bars, "KLINE", self.output)
+
+
+def resample_kline(data, interval_second: int, offset_second: int = 0, output: str = OUTPUT_NUMPY) -> any:
+    """
+    将一段细周期K线合并为粗周期K线
+
+    :param data: 任意输出格式的K线，需按时间升序
+    :param interval_second: 目标周期(秒)
+    :param offset_second: 周期对齐偏移(秒)(default:0)
+    :param output: 输出格式(default:numpy)
+    :return: 粗周期K线；首尾周期的数据不完整时同样输出
+    """
+    resampler = KlineResampler(interval_second, offset_second, OUTPUT_NUMPY)
+    bars = [resampler.update(data), resampler.flush()]
+    return from_numpy(concat_columns(bars, "KLINE", OUTPUT_NUMPY), "KLINE", output)
+
+
+def iter_resampled(pages, interval_second: int, offset_second: int = 0, output: str = OUTPUT_NUMPY):
+    """
+    按页合并分页K线，内存占用与页大小相当
+
+    :param pages: 按时间升序的K线页迭代器，如 iter_kline(..., output="numpy")
+    :param interval_second: 目标周期(秒)
+    :param offset_second: 周期对齐偏移(秒)(default:0)
+    :param output: 输出格式(default:numpy)
+    :return: 粗周期K线页的生成器
+    """
+    resampler = KlineResampler(interval_second, offset_second, output)
+    for page in pages:
+        bars = resampler.update(page)
+        if _length(bars):
+            yield bars
+    bars = resampler.flush()
+    if _length(bars):
+        yield bars
+
+
+def _length(data) -> int:
+    if isinstance(data, list) or hasattr(data, "iloc"):
+        return len(data)
+    return len(data.get("Timestamp", ())) if data else 0
+
+
+# 查询并合并为粗周期K线
+def market_kline_resampled(
+    account_type: str,
+    symbol: str,
+    interval_second: int,
+    start_time: any,
+    end_time: any,
+    source_interval_second: int = 1,
+    offset_second: int = 0,
+    page_size: int = 10000,
+    output: str = OUTPUT_NUMPY,
+    cache: any = None,
+    **kwargs
+):
+    """
+    按 source_interval_second 周期分页拉取K线，在客户端合并为 interval_second 周期
+
+    使用磁盘缓存时按页从缓存读取，已缓存的区间不再发出RPC。
+
+    :param account_type: 账户类型
+    :param symbol: 交易对
+    :param interval_second: 目标周期(秒)，需为 source_interval_second 的整数倍
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param source_interval_second: 拉取的K线周期(秒)(default:1)
+    :param offset_second: 周期对齐偏移(秒)(default:0)
+    :param page_size: 每页数据数量，1 到 10000；使用缓存时每个窗口最多 9999 个周期(default:10000)
+    :param output: 输出格式(default:numpy)
+    :param cache: 本地磁盘缓存，为空时使用 set_default_cache 设置的缓存，False 时不使用缓存
+    :param kwargs: 传给 market_kline / iter_kline 的其他参数，如 schema、exchange、client
+    :return: [粗周期K线]
+    """
+    if interval_second % source_interval_second:
+        raise ValueError("Interval second must be a multiple of source interval second.")
+    if not 1 <= page_size <= 10000:
+        raise ValueError("Page size must be between 1 and 10000.")
+    check_output(output)
+    cache = rpcUtils._default_cache if cache is None else cache
+    if cache:
+        pages = _cached_pages(account_type, symbol, source_interval_second, start_time, end_time, page_size, cache, kwargs)
+    else:
+        pages = rpcUtils.iter_kline(account_type, symbol, source_interval_second, start_time, end_time,
+                                    limit=page_size, output=OUTPUT_NUMPY, **kwargs)
+    bars = list(iter_resampled(pages, interval_second, offset_second, OUTPUT_NUMPY))
+    return [from_numpy(concat_columns(bars, "KLINE", OUTPUT_NUMPY), "KLINE", output)]
+
+
+def _cached_pages(account_type: str, symbol: str, source_interval_second: int, start_time: any, end_time: any,
+                  page_size: int, cache, kwargs: dict):
+    # 窗口按周期边界对齐，不同查询的中间窗口相同，逐窗口经缓存读取；
+    # limit 比窗口周期数多留一行，使缓存将整个窗口视为已完整覆盖，因此窗口最多 9999 个周期
+    start_time = rpcUtils.normalize_timestamp(start_time, "Start time")
+    end_time = rpcUtils.normalize_timestamp(end_time, "End time")
+    intervals = min(page_size, 9999)
+    for lower, upper in interval_windows(start_time, end_time, source_interval_second, intervals):
+        page = rpcUtils.market_kline(account_type, symbol, source_interval_second, lower, upper,
+                                     limit=intervals + 1, output=OUTPUT_NUMPY, cache=cache, **kwargs)[0]
+        if page is not None:
+            yield page
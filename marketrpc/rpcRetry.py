@@ -0,0 +1,288 @@
+import time
+import queue
+import random
+import logging
+import threading
+from collections import deque
+
+from .rpcLazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+grpc = lazy_import("grpc")
+
+# 可重试的状态码名称(grpc.StatusCode.name)；查询均为只读请求，重复发送不会产生副作用
+RETRYABLE_CODES = frozenset({
+    "UNAVAILABLE",
+    "DEADLINE_EXCEEDED",
+    "RESOURCE_EXHAUSTED",
+})
+
+
+class LatencyTracker(object):
+    """
+    按键保存最近若干次成功请求的耗时，用于计算对冲请求的等待时间
+
+    :param window: 每个键保留的样本数(default:200)
+    """
+
+    def __init__(self, window: int = 200):
+        if window <= 0:
+            raise ValueError("Window must be greater than 0.")
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, key: any, seconds: float):
+        """
+        记录一次耗时
+
+        :param key: 统计键，如 (调用方式, 数据类型)
+        :param seconds: 耗时(秒)
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, key: any, q: float, min_samples: int = 1):
+        """
+        耗时分位数
+
+        :param key: 统计键
+        :param q: 分位数，0 到 1
+        :param min_samples: 最少样本数，不足时返回None
+        :return: 耗时(秒)或None
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class RetryPolicy(object):
+    """
+    查询请求的超时、重试与对冲策略，由 MarketRpcClient 的 query / query_batch 与 AsyncMarketRpcClient 的 query 使用
+
+    每次尝试的超时为 timeout，与整体截止时间 deadline 的剩余时间取较小值；失败状态码属于 retryable_codes 时
+    按指数退避(带随机抖动)重试。开启 hedge 后，若请求在等待时间内未完成，则在另一个channel上发出第二个相同请求，
+    取先成功的响应并取消另一个；等待时间为 hedge_delay，为空时取同类请求最近耗时的 hedge_quantile 分位数，
+    样本不足 min_samples 时不对冲。
+
+    :param timeout: 单次尝试的超时时间(秒)，为空时不限制(default:60)
+    :param deadline: 包含全部重试的整体截止时间(秒)，为空时不限制
+    :param max_attempts: 最多尝试次数，包含首次请求，1 表示不重试(default:3)
+    :param initial_backoff: 首次重试前的等待时间(秒)(default:0.1)
+    :param max_backoff: 重试等待时间上限(秒)(default:5)
+    :param backoff_multiplier: 每次重试等待时间的倍数(default:2)
+    :param jitter: 等待时间的随机抖动比例，0 到 1(default:0.2)
+    :param retryable_codes: 可重试的状态码集合，元素为 grpc.StatusCode 或其名称
+    :param hedge: 是否开启对冲请求(default:关闭)
+    :param hedge_delay: 发出对冲请求前的等待时间(秒)，为空时按历史耗时分位数计算
+    :param hedge_quantile: 计算对冲等待时间的耗时分位数(default:0.95)
+    :param min_samples: 按分位数计算对冲等待时间所需的最少样本数(default:20)
+    """
+
+    def __init__(self, timeout: float = 60.0, deadline: float = None, max_attempts: int = 3,
+                 initial_backoff: float = 0.1, max_backoff: float = 5.0, backoff_multiplier: float = 2.0,
+                 jitter: float = 0.2, retryable_codes: frozenset = RETRYABLE_CODES, hedge: bool = False,
+                 hedge_delay: float = None, hedge_quantile: float = 0.95, min_samples: int = 20):
+        if timeout is not None and timeout <= 0:
+            raise ValueError("Timeout must be greater than 0.")
+        if deadline is not None and deadline <= 0:
+            raise ValueError("Deadline must be greater than 0.")
+        if max_attempts <= 0:
+            raise ValueError("Max attempts must be greater than 0.")
+        if initial_backoff < 0 or max_backoff < initial_backoff:
+            raise ValueError("Backoff must satisfy 0 <= initial_backoff <= max_backoff.")
+        if not 0 <= jitter <= 1:
+            raise ValueError("Jitter must be between 0 and 1.")
+        if not 0 < hedge_quantile < 1:
+            raise ValueError("Hedge quantile must be between 0 and 1.")
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.backoff_multiplier = backoff_multiplier
+        self.jitter = jitter
+        self.retryable_codes = frozenset(code if isinstance(code, str) else code.name for code in retryable_codes)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.latency = LatencyTracker()
+
+    def backoff(self, retry: int) -> float:
+        """
+        第 retry 次重试前的等待时间
+
+        :param retry: 重试序号，从1开始
+        :return: 等待时间(秒)
+        """
+        delay = min(self.max_backoff, self.initial_backoff * self.backoff_multiplier ** (retry - 1))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def hedge_after(self, key: any):
+        """
+        发出对冲请求前的等待时间
+
+        :param key: 统计键，如 (调用方式, 数据类型)
+        :return: 等待时间(秒)，不对冲时为None
+        """
+        if not self.hedge:
+            return None
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        return self.latency.quantile(key, self.hedge_quantile, self.min_samples)
+
+    def call(self, start, key: any = None, timeout: float = None):
+        """
+        按策略执行请求
+
+        :param start: 发起一次尝试的函数，参数为本次超时时间(秒或None)，对冲请求额外传入 True，返回 grpc.Future
+        :param key: 耗时统计键，如 (调用方式, 数据类型)
+        :param timeout: 本次调用的单次尝试超时(秒)，为空时使用策略的 timeout
+        :return: 响应消息
+        :raises grpc.RpcError: 不可重试的错误，或重试次数、截止时间用尽后的最后一个错误
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline_at = time.monotonic() + self.deadline if self.deadline is not None else None
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(start, key, self._attempt_timeout(timeout, deadline_at))
+            except grpc.RpcError as e:
+                attempt += 1
+                delay = self._retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def call_async(self, start, key: any = None, timeout: float = None):
+        """
+        按策略执行异步请求，重试、截止时间与对冲的规则同 call
+
+        :param start: 发起一次尝试的函数，参数同 call，返回协程
+        :param key: 耗时统计键，如 (调用方式, 数据类型)
+        :param timeout: 本次调用的单次尝试超时(秒)，为空时使用策略的 timeout
+        :return: 响应消息
+        :raises grpc.RpcError: 不可重试的错误，或重试次数、截止时间用尽后的最后一个错误
+        """
+        # asyncio 只在异步客户端中使用，不在导入本模块时加载
+        import asyncio
+        timeout = self.timeout if timeout is None else timeout
+        deadline_at = time.monotonic() + self.deadline if self.deadline is not None else None
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt_async(start, key, self._attempt_timeout(timeout, deadline_at))
+            except grpc.RpcError as e:
+                attempt += 1
+                delay = self._retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _attempt_timeout(timeout: float, deadline_at: float):
+        if deadline_at is None:
+            return timeout
+        remaining = deadline_at - time.monotonic()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def _retry_delay(self, error, attempt: int, deadline_at: float):
+        # 返回下次重试前的等待时间，不可重试时返回None
+        code = error.code() if callable(getattr(error, "code", None)) else None
+        if code is None or code.name not in self.retryable_codes or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+            return None
+        logger.warning(f"Request failed with code {code}, retrying in {delay:.2f} seconds ({attempt}/{self.max_attempts - 1}): {error.details()}")
+        return delay
+
+    def _attempt(self, start, key: any, timeout: float):
+        started = time.monotonic()
+        delay = self.hedge_after(key)
+        first = start(timeout)
+        if delay is None or (timeout is not None and delay >= timeout):
+            response = first.result()
+            self.latency.record(key, time.monotonic() - started)
+            return response
+
+        done = queue.Queue()
+        first.add_done_callback(done.put)
+        futures = [first]
+        try:
+            completed = done.get(timeout=delay)
+        except queue.Empty:
+            completed = None
+            remaining = None if timeout is None else timeout - (time.monotonic() - started)
+            if remaining is None or remaining > 0:
+                logger.info(f"Request {key} not completed in {delay * 1000:.1f} ms, sending hedged request")
+                try:
+                    hedged = start(remaining, True)
+                except grpc.RpcError as e:
+                    # 对冲请求未能发出(如没有空闲的限流配额)时继续等待首个请求
+                    logger.info(f"Hedged request {key} not sent: {e.details()}")
+                else:
+                    hedged.add_done_callback(done.put)
+                    futures.append(hedged)
+
+        # 取先成功的响应；全部失败时抛出首个请求的错误
+        pending = len(futures)
+        error = None
+        try:
+            while pending:
+                if completed is None:
+                    completed = done.get()
+                pending -= 1
+                if not completed.cancelled() and completed.exception() is None:
+                    self.latency.record(key, time.monotonic() - started)
+                    return completed.result()
+                if completed is first or error is None:
+                    error = completed
+                completed = None
+            error.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def _attempt_async(self, start, key: any, timeout: float):
+        import asyncio
+        started = time.monotonic()
+        delay = self.hedge_after(key)
+        first = asyncio.ensure_future(start(timeout))
+        tasks = [first]
+        try:
+            if delay is None or (timeout is not None and delay >= timeout):
+                response = await first
+                self.latency.record(key, time.monotonic() - started)
+                return response
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                if remaining is None or remaining > 0:
+                    logger.info(f"Request {key} not completed in {delay * 1000:.1f} ms, sending hedged request")
+                    tasks.append(asyncio.ensure_future(start(remaining, True)))
+                    # 对冲请求未能发出(如没有空闲的限流配额)时不影响首个请求，其错误只在两者都失败时抛出
+
+            # 取先成功的响应；全部失败时抛出首个请求的错误
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        self.latency.record(key, time.monotonic() - started)
+                        return task.result()
+                    if task is first or error is None:
+                        error = task
+            return error.result()
+        finally:
+            for task in tasks:
+                task.cancel()
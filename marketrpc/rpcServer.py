@@ -0,0 +1,118 @@
+import json
+import grpc
+import bisect
+import logging
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from . import market_history_pb2, market_history_pb2_grpc
+from .rpcBinary import batch_supported, encode_batch
+from .rpcCompress import available_encodings, compress_payload, grpc_compression
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySource(object):
+    """
+    内存数据源，按请求参数过滤预先加载的行数据，用于本地参考服务与测试
+
+    :param data: 数据类型到行字典列表的映射，如 {"KLINE": [...]}，每行需包含 Timestamp
+    """
+
+    def __init__(self, data: dict):
+        self.data = {type.upper(): sorted(rows, key=lambda row: row["Timestamp"]) for type, rows in data.items()}
+        self._timestamps = {type: [row["Timestamp"] for row in rows] for type, rows in self.data.items()}
+
+    def __call__(self, type: str, params: dict):
+        """
+        返回 [start_time, end_time] 内的行，顺序由 is_asc 决定
+
+        :param type: 数据类型
+        :param params: 请求JSON参数
+        :return: 行字典迭代器
+        """
+        type = type.upper()
+        rows = self.data.get(type, [])
+        timestamps = self._timestamps.get(type, [])
+        lower = bisect.bisect_left(timestamps, params.get("start_time", 0))
+        upper = bisect.bisect_right(timestamps, params.get("end_time", 0))
+        if not params.get("is_asc", True):
+            return (rows[i] for i in range(upper - 1, lower - 1, -1))
+        return (rows[i] for i in range(lower, upper))
+
+
+class MarketHistoryServicer(market_history_pb2_grpc.MarketHistoryServiceServicer):
+    """
+    参考服务实现，提供 queryData、streamData 与 queryBatch，可在没有真实后端时验证客户端
+
+    :param source: 数据源，source(type, params) 返回行字典迭代器，参数不合法时抛出 ValueError
+    :param chunk_size: streamData 每块的默认行数，请求中的 chunk_size 优先(default:1000)
+    """
+
+    def __init__(self, source, chunk_size: int = 1000):
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be greater than 0.")
+        self.source = source
+        self.chunk_size = chunk_size
+
+    def _rows(self, request, context):
+        try:
+            params = json.loads(request.jsonData)
+            rows = self.source(request.type, params)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        limit = params.get("limit") or None
+        return params, islice(rows, limit)
+
+    def _reply(self, request, rows: list):
+        # 按客户端声明的优先级选择第一个本地可用的负载编码
+        json_data = json.dumps({"data": rows})
+        supported = available_encodings()
+        for encoding in request.accept_encoding.split(","):
+            encoding = encoding.strip().lower()
+            if encoding in supported:
+                payload = compress_payload(json_data.encode("utf-8"), encoding)
+                return market_history_pb2.DataReply(code=0, msg="", success=True, type=request.type,
+                                                    encoding=encoding, payload=payload)
+        return market_history_pb2.DataReply(code=0, msg="", success=True, type=request.type, jsonData=json_data)
+
+    def queryData(self, request, context):
+        _, rows = self._rows(request, context)
+        return self._reply(request, list(rows))
+
+    def queryBatch(self, request, context):
+        if not batch_supported(request.type):
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Type {request.type} has no batch message.")
+        _, rows = self._rows(request, context)
+        return encode_batch(list(rows), request.type)
+
+    def streamData(self, request, context):
+        params, rows = self._rows(request, context)
+        chunk_size = params.get("chunk_size") or self.chunk_size
+        while context.is_active():
+            # 逐块序列化，客户端未读取时生成器随流控阻塞，不会预先生成整个结果
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield self._reply(request, chunk)
+
+
+def serve(servicer, address: str = "127.0.0.1:0", max_workers: int = 8, options: list = None,
+          compression: str = None):
+    """
+    启动参考服务
+
+    :param servicer: MarketHistoryServicer 或其他 MarketHistoryServiceServicer 实现
+    :param address: 监听地址，端口为0时自动分配(default:127.0.0.1:0)
+    :param max_workers: 处理请求的线程数(default:8)
+    :param options: 服务端参数
+    :param compression: 响应的gRPC传输层压缩 none / gzip / deflate
+    :return: (grpc.Server, 实际监听端口)，调用方负责 stop()
+    """
+    server = grpc.server(ThreadPoolExecutor(max_workers=max_workers), options=options,
+                         compression=grpc_compression(compression))
+    market_history_pb2_grpc.add_MarketHistoryServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port(address)
+    server.start()
+    logger.info(f"Market history server listening on port {port}")
+    return server, port
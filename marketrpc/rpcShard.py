@@ -0,0 +1,197 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .rpcUtils import OUTPUT_RECORDS, normalize_timestamp, page_length, iter_kline, iter_aggtrade, iter_orderbook
+from .rpcColumns import concat_columns
+from .rpcTime import floor_interval
+
+logger = logging.getLogger(__name__)
+
+# 分页遍历函数对应的默认数据类型
+_ITER_TYPES = {iter_kline: "KLINE", iter_aggtrade: "AGG_TRADE", iter_orderbook: "ORDER_BOOK"}
+
+def split_range(start_time: int, end_time: int, shards: int, interval_second: int = None) -> list:
+    """
+    将 [start_time, end_time] 毫秒区间切分为不重叠的子区间
+
+    :param start_time: 开始毫秒时间戳
+    :param end_time: 结束毫秒时间戳
+    :param shards: 子区间数量，区间过短时会相应减少
+    :param interval_second: K线周期(秒)，不为空时子区间边界对齐到周期起点，每个子区间包含整数个周期
+    :return: [(开始时间戳, 结束时间戳), ...]，按时间升序
+    """
+    if shards <= 0:
+        raise ValueError("Shards must be greater than 0.")
+    if start_time > end_time:
+        raise ValueError("Start time must be less than or equal to end time.")
+    unit = interval_second * 1000 if interval_second else 1
+    first = floor_interval(start_time, interval_second) if interval_second else start_time
+    span = (end_time - first) // unit + 1
+    shards = min(shards, span)
+    step, extra = divmod(span, shards)
+    windows = []
+    lower = first
+    for i in range(shards):
+        upper = lower + (step + (1 if i < extra else 0)) * unit - 1
+        windows.append((max(lower, start_time), min(upper, end_time)))
+        lower = upper + 1
+    return windows
+
+def fetch_range(
+    iter_func,
+    start_time: any,
+    end_time: any,
+    shards: int = 8,
+    max_workers: int = 4,
+    max_retries: int = 2,
+    is_asc: bool = True,
+    return_stats: bool = False,
+    interval_second: int = None,
+    **kwargs
+):
+    """
+    将时间范围切分为多个子区间，在线程池中并发分页拉取后按顺序拼接
+
+    :param iter_func: 分页遍历函数，iter_kline / iter_aggtrade / iter_orderbook
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param shards: 子区间数量(default:8)
+    :param max_workers: 最大并发请求数，避免压垮服务端(default:4)
+    :param max_retries: 失败子区间的最大重试轮数，成功的子区间不会重新拉取(default:2)
+    :param is_asc: 是否升序排列，拼接顺序随之调整
+    :param return_stats: 为True时同时返回各子区间的统计信息
+    :param interval_second: K线周期(秒)，不为空时子区间边界对齐到周期起点
+    :param kwargs: 透传给 iter_func 的其他参数，output 非 records 时各子区间的列式数据按顺序拼接
+    :return: [数据列表]，与 market_kline 等函数格式一致；return_stats 为True时返回 (结果, 统计列表)
+    """
+    if max_workers <= 0:
+        raise ValueError("Max workers must be greater than 0.")
+    start_time = normalize_timestamp(start_time, "Start time")
+    end_time = normalize_timestamp(end_time, "End time")
+    windows = split_range(start_time, end_time, shards, interval_second)
+    output = kwargs.get("output", OUTPUT_RECORDS)
+    results = [None] * len(windows)
+    stats = [{
+        "shard": i,
+        "start_time": lower,
+        "end_time": upper,
+        "rows": 0,
+        "elapsed": 0.0,
+        "attempts": 0,
+        "error": None,
+    } for i, (lower, upper) in enumerate(windows)]
+
+    def fetch(index):
+        lower, upper = windows[index]
+        stat = stats[index]
+        stat["attempts"] += 1
+        timer_start = time.perf_counter()
+        try:
+            rows = list(iter_func(start_time=lower, end_time=upper, is_asc=is_asc, prefetch=False, **kwargs))
+        except Exception as e:
+            stat["error"] = repr(e)
+            raise
+        finally:
+            stat["elapsed"] = time.perf_counter() - timer_start
+        stat["rows"] = len(rows) if output == OUTPUT_RECORDS else sum(page_length(page, output) for page in rows)
+        stat["error"] = None
+        results[index] = rows
+
+    pending = list(range(len(windows)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for attempt in range(max_retries + 1):
+            futures = {index: executor.submit(fetch, index) for index in pending}
+            failed = []
+            for index, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"Shard {index} {windows[index]} failed on attempt {attempt + 1}: {e}")
+                    failed.append(index)
+            pending = failed
+            if not pending:
+                break
+
+    for stat in stats:
+        logger.info(f"Shard {stat['shard']} [{stat['start_time']}, {stat['end_time']}]: "
+                     f"{stat['rows']} rows in {stat['elapsed']:.2f} seconds, {stat['attempts']} attempt(s)")
+    if pending:
+        raise RuntimeError(f"Failed to fetch {len(pending)} shard(s) after {max_retries + 1} attempts: "
+                           + ", ".join(stats[index]["error"] for index in pending))
+
+    ordered = results if is_asc else list(reversed(results))
+    if output == OUTPUT_RECORDS:
+        market_list = [[row for rows in ordered for row in rows]]
+    else:
+        type = kwargs.get("type") or _ITER_TYPES.get(iter_func, "")
+        market_list = [concat_columns([page for pages in ordered for page in pages], type, output)]
+    if return_stats:
+        return market_list, stats
+    return market_list
+
+# 并发分片查询市场K线数据
+def fetch_kline_range(
+    account_type: str,
+    symbol: str,
+    kline_interval_second: int,
+    start_time: any,
+    end_time: any,
+    shards: int = 8,
+    max_workers: int = 4,
+    max_retries: int = 2,
+    return_stats: bool = False,
+    **kwargs
+):
+    """
+    并发分片查询K线数据，参数含义同 market_kline 与 fetch_range
+
+    :return: [数据列表]；return_stats 为True时返回 (结果, 统计列表)
+    """
+    return fetch_range(iter_kline, start_time, end_time, shards=shards, max_workers=max_workers,
+                       max_retries=max_retries, return_stats=return_stats, interval_second=kline_interval_second,
+                       account_type=account_type, symbol=symbol, kline_interval_second=kline_interval_second, **kwargs)
+
+# 并发分片查询市场成交流数据
+def fetch_aggtrade_range(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    shards: int = 8,
+    max_workers: int = 4,
+    max_retries: int = 2,
+    return_stats: bool = False,
+    **kwargs
+):
+    """
+    并发分片查询成交流数据，参数含义同 market_aggtrade 与 fetch_range
+
+    :return: [数据列表]；return_stats 为True时返回 (结果, 统计列表)
+    """
+    return fetch_range(iter_aggtrade, start_time, end_time, shards=shards, max_workers=max_workers,
+                       max_retries=max_retries, return_stats=return_stats, exchange=exchange,
+                       account_type=account_type, symbol=symbol, **kwargs)
+
+# 并发分片查询市场订单簿数据
+def fetch_orderbook_range(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    shards: int = 8,
+    max_workers: int = 4,
+    max_retries: int = 2,
+    return_stats: bool = False,
+    **kwargs
+):
+    """
+    并发分片查询订单簿数据，参数含义同 market_orderbook 与 fetch_range
+
+    :return: [数据列表]；return_stats 为True时返回 (结果, 统计列表)
+    """
+    return fetch_range(iter_orderbook, start_time, end_time, shards=shards, max_workers=max_workers,
+                       max_retries=max_retries, return_stats=return_stats, exchange=exchange,
+                       account_type=account_type, symbol=symbol, **kwargs)
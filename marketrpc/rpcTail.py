@@ -0,0 +1,376 @@
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import rpcUtils
+from .rpcUtils import OUTPUT_RECORDS, PageCursor, normalize_timestamp, page_length, column_values
+
+logger = logging.getLogger(__name__)
+
+# 查询的结束时间取当前时间之后的余量(毫秒)，容忍客户端与服务端的时钟偏差
+CLOCK_SKEW_MS = 60 * 1000
+
+
+class TailCursor(PageCursor):
+    """
+    跟随最新数据的游标
+
+    与 PageCursor 相同，下一次从上一批最后一行的时间戳(含)开始查询，并按主键去除该时间戳上已返回过的行；
+    不同的是不足一页时同样推进，且永不结束。
+
+    :param type: 数据类型
+    :param start_time: 开始毫秒时间戳
+    :param limit: 每次请求的数据数量上限
+    """
+
+    def __init__(self, type: str, start_time: int, limit: int):
+        super().__init__(type, start_time, start_time, limit, True)
+        self.full = False
+
+    def advance(self, timestamps, keys):
+        skip = self.duplicates(timestamps, keys)
+        count = len(timestamps)
+        self.full = count >= self.limit
+        if not count:
+            return skip
+        last = int(timestamps[-1])
+        boundary_keys = self.boundary_keys if last == self.boundary else set()
+        for ts, key in zip(reversed(timestamps), reversed(keys)):
+            if ts != last:
+                break
+            boundary_keys.add(key)
+        if skip == count and self.full:
+            logger.warning(f"More than {self.limit} rows share timestamp {last}, skipping ahead.")
+            last += 1
+            boundary_keys = set()
+        self.boundary = last
+        self.boundary_keys = boundary_keys
+        self.start_time = last
+        return skip
+
+
+class TailStream(object):
+    """
+    一路跟随中的数据及其轮询状态，由 MarketTail.follow_* 创建
+
+    :param key: 流的标识，如 ("KLINE", "future", "btcusdt", 1)
+    :param query: 查询函数，market_kline / market_aggtrade / market_orderbook
+    :param type: 数据类型
+    :param kwargs: 传给查询函数的固定参数
+    :param start_time: 开始毫秒时间戳
+    :param limit: 每次请求的数据数量上限
+    :param output: 输出格式
+    :param callback: 收到新数据时的回调，参数为 (stream, 新数据)
+    """
+
+    def __init__(self, key: tuple, query, type: str, kwargs: dict, start_time: int, limit: int, output: str,
+                 callback=None):
+        self.key = key
+        self.query = query
+        self.type = type
+        self.kwargs = kwargs
+        self.output = output
+        self.callback = callback
+        self.cursor = TailCursor(type, start_time, limit)
+        self.active = True
+        # 当前轮询间隔与新数据到达间隔的指数移动平均(秒)
+        self.interval = 0.0
+        self.gap = None
+        self.last_arrival = None
+        self.rows = 0
+        self.polls = 0
+        self.errors = 0
+        # 最新一行的数据时间到客户端收到的延迟(秒)
+        self.latency = None
+
+    def poll(self):
+        """
+        请求游标之后的新数据
+
+        :return: 去除重复后的新数据，没有新数据时为 None
+        """
+        self.polls += 1
+        end_time = int(time.time() * 1000) + CLOCK_SKEW_MS
+        page = self.query(start_time=self.cursor.start_time, end_time=end_time, type=self.type,
+                          limit=self.cursor.limit, is_asc=True, cache=False, output=self.output, **self.kwargs)[0]
+        if page is None or not page_length(page, self.output):
+            self.cursor.advance((), ())
+            return None
+        page = self.cursor.advance_page(page, self.output)
+        return page if page_length(page, self.output) else None
+
+    def stats(self) -> dict:
+        """
+        轮询统计
+
+        :return: {key, rows, polls, errors, interval, gap, latency, start_time}
+        """
+        return {
+            "key": self.key,
+            "rows": self.rows,
+            "polls": self.polls,
+            "errors": self.errors,
+            "interval": self.interval,
+            "gap": self.gap,
+            "latency": self.latency,
+            "start_time": self.cursor.start_time,
+        }
+
+
+class MarketTail(object):
+    """
+    增量跟随多路行情的最新数据
+
+    每一路记住已返回的最后一行(时间戳与 Timestamp / AId / UId 主键)，只请求更新的数据。轮询间隔随数据到达频率调整：
+    收到满页时立即继续拉取积压数据，收到新数据后按到达间隔的一半等待，没有新数据时逐步放慢，限制在
+    [min_interval, max_interval] 内。所有数据流由一个调度线程排期，在线程池中共用同一个客户端的长连接发出请求。
+    新数据通过每一路的回调，或 async for 迭代 events() 取得。
+
+    :param client: 共享客户端，为空时使用默认客户端
+    :param min_interval: 最短轮询间隔(秒)(default:0.2)
+    :param max_interval: 最长轮询间隔(秒)(default:5)
+    :param max_workers: 最大并发请求数(default:8)
+    :param limit: 每次请求的数据数量上限(default:10000)
+    """
+
+    def __init__(self, client=None, min_interval: float = 0.2, max_interval: float = 5.0, max_workers: int = 8,
+                 limit: int = 10000):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("Interval must satisfy 0 < min_interval <= max_interval.")
+        if max_workers <= 0:
+            raise ValueError("Max workers must be greater than 0.")
+        if not 1 <= limit <= 10000:
+            raise ValueError("Limit must be between 1 and 10000.")
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_workers = max_workers
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = 0
+        self._streams = {}
+        self._sinks = []
+        self._thread = None
+        self._executor = None
+        self._stopped = False
+
+    @property
+    def streams(self) -> list:
+        """
+        跟随中的数据流列表
+        """
+        with self._cond:
+            return list(self._streams.values())
+
+    def follow_kline(self, account_type: str, symbol: str, kline_interval_second: int, start_time: any = None,
+                     callback=None, output: str = OUTPUT_RECORDS, **kwargs) -> TailStream:
+        """
+        跟随K线，参数含义同 market_kline
+
+        :param start_time: 从该时间开始跟随，为空时只返回此后新产生的数据
+        :param callback: 收到新数据时的回调，参数为 (stream, 新数据)，在线程池中调用
+        :param output: 输出格式(default:records)
+        :param kwargs: 传给 market_kline 的其他参数，如 schema、exchange
+        :return: TailStream
+        """
+        key = ("KLINE", account_type, symbol, kline_interval_second)
+        kwargs = dict(kwargs, account_type=account_type, symbol=symbol, kline_interval_second=kline_interval_second)
+        return self.follow(rpcUtils.market_kline, "KLINE", key, kwargs, start_time, callback, output)
+
+    def follow_aggtrade(self, exchange: str, account_type: str, symbol: str, start_time: any = None, callback=None,
+                        output: str = OUTPUT_RECORDS, **kwargs) -> TailStream:
+        """
+        跟随成交流，参数含义同 market_aggtrade 与 follow_kline
+
+        :return: TailStream
+        """
+        key = ("AGG_TRADE", exchange, account_type, symbol)
+        kwargs = dict(kwargs, exchange=exchange, account_type=account_type, symbol=symbol)
+        return self.follow(rpcUtils.market_aggtrade, "AGG_TRADE", key, kwargs, start_time, callback, output)
+
+    def follow_orderbook(self, exchange: str, account_type: str, symbol: str, start_time: any = None, callback=None,
+                         output: str = OUTPUT_RECORDS, **kwargs) -> TailStream:
+        """
+        跟随订单簿，参数含义同 market_orderbook 与 follow_kline
+
+        :return: TailStream
+        """
+        key = ("ORDER_BOOK", exchange, account_type, symbol)
+        kwargs = dict(kwargs, exchange=exchange, account_type=account_type, symbol=symbol)
+        return self.follow(rpcUtils.market_orderbook, "ORDER_BOOK", key, kwargs, start_time, callback, output)
+
+    def follow(self, query, type: str, key: tuple, kwargs: dict, start_time: any = None, callback=None,
+               output: str = OUTPUT_RECORDS) -> TailStream:
+        """
+        添加一路跟随的数据，相同 key 的数据流已存在时直接返回
+
+        :param query: 查询函数
+        :param type: 数据类型
+        :param key: 流的标识
+        :param kwargs: 传给查询函数的固定参数
+        :param start_time: 从该时间开始跟随，为空时从当前时间开始
+        :param callback: 收到新数据时的回调
+        :param output: 输出格式
+        :return: TailStream
+        """
+        start_time = int(time.time() * 1000) if start_time is None else normalize_timestamp(start_time, "Start time")
+        kwargs = dict(kwargs, client=self.client)
+        with self._cond:
+            stream = self._streams.get(key)
+            if stream is not None:
+                return stream
+            stream = self._streams[key] = TailStream(key, query, type, kwargs, start_time, self.limit, output,
+                                                     callback)
+            self._schedule(stream, 0.0)
+        return stream
+
+    def unfollow(self, stream: TailStream):
+        """
+        停止跟随一路数据，进行中的请求完成后不再投递
+
+        :param stream: follow_* 返回的 TailStream
+        """
+        with self._cond:
+            stream.active = False
+            self._streams.pop(stream.key, None)
+
+    def start(self):
+        """
+        启动调度线程；stop() 后再次启动时全部跟随中的数据流立即轮询一次，之后按各自的间隔继续
+        """
+        with self._cond:
+            if self._thread is not None:
+                return self
+            self._stopped = False
+            # stop() 时进行中的轮询不会再排期，按 _streams 重建调度队列，每一路只保留一项
+            now = time.monotonic()
+            self._heap = []
+            for stream in self._streams.values():
+                self._seq += 1
+                self._heap.append((now, self._seq, stream))
+            heapq.heapify(self._heap)
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="marketrpc-tail")
+            self._thread = threading.Thread(target=self._run, name="marketrpc-tail", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        停止调度线程并等待进行中的请求完成，events() 迭代随之结束；跟随中的数据流保留，可再次 start()
+        """
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            executor, self._executor = self._executor, None
+            self._cond.notify_all()
+        thread.join()
+        executor.shutdown(wait=True)
+        for sink in list(self._sinks):
+            sink(None, None)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    async def events(self):
+        """
+        以异步迭代器取得全部数据流的新数据，需在事件循环中调用
+
+        :return: 产出 (stream, 新数据) 的异步生成器，stop() 后结束
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def sink(stream, rows):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (stream, rows))
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+        with self._cond:
+            self._sinks.append(sink)
+        try:
+            while True:
+                stream, rows = await queue.get()
+                if stream is None:
+                    return
+                yield stream, rows
+        finally:
+            with self._cond:
+                self._sinks.remove(sink)
+
+    def __aiter__(self):
+        return self.events()
+
+    def _schedule(self, stream: TailStream, delay: float):
+        # 调用方需持有 self._cond
+        stream.interval = delay
+        self._seq += 1
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, stream))
+        self._cond.notify()
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, stream = self._heap[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                if stream.active:
+                    self._executor.submit(self._poll, stream)
+
+    def _poll(self, stream: TailStream):
+        try:
+            rows = stream.poll()
+        except Exception as e:
+            stream.errors += 1
+            logger.warning(f"Tail {stream.key} poll failed: {e}")
+            delay = min(self.max_interval, max(self.min_interval, stream.interval * 2))
+        else:
+            if rows is not None and stream.active:
+                self._deliver(stream, rows)
+            delay = self._next_interval(stream, rows is not None)
+        with self._cond:
+            if stream.active and not self._stopped:
+                self._schedule(stream, delay)
+
+    def _deliver(self, stream: TailStream, rows):
+        now = time.monotonic()
+        if stream.last_arrival is not None:
+            gap = now - stream.last_arrival
+            stream.gap = gap if stream.gap is None else 0.7 * stream.gap + 0.3 * gap
+        stream.last_arrival = now
+        stream.rows += page_length(rows, stream.output)
+        last = rows[-1]["Timestamp"] if stream.output == OUTPUT_RECORDS else column_values(rows, "Timestamp")[-1]
+        stream.latency = time.time() - int(last) / 1000
+        if stream.callback is not None:
+            try:
+                stream.callback(stream, rows)
+            except Exception:
+                logger.exception(f"Tail {stream.key} callback failed")
+        for sink in list(self._sinks):
+            sink(stream, rows)
+
+    def _next_interval(self, stream: TailStream, received: bool) -> float:
+        if stream.cursor.full:
+            # 还有积压的数据，立即继续拉取
+            return 0.0
+        if received:
+            interval = stream.gap / 2 if stream.gap is not None else self.min_interval
+        else:
+            interval = max(stream.interval, self.min_interval) * 1.5
+        return min(self.max_interval, max(self.min_interval, interval))
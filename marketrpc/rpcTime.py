@@ -0,0 +1,217 @@
+import warnings
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+# 上海时间相对UTC的偏移(秒)；行情中的 Time 字段与不带时区的日期时间均按上海时间解释
+SHANGHAI_OFFSET_SECONDS = 8 * 3600
+SHANGHAI = timezone(timedelta(seconds=SHANGHAI_OFFSET_SECONDS), "Asia/Shanghai")
+
+# 10位秒级与13位毫秒级时间戳的取值范围
+_SECONDS_RANGE = (10 ** 9, 10 ** 10)
+_MILLIS_RANGE = (10 ** 12, 10 ** 13)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# fromisoformat 不接受的字符串按以下格式再解析一次，兼容月、日、时等不补零的写法(如 '2024-1-6 9:30:00')
+_FALLBACK_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("Bulk timestamp conversion requires numpy to be installed.") from e
+    return np
+
+
+def _offset_ms(tz: timezone) -> int:
+    return int(tz.utcoffset(None).total_seconds() * 1000)
+
+
+@lru_cache(maxsize=65536)
+def parse_time(text: str, tz: timezone = SHANGHAI) -> int:
+    """
+    将日期时间字符串转换为毫秒级时间戳，结果按字符串缓存
+
+    :param text: 'YYYY-MM-DD HH:MM:SS'、'YYYY-MM-DD' 等ISO格式字符串，可带小数秒与时区；各字段可不补零
+    :param tz: 字符串不带时区时使用的时区(default:上海时间)
+    :return: 毫秒级时间戳
+    :raises ValueError: 字符串为空或格式不正确
+    """
+    if not text:
+        raise ValueError("Datetime string cannot be empty.")
+    try:
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        value = _parse_fallback(text)
+    return datetime_millis(value, tz)
+
+
+def _parse_fallback(text: str) -> datetime:
+    for date_format in _FALLBACK_FORMATS:
+        try:
+            return datetime.strptime(text, date_format)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid datetime string '{text}'.")
+
+
+def datetime_millis(value: date, tz: timezone = SHANGHAI) -> int:
+    """
+    将 datetime / date 转换为毫秒级时间戳
+
+    :param value: datetime(含 pandas.Timestamp) 或 date，date 取当天零点
+    :param tz: 不带时区时使用的时区(default:上海时间)
+    :return: 毫秒级时间戳
+    """
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def _number_millis(value, name: str) -> int:
+    if _SECONDS_RANGE[0] <= value < _SECONDS_RANGE[1]:
+        return int(round(value * 1000))
+    if _MILLIS_RANGE[0] <= value < _MILLIS_RANGE[1]:
+        return int(round(value))
+    raise ValueError(f"{name} must be in seconds or milliseconds.")
+
+
+def to_millis(value: any, name: str = "Timestamp", tz: timezone = SHANGHAI) -> int:
+    """
+    将单个时间值统一转换为毫秒级时间戳
+
+    :param value: 日期时间字符串、10位秒级/13位毫秒级时间戳(int/float/numpy数值)、datetime、date 或 numpy.datetime64
+    :param name: 报错信息中使用的参数名
+    :param tz: 不带时区的字符串、datetime 与 datetime64 使用的时区(default:上海时间)
+    :return: 毫秒级时间戳
+    :raises ValueError: 类型不支持，或数值时间戳既不是秒级也不是毫秒级
+    """
+    if isinstance(value, str):
+        return parse_time(value, tz)
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a datetime string, timestamp or datetime.")
+    if isinstance(value, int):
+        return _number_millis(value, name)
+    if isinstance(value, date):
+        return datetime_millis(value, tz)
+    if isinstance(value, float):
+        return _number_millis(value, name)
+    dtype = getattr(value, "dtype", None)
+    if dtype is not None and getattr(value, "ndim", 0) == 0:
+        if dtype.kind == "M":
+            np = _numpy()
+            return int(np.datetime64(value, "ms").astype(np.int64)) - _offset_ms(tz)
+        if dtype.kind in "iuf":
+            return _number_millis(value.item(), name)
+    raise ValueError(f"{name} must be a datetime string, timestamp or datetime.")
+
+
+def to_millis_array(values, name: str = "Timestamp", tz: timezone = SHANGHAI):
+    """
+    批量转换时间值为毫秒级时间戳，数值与 datetime64 数组向量化转换，字符串逐个解析并复用缓存
+
+    :param values: 时间值的列表、元组、numpy数组或 pandas.Series，元素类型同 to_millis
+    :param name: 报错信息中使用的参数名
+    :param tz: 不带时区的值使用的时区(default:上海时间)
+    :return: numpy.int64 数组
+    :raises ValueError: 存在无法转换的元素
+    """
+    np = _numpy()
+    array = values if isinstance(values, np.ndarray) else np.asarray(values)
+    kind = array.dtype.kind
+    if kind == "M":
+        return array.astype("datetime64[ms]").astype(np.int64) - _offset_ms(tz)
+    if kind in "iuf":
+        seconds = (array >= _SECONDS_RANGE[0]) & (array < _SECONDS_RANGE[1])
+        millis = (array >= _MILLIS_RANGE[0]) & (array < _MILLIS_RANGE[1])
+        if not (seconds | millis).all():
+            raise ValueError(f"{name} must be in seconds or milliseconds.")
+        result = np.where(seconds, array * 1000, array)
+        return (np.rint(result) if kind == "f" else result).astype(np.int64)
+    if kind == "U":
+        # numpy 会将带时区的字符串换算为UTC并发出警告，此类字符串与无法解析的格式逐个解析
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                return array.astype("datetime64[ms]").astype(np.int64) - _offset_ms(tz)
+        except (ValueError, Warning):
+            pass
+    return np.fromiter((to_millis(value, name, tz) for value in array.ravel().tolist()),
+                       dtype=np.int64, count=array.size).reshape(array.shape)
+
+
+def floor_interval(timestamp, interval_second: int, offset_second: int = 0):
+    """
+    将毫秒时间戳向下对齐到周期起点
+
+    周期按 (timestamp + offset_second) 对齐到 interval_second 的整数倍，与 KlineResampler 一致；
+    日线等按上海时间零点对齐时 offset_second 为 SHANGHAI_OFFSET_SECONDS。
+
+    :param timestamp: 毫秒时间戳，int 或 numpy 数组
+    :param interval_second: 周期(秒)
+    :param offset_second: 周期对齐偏移(秒)(default:0)
+    :return: 周期起点的毫秒时间戳，类型同 timestamp
+    """
+    if interval_second <= 0:
+        raise ValueError("Interval second must be greater than 0.")
+    interval_ms = interval_second * 1000
+    offset_ms = offset_second * 1000
+    return (timestamp + offset_ms) // interval_ms * interval_ms - offset_ms
+
+
+def ceil_interval(timestamp, interval_second: int, offset_second: int = 0):
+    """
+    将毫秒时间戳向上对齐到周期起点，已对齐的时间戳不变
+
+    :param timestamp: 毫秒时间戳，int 或 numpy 数组
+    :param interval_second: 周期(秒)
+    :param offset_second: 周期对齐偏移(秒)(default:0)
+    :return: 周期起点的毫秒时间戳，类型同 timestamp
+    """
+    return floor_interval(timestamp + interval_second * 1000 - 1, interval_second, offset_second)
+
+
+def interval_bounds(start_time: any, end_time: any, interval_second: int, offset_second: int = 0) -> tuple:
+    """
+    将查询区间扩展为完整周期：开始时间对齐到所在周期起点，结束时间对齐到所在周期的最后一毫秒
+
+    :param start_time: 开始时间，任意 to_millis 支持的类型
+    :param end_time: 结束时间，任意 to_millis 支持的类型
+    :param interval_second: 周期(秒)，如 kline_interval_second
+    :param offset_second: 周期对齐偏移(秒)(default:0)
+    :return: (开始毫秒时间戳, 结束毫秒时间戳)
+    """
+    start_time = floor_interval(to_millis(start_time, "Start time"), interval_second, offset_second)
+    end_time = floor_interval(to_millis(end_time, "End time"), interval_second, offset_second)
+    return start_time, end_time + interval_second * 1000 - 1
+
+
+def interval_windows(start_time: int, end_time: int, interval_second: int, intervals: int,
+                     offset_second: int = 0) -> list:
+    """
+    将毫秒区间按周期边界切分为窗口，除首尾外每个窗口恰好包含 intervals 个周期
+
+    窗口边界只取决于周期与 intervals，与查询起止时间无关，相同参数的不同查询得到相同的中间窗口，便于作为缓存键复用。
+
+    :param start_time: 开始毫秒时间戳
+    :param end_time: 结束毫秒时间戳
+    :param interval_second: 周期(秒)
+    :param intervals: 每个窗口包含的周期数
+    :param offset_second: 周期对齐偏移(秒)(default:0)
+    :return: [(开始时间戳, 结束时间戳), ...]，按时间升序，首尾窗口按 start_time / end_time 截断
+    """
+    if intervals <= 0:
+        raise ValueError("Intervals must be greater than 0.")
+    if start_time > end_time:
+        raise ValueError("Start time must be less than or equal to end time.")
+    window_second = interval_second * intervals
+    window_ms = window_second * 1000
+    lower = floor_interval(start_time, window_second, offset_second)
+    windows = []
+    for bound in range(lower, end_time + 1, window_ms):
+        windows.append((max(bound, start_time), min(bound + window_ms - 1, end_time)))
+    return windows
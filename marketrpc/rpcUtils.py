@@ -1,45 +1,132 @@
 import json
 import time
-import grpc
 import logging
-from datetime import datetime
-import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import os
-current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(current_dir)
-# utils_dir = os.path.abspath(os.path.join(current_dir, '..'))
-# sys.path.append(utils_dir)
-import market_history_pb2
-import market_history_pb2_grpc
+from .rpcLazy import lazy_import
+from .rpcTime import parse_time, to_millis
+from .rpcPacing import page_limit
+from .rpcClient import MarketRpcClient, RawMarketHistoryServiceStub, GRPC_KEEPALIVE_OPTION
+from .rpcBalancer import ENV_ENDPOINTS, create_client
+from . import rpcDecode
+from .rpcCache import MarketDataCache
+from .rpcMemo import QueryMemo
+from .rpcBinary import batch_supported, decode_batch
+from .rpcCompress import ENCODING_GZIP, reply_json
+from . import rpcMetrics
+from .rpcMetrics import RequestMetrics
+from .rpcColumns import OUTPUT_RECORDS, OUTPUT_COLUMNS, check_output, to_output, decode_columns, column_values, column_length, slice_columns
 
-logging.basicConfig(level=logging.INFO,format="[%(name)s][%(asctime)s][%(filename)s:%(lineno)d]\t%(levelname)s\t%(message)s",)
+logger = logging.getLogger(__name__)
+
+# grpc 与 protobuf 生成模块在首次查询时才导入，import 本模块不建立连接也不配置日志
+grpc = lazy_import("grpc")
+market_history_pb2 = lazy_import(".market_history_pb2", __package__)
 
 GRPC_SERVER_ADDRESS = '10.100.52.41:19999'
 GRPC_OPTION = [('grpc.max_send_message_length', 100 * 1024 * 1024),('grpc.max_receive_message_length', 100 * 1024 * 1024)]
 
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_default_client() -> MarketRpcClient:
+    """
+    获取模块级共享客户端，首次调用时创建；地址取环境变量 MARKETRPC_ENDPOINTS(逗号分隔，多个地址时负载均衡，
+    策略取 MARKETRPC_LB_POLICY)，未设置时使用 GRPC_SERVER_ADDRESS
+
+    :return: MarketRpcClient 或 BalancedRpcClient
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = create_client(os.environ.get(ENV_ENDPOINTS) or GRPC_SERVER_ADDRESS, options=GRPC_OPTION)
+    return _default_client
+
+def set_default_client(client: MarketRpcClient):
+    """
+    替换模块级共享客户端，原客户端会被关闭
+
+    :param client: 新的客户端，为空时下次调用重新按环境变量或 GRPC_SERVER_ADDRESS 创建
+    """
+    global _default_client
+    with _default_client_lock:
+        previous = _default_client
+        _default_client = client
+    if previous is not None and previous is not client:
+        previous.close()
+
+_default_cache = None
+_query_memo = None
+
+def set_default_cache(cache: MarketDataCache):
+    """
+    设置查询函数默认使用的本地磁盘缓存
+
+    缓存按 COLUMN_SCHEMAS 的列类型保存，命中与未命中时 records 结果的取值类型与不使用缓存时相同；
+    唯一的区别是价格/数量等 float 列中JSON写为整数的值(如 1)返回 1.0
+
+    :param cache: 本地磁盘缓存，为空时不使用缓存
+    """
+    global _default_cache
+    _default_cache = cache
+
+def set_query_memo(memo: QueryMemo):
+    """
+    开启进程内查询结果缓存，相同请求直接返回上次的解析结果
+
+    :param memo: 查询结果缓存，为空时关闭
+    """
+    global _query_memo
+    _query_memo = memo
+
+# 是否优先使用 queryBatch 类型化响应(默认关闭)；各服务地址是否支持在首次请求时协商并记录
+_binary_enabled = False
+_binary_support = {}
+
+def set_binary(enabled: bool):
+    """
+    开启或关闭类型化二进制响应，关闭后总是使用 queryData 的JSON响应
+
+    二进制响应中订单簿档位的价格与数量为 float 而非服务端的十进制字符串，与JSON响应的取值类型不同，
+    因此默认关闭，由调用方确认后开启。
+
+    :param enabled: 是否开启(default:关闭)
+    """
+    global _binary_enabled
+    _binary_enabled = enabled
+    _binary_support.clear()
+
 def datetime_to_millis(date_str: str) -> int:
     """
-    将日期时间字符串转换为毫秒级时间戳
+    将日期时间字符串转换为毫秒级时间戳，按上海时间解释，相同字符串的解析结果会被缓存
 
-    :param date_str: 日期时间字符串，格式为 'YYYY-MM-DD HH:MM:SS'。
+    :param date_str: 日期时间字符串，格式为 'YYYY-MM-DD HH:MM:SS' 或 'YYYY-MM-DD'。
                      如果输入格式不正确或字符串为空，则会抛出 ValueError。
     :return: 毫秒级时间戳
     :raises ValueError: 如果输入的日期时间字符串格式不正确或为空。
     """
     if not date_str:
         raise ValueError("日期时间字符串不能为空")
-    
-    date_format = "%Y-%m-%d %H:%M:%S"
     try:
-        if len(date_str) == 10:
-            date_str = date_str + " 00:00:00"
-        date_obj = datetime.strptime(date_str, date_format)
-        timestamp_sec = date_obj.timestamp()
-        timestamp_millisec = int(timestamp_sec * 1000)
+        return parse_time(date_str)
     except ValueError as e:
         raise ValueError(f"无效的日期时间格式 '{date_str}': {e}")
 
-    return timestamp_millisec
+def normalize_timestamp(value: any, name: str = "Timestamp") -> int:
+    """
+    将日期时间字符串、秒级或毫秒级时间戳、datetime 或 numpy.datetime64 统一转换为毫秒级时间戳
+
+    :param value: 日期时间字符串('YYYY-MM-DD HH:MM:SS')、10位秒级/13位毫秒级时间戳、datetime 或 numpy.datetime64，
+                  不带时区的值按上海时间解释；批量转换见 rpcTime.to_millis_array
+    :param name: 报错信息中使用的参数名
+    :return: 毫秒级时间戳
+    :raises ValueError: 类型不支持，或数值时间戳既不是秒级也不是毫秒级
+    """
+    if isinstance(value, str):
+        return datetime_to_millis(value)
+    return to_millis(value, name)
 
 def calculate_percentage(start_time, end_time, curr_time):
     """
@@ -58,6 +145,311 @@ def calculate_percentage(start_time, end_time, curr_time):
     percentage = ((curr_time - start_time) / (end_time - start_time)) * 100
     return percentage
 
+def _check_query_args(exchange: str, account_type: str, symbol: str, start_time: any, end_time: any, limit: int):
+    if not exchange:
+        raise ValueError("Exchange Exception Error.")
+    if not account_type:
+        raise ValueError("Account type cannot be empty.")
+    if not symbol:
+        raise ValueError("Symbol cannot be empty.")
+    start_time = normalize_timestamp(start_time, "Start time")
+    end_time = normalize_timestamp(end_time, "End time")
+    if start_time > end_time:
+        raise ValueError("Start time must be less than or equal to end time.")
+    if not 1 <= limit <= 10000:
+        raise ValueError("Limit must be between 1 and 10000.")
+    return start_time, end_time
+
+def build_kline_request(
+    account_type: str,
+    symbol: str,
+    kline_interval_second: int,
+    start_time: any,
+    end_time: any,
+    start_id: int = 0,
+    end_id: int = 0,
+    schema: str = "BINANCE",
+    type: str = "KLINE",
+    limit: int = 10000,
+    exchange: str = "BINANCE",
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False
+):
+    """
+    校验参数并构造K线查询请求，参数含义同 market_kline
+
+    :return: market_history_pb2.DataRequest
+    :raises ValueError: 参数不合法
+    """
+    start_time, end_time = _check_query_args(exchange, account_type, symbol, start_time, end_time, limit)
+    if kline_interval_second <= 0:
+        raise ValueError("Kline interval second must be greater than 0.")
+
+    json_data = json.dumps({
+        "schema": schema.upper(),
+        "exchange": exchange.upper(),
+        "account_type": account_type.upper(),
+        "symbol": symbol.upper(),
+        "kline_interval_second": kline_interval_second,
+        "start_time": start_time,
+        "end_time": end_time,
+        "start_id": start_id,
+        "end_id": end_id,
+        "limit": limit,
+        "is_asc": is_asc,
+        "is_gzip": is_gzip,
+        "debug": debug
+    })
+
+    return market_history_pb2.DataRequest(
+        type=type,
+        jsonData=json_data,
+        accept_encoding=ENCODING_GZIP if is_gzip else ""
+    )
+
+def build_aggtrade_request(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    start_id: int = 0,
+    end_id: int = 0,
+    schema: str = "BINANCE",
+    type: str = "AGG_TRADE",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False
+):
+    """
+    校验参数并构造成交流查询请求，参数含义同 market_aggtrade
+
+    :return: market_history_pb2.DataRequest
+    :raises ValueError: 参数不合法
+    """
+    start_time, end_time = _check_query_args(exchange, account_type, symbol, start_time, end_time, limit)
+
+    json_data = json.dumps({
+        "schema": schema.upper(),
+        "exchange": exchange.upper(),
+        "account_type": account_type.upper(),
+        "symbol": symbol.upper(),
+        "start_time": start_time,
+        "end_time": end_time,
+        "start_id": start_id,
+        "end_id": end_id,
+        "limit": limit,
+        "is_asc": is_asc,
+        "is_gzip": is_gzip,
+        "debug": debug
+    })
+
+    return market_history_pb2.DataRequest(
+        type=type,
+        jsonData=json_data,
+        accept_encoding=ENCODING_GZIP if is_gzip else ""
+    )
+
+def build_orderbook_request(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any = 0,
+    end_time: any = 0,
+    start_id: int = 0,
+    end_id: int = 0,
+    schema: str = "BINANCE",
+    type: str = "ORDER_BOOK",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False
+):
+    """
+    校验参数并构造订单簿查询请求，参数含义同 market_orderbook
+
+    :return: market_history_pb2.DataRequest
+    :raises ValueError: 参数不合法
+    """
+    start_time, end_time = _check_query_args(exchange, account_type, symbol, start_time, end_time, limit)
+
+    json_data = json.dumps({
+        "schema": schema.upper(),
+        "exchange": exchange.upper(),
+        "account_type": account_type.upper(),
+        "symbol": symbol.upper(),
+        "start_id": start_id,
+        "end_id": end_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "limit": limit,
+        "is_asc": is_asc,
+        "is_gzip": is_gzip
+    })
+
+    return market_history_pb2.DataRequest(
+        type=type,
+        jsonData=json_data,
+        accept_encoding=ENCODING_GZIP if is_gzip else ""
+    )
+
+def parse_reply(response, output: str = OUTPUT_RECORDS, type: str = None, metrics: RequestMetrics = None) -> list:
+    """
+    解析服务端响应中的JSON数据
+
+    :param response: market_history_pb2.DataReply 或 RawDataReply
+    :param output: 输出格式，records / columns / numpy / pandas
+    :param type: 数据类型，为空时使用响应中的类型
+    :param metrics: 请求指标，非空时记录解析与格式转换耗时
+    :return: [数据列表]，非 records 格式时为 [列式数据]
+    :raises ValueError: 响应不是合法的JSON、缺少data字段或无法解压
+    """
+    decode_start = time.perf_counter_ns() if metrics is not None else 0
+    try:
+        payload = reply_json(response)
+    except ValueError as e:
+        logger.error(f"Failed to decompress response: {e}")
+        raise
+
+    if output != OUTPUT_RECORDS:
+        type = type or response.type
+        try:
+            columns = decode_columns(payload, type, OUTPUT_COLUMNS)
+        except ValueError as e:
+            logger.error(f"Failed to decode response: {e}")
+            raise
+        if metrics is None:
+            return [to_output(columns, type, output)]
+        post_start = time.perf_counter_ns()
+        metrics.decode_ns += post_start - decode_start
+        result = to_output(columns, type, output)
+        metrics.post_ns += time.perf_counter_ns() - post_start
+        return [result]
+
+    # grpc 调试
+    # logger.info(f"Code: {response.code}, Message: {response.msg}, Success: {response.success}, Type: {response.type}, JSON Data: {response.jsonData}")
+
+    try:
+        json_data = rpcDecode.loads(payload)
+    except ValueError as e:
+        logger.error(f"Failed to decode JSON: {e}")
+        raise ValueError("Failed to decode JSON from server response.") from e
+    if metrics is not None:
+        metrics.decode_ns += time.perf_counter_ns() - decode_start
+
+    market_list = []
+
+    if not isinstance(json_data, dict) or "data" not in json_data:
+        logger.error(f"Invalid JSON response: {json_data}")
+        raise ValueError("Invalid JSON response format.")
+    else:
+        market_list.append(json_data["data"])
+        return market_list
+
+def query_data(data_request, client: MarketRpcClient = None, debug: bool = False, output: str = OUTPUT_RECORDS,
+               build_start: int = 0, timeout: float = None) -> list:
+    """
+    发送查询请求并解析结果
+
+    :param data_request: market_history_pb2.DataRequest
+    :param client: 行情客户端，为空时使用默认共享客户端
+    :param debug: 是否打印请求内容
+    :param output: 输出格式，records / columns / numpy / pandas
+    :param build_start: 开始构造请求时 rpcMetrics.clock() 的值，用于统计构造请求的耗时
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
+    :return: [数据列表]
+    :raises grpc.RpcError: gRPC请求失败
+    """
+    check_output(output)
+    if debug:
+        logger.info(f"data_request - type: {data_request.type}, json_data: {data_request.jsonData}")
+
+    # 命中查询结果缓存时 method 保持为 memo，发出RPC时改为实际调用的方法
+    memo = _query_memo
+    metrics = rpcMetrics.begin("memo" if memo is not None else "queryData", data_request.type, build_start)
+    try:
+        if memo is not None:
+            client = client or get_default_client()
+            result = memo.query(data_request, output, lambda: _fetch_reply(data_request, client, output, metrics, timeout),
+                                client.address)
+        else:
+            result = _fetch_reply(data_request, client, output, metrics, timeout)[0]
+    except Exception as e:
+        rpcMetrics.finish(metrics, e)
+        raise
+    if metrics is not None:
+        metrics.rows = page_length(result[0], output) if result[0] is not None else 0
+        rpcMetrics.finish(metrics)
+    return result
+
+def _fetch_batch(data_request, client: MarketRpcClient, timeout: float = None):
+    # 服务端不支持 queryBatch 时返回None，并记录该地址之后直接使用JSON响应
+    try:
+        response = client.query_batch(data_request, timeout=timeout)
+    except grpc.RpcError as e:
+        if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+            raise
+        logger.info(f"Server {client.address} does not implement queryBatch, using JSON replies.")
+        _binary_support[client.address] = False
+        return None
+    _binary_support[client.address] = True
+    return response
+
+def _fetch_reply(data_request, client: MarketRpcClient, output: str, metrics: RequestMetrics = None,
+                 timeout: float = None):
+    timerStartTimestamp = time.perf_counter_ns()
+    client = client or get_default_client()
+    binary = _binary_enabled and batch_supported(data_request.type) and _binary_support.get(client.address) is not False
+
+    if metrics is not None:
+        metrics.method = "queryBatch" if binary else "queryData"
+
+    try:
+        response = _fetch_batch(data_request, client, timeout) if binary else None
+        if response is None:
+            binary = False
+            if metrics is not None:
+                metrics.method = "queryData"
+            response = client.query(data_request, timeout=timeout)
+        timerEndTimestamp = time.perf_counter_ns()
+        logger.info(f"Time elapsed: {(timerEndTimestamp - timerStartTimestamp) / 1e9:.2f} seconds")
+    except grpc.RpcError as e:
+        logger.error(f"gRPC request failed with code {e.code()}: {e.details()}")
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
+
+    size = response.ByteSize()
+    if metrics is not None:
+        metrics.rpc_ns = timerEndTimestamp - timerStartTimestamp
+        metrics.bytes = size
+    if binary:
+        try:
+            result = [decode_batch(response, data_request.type, output)]
+        except ValueError as e:
+            logger.error(f"Failed to decode response: {e}")
+            raise
+        if metrics is not None:
+            metrics.decode_ns = time.perf_counter_ns() - timerEndTimestamp
+        return result, size
+    return parse_reply(response, output, data_request.type, metrics), size
+
+def _cached_query(cache, query, key: tuple, start_time: any, end_time: any, limit: int, is_asc: bool, output: str, kwargs: dict) -> list:
+    check_output(output)
+    # 缓存键以服务地址开头，不同服务的数据分目录保存
+    client = kwargs.get("client") or get_default_client()
+    key = (client.address,) + tuple(str(part).upper() for part in key)
+    start_time = normalize_timestamp(start_time, "Start time")
+    end_time = normalize_timestamp(end_time, "End time")
+
+    # 缓存在取满 limit 行后即停止拉取，按 limit 分页且不预取，避免多拉随后被丢弃的数据
+    def fetch(start, end, asc):
+        return _iter_pages(query, key[5], start, end, limit, asc, False, dict(kwargs, output="numpy"))
+
+    return [cache.query(key, start_time, end_time, fetch, limit=limit, is_asc=is_asc, output=output)]
+
 # 查询市场K线数据。
 def market_kline(
     account_type: str,
@@ -73,7 +465,11 @@ def market_kline(
     exchange: str = "BINANCE",
     is_asc: bool = True,
     is_gzip: bool = False,
-    debug: bool = False
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    output: str = "records",
+    cache: MarketDataCache = None,
+    timeout: float = None
 ):
     """
     查询市场K线数据(倒序输出)
@@ -90,8 +486,12 @@ def market_kline(
     :param end_id: 结束ID
     :param limit: 数据限制数量(default:10000)
     :param is_asc: 是否升序排列
-    :param is_gzip: 是否使用gzip压缩
+    :param is_gzip: 是否请求gzip压缩的响应，客户端自动解压
     :param debug: 是否开启调试模式
+    :param client: 行情客户端，为空时使用默认共享客户端
+    :param output: 输出格式，records 为行字典列表，columns / numpy / pandas 为按列解析的类型化数据(default:records)
+    :param cache: 本地磁盘缓存 MarketDataCache，为空时使用 set_default_cache 设置的缓存，False 时不使用缓存；按ID查询时不使用缓存；取值类型说明见 set_default_cache
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
     :return Time: 标准上海时间
     :return Timestamp: 时间戳
     :return IntervalSecond: K线时间间隔(1秒,1分钟,1小时)
@@ -109,93 +509,20 @@ def market_kline(
     :return EndId: 结束ID
     """
 
-    if not exchange:
-        raise ValueError("Exchange Exception Error.")
-    if not account_type:
-        raise ValueError("Account type cannot be empty.")
-    if not symbol:
-        raise ValueError("Symbol cannot be empty.")
-    if isinstance(start_time, str):
-        start_time = datetime_to_millis(start_time)
-    elif isinstance(start_time, int):
-        if len(str(start_time)) == 10:
-            start_time = int(start_time) * 1000
-        elif len(str(start_time)) == 13:
-            start_time = int(start_time)
-        else:
-            raise ValueError("Start time must be in seconds or milliseconds.")
-    if isinstance(end_time, str):
-        end_time = datetime_to_millis(end_time)
-    elif isinstance(end_time, int):
-        if len(str(end_time)) == 10:
-            end_time = int(end_time) * 1000
-        elif len(str(end_time)) == 13:
-            end_time = int(end_time)
-        else:
-            raise ValueError("End time must be in seconds or milliseconds.")
-    if start_time > end_time:
-        raise ValueError("Start time must be less than or equal to end time.")
-    if kline_interval_second <= 0:
-        raise ValueError("Kline interval second must be greater than 0.")
-    if not 1 <= limit <= 10000:
-        raise ValueError("Limit must be between 1 and 10000.")
-    
-    timerStartTimestamp = time.time()
-
-    with grpc.insecure_channel(GRPC_SERVER_ADDRESS) as channel:
-        stub = market_history_pb2_grpc.MarketHistoryServiceStub(channel)
-
-        json_data = json.dumps({
-            "schema": schema.upper(),
-            "exchange": exchange.upper(),
-            "account_type": account_type.upper(),
-            "symbol": symbol.upper(),
-            "kline_interval_second": kline_interval_second,
-            "start_time": start_time,
-            "end_time": end_time,
-            "start_id": start_id,
-            "end_id": end_id,
-            "limit": limit,
-            "is_asc": is_asc,
-            "is_gzip": is_gzip,
-            "debug": debug
-        })
-
-        data_request = market_history_pb2.DataRequest(
-            type=type,
-            jsonData=json_data
-        )
-
-        if debug:
-            logging.info(f"data_request - type: {type}, json_data: {json_data}")
-
-        try:
-            response = stub.queryData(data_request)
-            timerEndTimestamp = time.time()
-            logging.info(f"Time elapsed: {timerEndTimestamp - timerStartTimestamp:.2f} seconds")
-        except grpc.RpcError as e:
-            logging.error(f"gRPC request failed with code {e.code()}: {e.details()}")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-
-        # grpc 调试
-        # logging.info(f"Code: {response.code}, Message: {response.msg}, Success: {response.success}, Type: {response.type}, JSON Data: {response.jsonData}")
-
-        try:
-            json_data = json.loads(response.jsonData)
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to decode JSON: {e}")
-            raise ValueError("Failed to decode JSON from server response.") from e
-
-        market_kline_list = []
+    build_start = rpcMetrics.clock()
+    data_request = build_kline_request(
+        account_type, symbol, kline_interval_second, start_time, end_time, start_id, end_id,
+        schema, type, limit, exchange, is_asc, is_gzip, debug
+    )
+    cache = _default_cache if cache is None else cache
+    if cache and not start_id and not end_id:
+        kwargs = dict(account_type=account_type, symbol=symbol, kline_interval_second=kline_interval_second,
+                      schema=schema, exchange=exchange, is_gzip=is_gzip, debug=debug, client=client,
+                      timeout=timeout)
+        key = (schema, exchange, account_type, symbol, type, kline_interval_second)
+        return _cached_query(cache, market_kline, key, start_time, end_time, limit, is_asc, output, kwargs)
+    return query_data(data_request, client=client, debug=debug, output=output, build_start=build_start, timeout=timeout)
 
-        if not isinstance(json_data, dict) or "data" not in json_data:
-            logging.error(f"Invalid JSON response: {json_data}")
-            raise ValueError("Invalid JSON response format.")
-        else:
-            market_kline_list.append(json_data["data"])
-            return market_kline_list
-    
 # 查询市场成交流数据
 def market_aggtrade(
     exchange: str,
@@ -210,7 +537,11 @@ def market_aggtrade(
     limit: int = 10000,
     is_asc: bool = True,
     is_gzip: bool = False,
-    debug: bool = False
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    output: str = "records",
+    cache: MarketDataCache = None,
+    timeout: float = None
 ): 
     """
     查询市场交易数据(正序输出)
@@ -225,7 +556,11 @@ def market_aggtrade(
     :param end_id: 结束ID
     :param limit: 数据限制数量(default:10000)
     :param is_asc: 是否升序排列
-    :param is_gzip: 是否使用gzip压缩
+    :param is_gzip: 是否请求gzip压缩的响应，客户端自动解压
+    :param client: 行情客户端，为空时使用默认共享客户端
+    :param output: 输出格式，records 为行字典列表，columns / numpy / pandas 为按列解析的类型化数据(default:records)
+    :param cache: 本地磁盘缓存 MarketDataCache，为空时使用 set_default_cache 设置的缓存，False 时不使用缓存；按ID查询时不使用缓存；取值类型说明见 set_default_cache
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
     :return Time: 标准上海时间
     :return Timestamp: 时间戳
     :return AId: 数据id
@@ -235,88 +570,19 @@ def market_aggtrade(
     :return Quantity: 数量
     :return IsBuyer: bool类型(True|False)
     """
-    if not exchange:
-        raise ValueError("Exchange Exception Error.")
-    if not account_type:
-        raise ValueError("Account type cannot be empty.")
-    if not symbol:
-        raise ValueError("Symbol cannot be empty.")
-    if isinstance(start_time, str):
-        start_time = datetime_to_millis(start_time)
-    elif isinstance(start_time, int):
-        if len(str(start_time)) == 10:
-            start_time = int(start_time) * 1000
-        elif len(str(start_time)) == 13:
-            start_time = int(start_time)
-        else:
-            raise ValueError("Start time must be in seconds or milliseconds.")
-    if isinstance(end_time, str):
-        end_time = datetime_to_millis(end_time)
-    elif isinstance(end_time, int):
-        if len(str(end_time)) == 10:
-            end_time = int(end_time) * 1000
-        elif len(str(end_time)) == 13:
-            end_time = int(end_time)
-        else:
-            raise ValueError("End time must be in seconds or milliseconds.")
-    if start_time > end_time:
-        raise ValueError("Start time must be less than or equal to end time.")
-    if not 1 <= limit <= 10000:
-        raise ValueError("Limit must be between 1 and 10000.")
-    
-    timerStartTimestamp = time.time()
-
-    with grpc.insecure_channel(GRPC_SERVER_ADDRESS) as channel:
-        stub = market_history_pb2_grpc.MarketHistoryServiceStub(channel)
-
-        json_data = json.dumps({
-            "schema": schema.upper(),
-            "exchange": exchange.upper(),
-            "account_type": account_type.upper(),
-            "symbol": symbol.upper(),
-            "start_time": start_time,
-            "end_time": end_time,
-            "start_id": start_id,
-            "end_id": end_id,
-            "limit": limit,
-            "is_asc": is_asc,
-            "is_gzip": is_gzip,
-            "debug": debug
-        })
-
-        data_request = market_history_pb2.DataRequest(
-            type=type,
-            jsonData=json_data
-        )
-
-        if debug:
-            logging.info(f"data_request - type: {type}, json_data: {json_data}")
-
-        try:
-            response = stub.queryData(data_request)
-            timerEndTimestamp = time.time()
-            logging.info(f"Time elapsed: {timerEndTimestamp - timerStartTimestamp:.2f} seconds")
-        except grpc.RpcError as e:
-            logging.error(f"gRPC request failed with code {e.code()}: {e.details()}")
-            raise
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-            raise
-
-        try:
-            json_data = json.loads(response.jsonData)
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to decode JSON: {e}")
-            raise ValueError("Failed to decode JSON from server response.") from e
-
-        market_aggtrade_list = []
-
-        if not isinstance(json_data, dict) or "data" not in json_data:
-            logging.error(f"Invalid JSON response: {json_data}")
-            raise ValueError("Invalid JSON response format.")
-        else:
-            market_aggtrade_list.append(json_data["data"])
-            return market_aggtrade_list
+    build_start = rpcMetrics.clock()
+    data_request = build_aggtrade_request(
+        exchange, account_type, symbol, start_time, end_time, start_id, end_id,
+        schema, type, limit, is_asc, is_gzip, debug
+    )
+    cache = _default_cache if cache is None else cache
+    if cache and not start_id and not end_id:
+        kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                      schema=schema, is_gzip=is_gzip, debug=debug, client=client,
+                      timeout=timeout)
+        key = (schema, exchange, account_type, symbol, type, 0)
+        return _cached_query(cache, market_aggtrade, key, start_time, end_time, limit, is_asc, output, kwargs)
+    return query_data(data_request, client=client, debug=debug, output=output, build_start=build_start, timeout=timeout)
 
 # 查询市场订单簿数据
 def market_orderbook(
@@ -332,7 +598,11 @@ def market_orderbook(
     limit: int = 10000,
     is_asc: bool = True,
     is_gzip: bool = False,
-    debug: bool = False
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    output: str = "records",
+    cache: MarketDataCache = None,
+    timeout: float = None
 ):
     """
     查询市场订单簿数据(正序输出)
@@ -347,7 +617,11 @@ def market_orderbook(
     :param end_time: 结束时间戳
     :param limit: 数据限制数量(default:10000)
     :param is_asc: 是否升序排列
-    :param is_gzip: 是否使用gzip压缩
+    :param is_gzip: 是否请求gzip压缩的响应，客户端自动解压
+    :param client: 行情客户端，为空时使用默认共享客户端
+    :param output: 输出格式，records 为行字典列表，columns / numpy / pandas 为按列解析的类型化数据(default:records)
+    :param cache: 本地磁盘缓存 MarketDataCache，为空时使用 set_default_cache 设置的缓存，False 时不使用缓存；按ID查询时不使用缓存；取值类型说明见 set_default_cache
+    :param timeout: 单次请求尝试的超时时间(秒)，为空时使用客户端 RetryPolicy 的 timeout
     :return Time: 标准上海时间
     :return Timestamp: 时间戳
     :return UId: u_id
@@ -356,84 +630,492 @@ def market_orderbook(
     :return Asks: 卖单
     """
 
-    if not exchange:
-        raise ValueError("Exchange Exception Error.")
-    if not account_type:
-        raise ValueError("Account type cannot be empty.")
-    if not symbol:
-        raise ValueError("Symbol cannot be empty.")
-    if isinstance(start_time, str):
-        start_time = datetime_to_millis(start_time)
-    elif isinstance(start_time, int):
-        if len(str(start_time)) == 10:
-            start_time = int(start_time) * 1000
-        elif len(str(start_time)) == 13:
-            start_time = int(start_time)
-        else:
-            raise ValueError("Start time must be in seconds or milliseconds.")
-    if isinstance(end_time, str):
-        end_time = datetime_to_millis(end_time)
-    elif isinstance(end_time, int):
-        if len(str(end_time)) == 10:
-            end_time = int(end_time) * 1000
-        elif len(str(end_time)) == 13:
-            end_time = int(end_time)
+    build_start = rpcMetrics.clock()
+    data_request = build_orderbook_request(
+        exchange, account_type, symbol, start_time, end_time, start_id, end_id,
+        schema, type, limit, is_asc, is_gzip
+    )
+    cache = _default_cache if cache is None else cache
+    if cache and not start_id and not end_id:
+        kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                      schema=schema, is_gzip=is_gzip, debug=debug, client=client,
+                      timeout=timeout)
+        key = (schema, exchange, account_type, symbol, type, 0)
+        return _cached_query(cache, market_orderbook, key, start_time, end_time, limit, is_asc, output, kwargs)
+    return query_data(data_request, client=client, debug=debug, output=output, build_start=build_start, timeout=timeout)
+
+# 各数据类型用于分页去重的行主键
+PAGE_ROW_KEY = {
+    "KLINE": "Timestamp",
+    "AGG_TRADE": "AId",
+    "ORDER_BOOK": "UId",
+}
+
+class PageCursor(object):
+    """
+    分页游标，根据上一页最后一行的 Timestamp 计算下一页的时间窗口，并去除页边界上的重复行
+
+    下一页从上一页最后一行的时间戳(含)开始查询，避免同一毫秒内的多行被截断后丢失；
+    该时间戳上已返回过的行按 PAGE_ROW_KEY 中的主键过滤。
+
+    :param type: 数据类型
+    :param start_time: 开始毫秒时间戳
+    :param end_time: 结束毫秒时间戳
+    :param limit: 每页数据数量
+    :param is_asc: 是否升序排列
+    """
+
+    def __init__(self, type: str, start_time: int, end_time: int, limit: int, is_asc: bool = True):
+        self.key = PAGE_ROW_KEY.get(type.upper())
+        self.start_time = start_time
+        self.end_time = end_time
+        self.limit = limit
+        self.is_asc = is_asc
+        self.boundary = None
+        self.boundary_keys = set()
+        self.done = start_time > end_time
+
+    def _row_key(self, row):
+        if self.key is not None:
+            return row.get(self.key)
+        return json.dumps(row, sort_keys=True)
+
+    def duplicates(self, timestamps, keys) -> int:
+        """
+        计算页首与上一页重复的行数
+
+        :param timestamps: 本页各行时间戳序列
+        :param keys: 本页各行主键序列
+        :return: 需要跳过的页首行数
+        """
+        skip = 0
+        if self.boundary is None:
+            return skip
+        for ts, key in zip(timestamps, keys):
+            if ts != self.boundary or key not in self.boundary_keys:
+                break
+            skip += 1
+        return skip
+
+    def advance(self, timestamps, keys):
+        """
+        根据本页的时间戳与主键推进游标
+
+        :param timestamps: 本页各行时间戳序列(服务端原始顺序)
+        :param keys: 本页各行主键序列
+        :return: 需要跳过的页首重复行数
+        """
+        skip = self.duplicates(timestamps, keys)
+        count = len(timestamps)
+        if count < self.limit:
+            self.done = True
+            return skip
+        last = int(timestamps[-1])
+        boundary_keys = self.boundary_keys if last == self.boundary else set()
+        for ts, key in zip(reversed(timestamps), reversed(keys)):
+            if ts != last:
+                break
+            boundary_keys.add(key)
+        if skip == count:
+            # 同一时间戳的数据超过一页，只能跳过该时间戳继续
+            logger.warning(f"More than {self.limit} rows share timestamp {last}, skipping ahead.")
+            last = last + 1 if self.is_asc else last - 1
+            boundary_keys = set()
+        self.boundary = last
+        self.boundary_keys = boundary_keys
+        if self.is_asc:
+            self.start_time = last
         else:
-            raise ValueError("End time must be in seconds or milliseconds.")
+            self.end_time = last
+        self.done = self.start_time > self.end_time
+        return skip
+
+    def advance_rows(self, rows: list) -> list:
+        """
+        根据本页行数据推进游标
+
+        :param rows: 本页行数据
+        :return: 去除重复后的行数据
+        """
+        timestamps = [row["Timestamp"] for row in rows]
+        keys = [self._row_key(row) for row in rows]
+        return rows[self.advance(timestamps, keys):]
+
+    def advance_page(self, page, output: str = OUTPUT_RECORDS):
+        """
+        根据本页数据推进游标，支持行字典列表与列式数据
+
+        :param page: 本页数据
+        :param output: 本页数据的格式
+        :return: 去除重复后的本页数据
+        """
+        if output == OUTPUT_RECORDS:
+            return self.advance_rows(page)
+        timestamps = column_values(page, "Timestamp")
+        keys = column_values(page, self.key or "Timestamp")
+        skip = self.advance(timestamps, keys)
+        return slice_columns(page, skip) if skip else page
+
+def page_length(page, output: str = OUTPUT_RECORDS) -> int:
+    """
+    一页数据的行数
+
+    :param page: 行字典列表或列式数据
+    :param output: 数据格式
+    :return: 行数
+    """
+    if output == OUTPUT_RECORDS:
+        return len(page)
+    return column_length(page)
+
+def _iter_pages(query, type: str, start_time: any, end_time: any, limit: int, is_asc: bool, prefetch: bool, kwargs: dict):
+    start_time = normalize_timestamp(start_time, "Start time")
+    end_time = normalize_timestamp(end_time, "End time")
     if start_time > end_time:
         raise ValueError("Start time must be less than or equal to end time.")
-    if not 1 <= limit <= 10000:
-        raise ValueError("Limit must be between 1 and 10000.")
+    # limit 为 "auto" 时每页按观测到的耗时与字节数重新取值，游标按请求时的页大小判断是否结束
+    cursor = PageCursor(type, start_time, end_time, page_limit(limit, type), is_asc)
+    output = kwargs.get("output", OUTPUT_RECORDS)
 
-    timerStartTimestamp = time.time()
-
-    with grpc.insecure_channel(GRPC_SERVER_ADDRESS,options=GRPC_OPTION) as channel:
-        stub = market_history_pb2_grpc.MarketHistoryServiceStub(channel)
-
-        json_data = json.dumps({
-            "schema": schema.upper(),
-            "exchange": exchange.upper(),
-            "account_type": account_type.upper(),
-            "symbol": symbol.upper(),
-            "start_id": start_id,
-            "end_id": end_id,
-            "start_time": start_time,
-            "end_time": end_time,
-            "limit": limit,
-            "is_asc": is_asc,
-            "is_gzip": is_gzip
-        })
-
-        data_request = market_history_pb2.DataRequest(
-            type=type,
-            jsonData=json_data
-        )
-
-        if debug:
-            logging.info(f"data_request - type: {type}, json_data: {json_data}")
+    def fetch(start, end, page_size):
+        page = query(start_time=start, end_time=end, type=type, limit=page_size, is_asc=is_asc, cache=False, **kwargs)[0]
+        return [] if page is None else page
 
-        try:
-            response = stub.queryData(data_request)
-            timerEndTimestamp = time.time()
-            logging.info(f"Time elapsed: {timerEndTimestamp - timerStartTimestamp:.2f} seconds")
-        except grpc.RpcError as e:
-            logging.error(f"gRPC request failed with code {e.code()}: {e.details()}")
-            raise market_history_pb2_grpc.MarketHistoryServiceStub(f"Failed to fetch market orderbook: {e.details()}") from e
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-            raise market_history_pb2_grpc.MarketHistoryServiceStub("An unexpected error occurred during the gRPC request.") from e
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        pending = None
+        while not cursor.done:
+            if pending is not None:
+                rows = pending.result()
+            else:
+                rows = fetch(cursor.start_time, cursor.end_time, cursor.limit)
+            pending = None
+            rows = cursor.advance_page(rows, output)
+            cursor.limit = page_limit(limit, type)
+            # 在调用方处理当前页时预取下一页
+            if executor is not None and not cursor.done:
+                pending = executor.submit(fetch, cursor.start_time, cursor.end_time, cursor.limit)
+            if page_length(rows, output):
+                yield rows
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
 
-        try:
-            json_data = json.loads(response.jsonData)
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to decode JSON: {e}")
-            raise ValueError("Failed to decode JSON from server response.") from e
+# 分页查询市场K线数据
+def iter_kline(
+    account_type: str,
+    symbol: str,
+    kline_interval_second: int,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "KLINE",
+    limit: int = 10000,
+    exchange: str = "BINANCE",
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    prefetch: bool = True,
+    pages: bool = False,
+    output: str = "records"
+):
+    """
+    按页遍历 [start_time, end_time] 内的全部K线数据，不受单次10000条的限制
 
-        market_orderbook_list = []
+    参数含义同 market_kline，limit 为每页数据数量，"auto" 时按数据类型自适应(见 rpcPacing.AdaptivePageSize)。
 
-        if not isinstance(json_data, dict) or "data" not in json_data:
-            logging.error(f"Invalid JSON response: {json_data}")
-            raise ValueError("Invalid JSON response format.")
-        else:
-            market_orderbook_list.append(json_data["data"])
-            return market_orderbook_list
+    :param prefetch: 是否在处理当前页时预取下一页(default:True)
+    :param pages: 为True时按页产出行列表，否则逐行产出
+    :param output: 输出格式，非 records 时总是按页产出列式数据
+    :return: 行数据(或每页数据)的生成器
+    """
+    kwargs = dict(account_type=account_type, symbol=symbol, kline_interval_second=kline_interval_second,
+                  schema=schema, exchange=exchange, is_gzip=is_gzip, debug=debug, client=client, output=output)
+    page_iter = _iter_pages(market_kline, type, start_time, end_time, limit, is_asc, prefetch, kwargs)
+    if pages or output != OUTPUT_RECORDS:
+        return page_iter
+    return (row for rows in page_iter for row in rows)
+
+# 分页查询市场成交流数据
+def iter_aggtrade(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "AGG_TRADE",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    prefetch: bool = True,
+    pages: bool = False,
+    output: str = "records"
+):
+    """
+    按页遍历 [start_time, end_time] 内的全部成交流数据，不受单次10000条的限制
+
+    参数含义同 market_aggtrade，limit 为每页数据数量，"auto" 时按数据类型自适应。
+
+    :param prefetch: 是否在处理当前页时预取下一页(default:True)
+    :param pages: 为True时按页产出行列表，否则逐行产出
+    :param output: 输出格式，非 records 时总是按页产出列式数据
+    :return: 行数据(或每页数据)的生成器
+    """
+    kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                  schema=schema, is_gzip=is_gzip, debug=debug, client=client, output=output)
+    page_iter = _iter_pages(market_aggtrade, type, start_time, end_time, limit, is_asc, prefetch, kwargs)
+    if pages or output != OUTPUT_RECORDS:
+        return page_iter
+    return (row for rows in page_iter for row in rows)
+
+# 分页查询市场订单簿数据
+def iter_orderbook(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "ORDER_BOOK",
+    limit: int = 10000,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    prefetch: bool = True,
+    pages: bool = False,
+    output: str = "records"
+):
+    """
+    按页遍历 [start_time, end_time] 内的全部订单簿数据，不受单次10000条的限制
+
+    参数含义同 market_orderbook，limit 为每页数据数量，"auto" 时按数据类型自适应。
+
+    :param prefetch: 是否在处理当前页时预取下一页(default:True)
+    :param pages: 为True时按页产出行列表，否则逐行产出
+    :param output: 输出格式，非 records 时总是按页产出列式数据
+    :return: 行数据(或每页数据)的生成器
+    """
+    kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                  schema=schema, is_gzip=is_gzip, debug=debug, client=client, output=output)
+    page_iter = _iter_pages(market_orderbook, type, start_time, end_time, limit, is_asc, prefetch, kwargs)
+    if pages or output != OUTPUT_RECORDS:
+        return page_iter
+    return (row for rows in page_iter for row in rows)
+
+def _stream_request(data_request, limit: int, chunk_size: int):
+    # 流式请求不受单次10000条的限制，limit 为0时返回整个时间范围
+    if limit < 0:
+        raise ValueError("Limit must be greater than or equal to 0.")
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be greater than 0.")
+    params = json.loads(data_request.jsonData)
+    params["limit"] = limit
+    params["chunk_size"] = chunk_size
+    return market_history_pb2.DataRequest(type=data_request.type, jsonData=json.dumps(params),
+                                          accept_encoding=data_request.accept_encoding)
+
+def stream_data(data_request, client: MarketRpcClient = None, debug: bool = False, output: str = OUTPUT_RECORDS,
+                timeout: float = None):
+    """
+    发送streamData请求，逐块解析并产出数据；每块解析完即可使用，内存占用只与块大小相关
+
+    调用方停止读取时服务端随流控暂停发送，关闭生成器时取消RPC。
+
+    :param data_request: market_history_pb2.DataRequest
+    :param client: 行情客户端，为空时使用默认共享客户端
+    :param debug: 是否打印请求内容
+    :param output: 输出格式，records / columns / numpy / pandas
+    :param timeout: 整个流的超时时间(秒)
+    :return: 每块数据的生成器，records 为行列表，其他格式为列式数据
+    :raises grpc.RpcError: gRPC请求失败，服务端未实现 streamData 时状态码为 UNIMPLEMENTED
+    """
+    check_output(output)
+    if debug:
+        logger.info(f"stream_request - type: {data_request.type}, json_data: {data_request.jsonData}")
+
+    timerStartTimestamp = time.perf_counter_ns()
+    metrics = rpcMetrics.begin("streamData", data_request.type)
+    call = (client or get_default_client()).stream(data_request, timeout=timeout)
+    chunks = 0
+    rows = 0
+    error = None
+    try:
+        while True:
+            # 只统计等待服务端数据的时间，不含调用方处理每块数据的时间
+            wait_start = time.perf_counter_ns() if metrics is not None else 0
+            response = next(call, None)
+            if response is None:
+                break
+            if metrics is not None:
+                metrics.rpc_ns += time.perf_counter_ns() - wait_start
+                metrics.bytes += response.ByteSize()
+            chunk = parse_reply(response, output, data_request.type, metrics)[0]
+            if chunk is None:
+                continue
+            chunks += 1
+            rows += page_length(chunk, output)
+            yield chunk
+    except grpc.RpcError as e:
+        error = e
+        if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+            logger.error(f"gRPC stream failed with code {e.code()}: {e.details()}")
+        raise
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        call.cancel()
+        if metrics is not None:
+            metrics.rows = rows
+            rpcMetrics.finish(metrics, error)
+    logger.info(f"Streamed {rows} rows in {chunks} chunks, time elapsed: {(time.perf_counter_ns() - timerStartTimestamp) / 1e9:.2f} seconds")
+
+def _stream_pages(data_request, query, start_time: any, end_time: any, limit: int, is_asc: bool, output: str,
+                  timeout: float, kwargs: dict):
+    chunks = stream_data(data_request, kwargs.get("client"), kwargs.get("debug", False), output, timeout)
+    try:
+        first = next(chunks)
+    except StopIteration:
+        return
+    except grpc.RpcError as e:
+        if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+            raise
+        # 服务端不支持流式接口时退化为分页查询
+        logger.warning("Server does not implement streamData, falling back to paged queryData.")
+        remaining = limit or None
+        for page in _iter_pages(query, data_request.type, start_time, end_time, 10000, is_asc, True,
+                                dict(kwargs, output=output)):
+            if remaining is not None:
+                page = page[:remaining] if output == OUTPUT_RECORDS else slice_columns(page, 0, remaining)
+                remaining -= page_length(page, output)
+            yield page
+            if remaining is not None and remaining <= 0:
+                return
+        return
+    yield first
+    yield from chunks
+
+# 流式查询市场K线数据
+def stream_kline(
+    account_type: str,
+    symbol: str,
+    kline_interval_second: int,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "KLINE",
+    limit: int = 0,
+    exchange: str = "BINANCE",
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    chunk_size: int = 1000,
+    pages: bool = False,
+    output: str = "records",
+    timeout: float = None
+):
+    """
+    通过 streamData 流式接收 [start_time, end_time] 内的K线数据，首行延迟与峰值内存只取决于块大小
+
+    参数含义同 market_kline；服务端未实现 streamData 时退化为 iter_kline 分页查询。
+
+    :param limit: 最多返回的行数，0 表示不限制(default:0)
+    :param chunk_size: 服务端每块发送的行数(default:1000)
+    :param pages: 为True时按块产出行列表，否则逐行产出
+    :param output: 输出格式，非 records 时总是按块产出列式数据
+    :param timeout: 整个流的超时时间(秒)
+    :return: 行数据(或每块数据)的生成器
+    """
+    data_request = build_kline_request(
+        account_type, symbol, kline_interval_second, start_time, end_time, 0, 0,
+        schema, type, 10000, exchange, is_asc, is_gzip, debug
+    )
+    data_request = _stream_request(data_request, limit, chunk_size)
+    kwargs = dict(account_type=account_type, symbol=symbol, kline_interval_second=kline_interval_second,
+                  schema=schema, exchange=exchange, is_gzip=is_gzip, debug=debug, client=client)
+    page_iter = _stream_pages(data_request, market_kline, start_time, end_time, limit, is_asc, output, timeout, kwargs)
+    if pages or output != OUTPUT_RECORDS:
+        return page_iter
+    return (row for rows in page_iter for row in rows)
+
+# 流式查询市场成交流数据
+def stream_aggtrade(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "AGG_TRADE",
+    limit: int = 0,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    chunk_size: int = 1000,
+    pages: bool = False,
+    output: str = "records",
+    timeout: float = None
+):
+    """
+    通过 streamData 流式接收 [start_time, end_time] 内的成交流数据
+
+    参数含义同 market_aggtrade 与 stream_kline；服务端未实现 streamData 时退化为 iter_aggtrade 分页查询。
+
+    :return: 行数据(或每块数据)的生成器
+    """
+    data_request = build_aggtrade_request(
+        exchange, account_type, symbol, start_time, end_time, 0, 0,
+        schema, type, 10000, is_asc, is_gzip, debug
+    )
+    data_request = _stream_request(data_request, limit, chunk_size)
+    kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                  schema=schema, is_gzip=is_gzip, debug=debug, client=client)
+    page_iter = _stream_pages(data_request, market_aggtrade, start_time, end_time, limit, is_asc, output, timeout, kwargs)
+    if pages or output != OUTPUT_RECORDS:
+        return page_iter
+    return (row for rows in page_iter for row in rows)
+
+# 流式查询市场订单簿数据
+def stream_orderbook(
+    exchange: str,
+    account_type: str,
+    symbol: str,
+    start_time: any,
+    end_time: any,
+    schema: str = "BINANCE",
+    type: str = "ORDER_BOOK",
+    limit: int = 0,
+    is_asc: bool = True,
+    is_gzip: bool = False,
+    debug: bool = False,
+    client: MarketRpcClient = None,
+    chunk_size: int = 1000,
+    pages: bool = False,
+    output: str = "records",
+    timeout: float = None
+):
+    """
+    通过 streamData 流式接收 [start_time, end_time] 内的订单簿数据，单条消息不再需要容纳整页订单簿
+
+    参数含义同 market_orderbook 与 stream_kline；服务端未实现 streamData 时退化为 iter_orderbook 分页查询。
+
+    :return: 行数据(或每块数据)的生成器
+    """
+    data_request = build_orderbook_request(
+        exchange, account_type, symbol, start_time, end_time, 0, 0,
+        schema, type, 10000, is_asc, is_gzip
+    )
+    data_request = _stream_request(data_request, limit, chunk_size)
+    kwargs = dict(exchange=exchange, account_type=account_type, symbol=symbol,
+                  schema=schema, is_gzip=is_gzip, debug=debug, client=client)
+    page_iter = _stream_pages(data_request, market_orderbook, start_time, end_time, limit, is_asc, output, timeout, kwargs)
+    if pages or output != OUTPUT_RECORDS:
+        return page_iter
+    return (row for rows in page_iter for row in rows)
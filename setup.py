@@ -16,10 +16,18 @@ setup(
         "grpcio-tools==1.67.1",
         "protobuf==5.28.3",
     ],
+    extras_require={
+        "export": ["numpy", "pyarrow"],
+    },
+    entry_points={
+        "console_scripts": [
+            "marketrpc-export=marketrpc.rpcExport:main",
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.8',
 )
\ No newline at end of file
@@ -0,0 +1,93 @@
+import pytest
+
+from marketrpc import rpcUtils
+from marketrpc.rpcClient import MarketRpcClient
+from marketrpc.rpcServer import MemorySource, MarketHistoryServicer, serve
+
+# 2024-12-01 00:00:00 UTC，早于任何 settle 窗口，数据均视为已收盘
+BASE_TIMESTAMP = 1733011200000
+
+
+def kline_rows(count: int = 300) -> list:
+    rows = []
+    for i in range(count):
+        timestamp = BASE_TIMESTAMP + i * 1000
+        price = 96000.0 + (i % 17) * 0.5
+        rows.append({
+            "Time": str(timestamp), "Timestamp": timestamp, "IntervalSecond": 1,
+            "Open": price, "High": price + 1.5, "Low": price - 1.5, "Close": price + 0.25,
+            "Volume": 1.5 + i, "EndTimestamp": timestamp + 999, "TransactionNumber": 10 + i,
+            "TransactionVolume": 1.5 + i, "BuyTransactionVolume": 0.5 + i, "BuyTransactionAmount": 4 + i % 5,
+            "StartId": i * 100, "EndId": i * 100 + 99,
+        })
+    return rows
+
+
+def aggtrade_rows(count: int = 300) -> list:
+    # 每个时间戳3笔成交，按小页分页时同一时间戳的行会跨越页边界
+    rows = []
+    for i in range(count):
+        timestamp = BASE_TIMESTAMP + (i // 3) * 1000
+        rows.append({
+            "Time": str(timestamp), "Timestamp": timestamp, "AId": 5000 + i, "First": 9000 + i * 2,
+            "Last": 9001 + i * 2, "Price": 96000.0 + (i % 11) * 0.1, "Quantity": 0.25 + i % 4,
+            "IsBuyer": i % 2 == 0,
+        })
+    return rows
+
+
+def orderbook_rows(count: int = 100) -> list:
+    # 每个时间戳2个快照
+    rows = []
+    for i in range(count):
+        timestamp = BASE_TIMESTAMP + (i // 2) * 100
+        rows.append({
+            "Time": str(timestamp), "Timestamp": timestamp, "UId": 7000 + i, "PreUId": 6999 + i,
+            "Bids": [[f"{96000 - level - i % 3}.10", f"{level + 1}.500"] for level in range(3)],
+            "Asks": [[f"{96001 + level + i % 3}.20", f"{level + 2}.250"] for level in range(3)],
+        })
+    return rows
+
+
+class CountingServicer(MarketHistoryServicer):
+    """
+    记录 queryData / queryBatch 请求次数的参考服务
+    """
+
+    def __init__(self, source, chunk_size: int = 1000):
+        super().__init__(source, chunk_size)
+        self.queries = 0
+
+    def queryData(self, request, context):
+        self.queries += 1
+        return super().queryData(request, context)
+
+    def queryBatch(self, request, context):
+        self.queries += 1
+        return super().queryBatch(request, context)
+
+
+@pytest.fixture(scope="session")
+def source():
+    return MemorySource({"KLINE": kline_rows(), "AGG_TRADE": aggtrade_rows(), "ORDER_BOOK": orderbook_rows()})
+
+
+@pytest.fixture(scope="session")
+def servicer(source):
+    return CountingServicer(source)
+
+
+@pytest.fixture(scope="session")
+def client(servicer):
+    server, port = serve(servicer)
+    client = MarketRpcClient(f"127.0.0.1:{port}", options=rpcUtils.GRPC_OPTION)
+    yield client
+    client.close()
+    server.stop(None)
+
+
+@pytest.fixture(params=[False, True], ids=["json", "binary"])
+def binary(request):
+    rpcUtils.set_binary(request.param)
+    yield request.param
+    rpcUtils.set_binary(False)
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from marketrpc.rpcCache import MarketDataCache
+
+from conftest import BASE_TIMESTAMP
+from test_paging import END_TIMESTAMP, QUERIES, unpaged
+
+KEY = ("127.0.0.1:1", "BINANCE", "BINANCE", "FUTURE", "BTCUSDT", "AGG_TRADE", "")
+
+
+def cached(name: str, client, cache, start_time: int = BASE_TIMESTAMP, end_time: int = END_TIMESTAMP, **kwargs) -> list:
+    query, _, _, args = QUERIES[name]
+    return query(*args, start_time, end_time, client=client, cache=cache, **kwargs)[0]
+
+
+def page_source(rows: list, calls: list, page_size: int = 100):
+    # fetch(开始, 结束, 是否升序) 的替身，按 page_size 行分页并记录每次请求的时间段
+    def fetch(start, end, asc):
+        calls.append((start, end))
+        selected = [row for row in rows if start <= row["Timestamp"] <= end]
+        if not asc:
+            selected.reverse()
+        for offset in range(0, len(selected), page_size):
+            page = selected[offset:offset + page_size]
+            yield {"Timestamp": [row["Timestamp"] for row in page], "AId": [row["AId"] for row in page]}
+    return fetch
+
+
+class TestPlan:
+
+    def test_chunk_gap_live(self, tmp_path):
+        import numpy as np
+        cache = MarketDataCache(str(tmp_path))
+        key_dir = cache._key_dir(KEY)
+        cache._store(key_dir, 100, 199, {"Timestamp": np.arange(100, 200, dtype=np.int64)})
+        cache._store(key_dir, 150, 299, {"Timestamp": np.arange(150, 300, dtype=np.int64)})
+        cache._store(key_dir, 400, 499, {"Timestamp": np.arange(400, 500, dtype=np.int64)})
+        segments = [(kind, lower, upper) for kind, _, lower, upper in cache._plan(key_dir, 50, 700, 450)]
+        # 重叠的数据段只读取一次，未覆盖的部分为 gap，晚于 cacheable_end 的部分为 live
+        assert segments == [("gap", 50, 99), ("chunk", 100, 199), ("chunk", 200, 299), ("gap", 300, 399),
+                            ("chunk", 400, 450), ("live", 451, 700)]
+        assert cache.coverage(KEY) == [(100, 299), (400, 499)]
+
+    def test_not_settled(self, tmp_path):
+        cache = MarketDataCache(str(tmp_path))
+        now = int(time.time() * 1000)
+        segments = cache._plan(cache._key_dir(KEY), now - 1000, now, now - cache.settle_ms)
+        assert [(kind, lower, upper) for kind, _, lower, upper in segments] == [("live", now - 1000, now)]
+
+
+class TestBoundaryTrim:
+
+    ROWS = [{"Timestamp": 1000 + i // 3, "AId": i} for i in range(30)]
+
+    def test_limit_stops_mid_timestamp(self, tmp_path):
+        cache = MarketDataCache(str(tmp_path))
+        calls = []
+        arrays = cache.query(KEY, 1000, 1009, page_source(self.ROWS, calls, 5), limit=5, output="numpy")
+        assert arrays["AId"].tolist() == [0, 1, 2, 3, 4]
+        # 第5行停在时间戳1001的中间，1001不计入覆盖范围
+        assert cache.coverage(KEY) == [(1000, 1000)]
+
+        calls.clear()
+        arrays = cache.query(KEY, 1000, 1009, page_source(self.ROWS, calls), output="numpy")
+        assert arrays["AId"].tolist() == list(range(30))
+        assert calls == [(1001, 1009)]
+        assert cache.coverage(KEY) == [(1000, 1009)]
+
+    def test_descending_limit(self, tmp_path):
+        cache = MarketDataCache(str(tmp_path))
+        arrays = cache.query(KEY, 1000, 1009, page_source(self.ROWS, [], 4), limit=4, is_asc=False, output="numpy")
+        assert arrays["AId"].tolist() == [29, 28, 27, 26]
+        assert cache.coverage(KEY) == [(1009, 1009)]
+        arrays = cache.query(KEY, 1000, 1009, page_source(self.ROWS, []), is_asc=False, output="numpy")
+        assert arrays["AId"].tolist() == list(range(29, -1, -1))
+
+
+@pytest.mark.parametrize("name", ["kline", "aggtrade", "orderbook"])
+def test_cached_matches_unpaged(client, servicer, tmp_path, name):
+    expected = unpaged(name, client)
+    cache = MarketDataCache(str(tmp_path))
+    assert cached(name, client, cache) == expected
+
+    queries = servicer.queries
+    assert cached(name, client, cache) == expected
+    assert servicer.queries == queries
+
+
+def test_cached_partial_and_limit(client, servicer, tmp_path):
+    expected = unpaged("aggtrade", client)
+    cache = MarketDataCache(str(tmp_path))
+    # 限制行数时停在同一时间戳的中间，再查询完整范围时该时间戳的全部成交都要返回
+    assert cached("aggtrade", client, cache, limit=10) == unpaged("aggtrade", client, limit=10)
+    middle = expected[150]["Timestamp"]
+    assert cached("aggtrade", client, cache, middle, middle + 20000) == unpaged("aggtrade", client, middle,
+                                                                                middle + 20000)
+    assert cached("aggtrade", client, cache, limit=7) == expected[:7]
+    assert cached("aggtrade", client, cache) == expected
+    assert cached("aggtrade", client, cache, is_asc=False) == unpaged("aggtrade", client, is_asc=False)
+
+    queries = servicer.queries
+    assert cached("aggtrade", client, cache, middle, END_TIMESTAMP, limit=20) == expected[150:170]
+    assert servicer.queries == queries
+
+
+def test_unsettled_range_is_not_stored(client, tmp_path):
+    expected = unpaged("kline", client)
+    # settle_ms 覆盖整个查询范围时全部作为 live 拉取，不写入缓存
+    cache = MarketDataCache(str(tmp_path), settle_ms=int(time.time() * 1000) - BASE_TIMESTAMP + 3600 * 1000)
+    assert cached("kline", client, cache) == expected
+    assert cache.size == 0
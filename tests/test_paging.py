@@ -0,0 +1,115 @@
+import grpc
+import pytest
+
+from marketrpc import market_history_pb2_grpc, rpcUtils
+from marketrpc.rpcServer import MarketHistoryServicer, serve
+from marketrpc.rpcClient import MarketRpcClient
+from marketrpc.rpcUtils import PageCursor
+
+from conftest import BASE_TIMESTAMP
+
+END_TIMESTAMP = BASE_TIMESTAMP + 3600 * 1000
+
+# 数据类型 -> (单次查询, 分页遍历, 流式查询, 交易对参数)
+QUERIES = {
+    "kline": (rpcUtils.market_kline, rpcUtils.iter_kline, rpcUtils.stream_kline, ("future", "btcusdt", 1)),
+    "aggtrade": (rpcUtils.market_aggtrade, rpcUtils.iter_aggtrade, rpcUtils.stream_aggtrade,
+                 ("binance", "future", "btcusdt")),
+    "orderbook": (rpcUtils.market_orderbook, rpcUtils.iter_orderbook, rpcUtils.stream_orderbook,
+                  ("binance", "future", "btcusdt")),
+}
+
+
+def unpaged(name: str, client, start_time: int = BASE_TIMESTAMP, end_time: int = END_TIMESTAMP, **kwargs) -> list:
+    query, _, _, args = QUERIES[name]
+    return query(*args, start_time, end_time, client=client, cache=False, **kwargs)[0]
+
+
+class TestPageCursor:
+
+    def test_dedupe_by_timestamp(self):
+        cursor = PageCursor("KLINE", 0, 100, limit=3)
+        assert cursor.advance_rows([{"Timestamp": 1}, {"Timestamp": 2}, {"Timestamp": 3}]) == [
+            {"Timestamp": 1}, {"Timestamp": 2}, {"Timestamp": 3}]
+        assert cursor.start_time == 3
+        assert cursor.advance_rows([{"Timestamp": 3}, {"Timestamp": 4}]) == [{"Timestamp": 4}]
+        assert cursor.done
+
+    @pytest.mark.parametrize("type, key", [("AGG_TRADE", "AId"), ("ORDER_BOOK", "UId")])
+    def test_dedupe_by_row_key(self, type, key):
+        cursor = PageCursor(type, 0, 100, limit=3)
+        first = [{"Timestamp": 1, key: 10}, {"Timestamp": 2, key: 11}, {"Timestamp": 2, key: 12}]
+        assert cursor.advance_rows(first) == first
+        assert (cursor.start_time, cursor.boundary_keys) == (2, {11, 12})
+        # 下一页从时间戳2(含)开始，已返回的行被跳过，同一时间戳的新行保留
+        second = [{"Timestamp": 2, key: 11}, {"Timestamp": 2, key: 12}, {"Timestamp": 2, key: 13}]
+        assert cursor.advance_rows(second) == [{"Timestamp": 2, key: 13}]
+        assert cursor.boundary_keys == {11, 12, 13}
+        assert cursor.advance_rows([{"Timestamp": 2, key: 13}, {"Timestamp": 3, key: 14}]) == [
+            {"Timestamp": 3, key: 14}]
+        assert cursor.done
+
+    def test_descending(self):
+        cursor = PageCursor("AGG_TRADE", 0, 100, limit=2, is_asc=False)
+        assert len(cursor.advance_rows([{"Timestamp": 9, "AId": 5}, {"Timestamp": 8, "AId": 4}])) == 2
+        assert (cursor.start_time, cursor.end_time) == (0, 8)
+        assert cursor.advance_rows([{"Timestamp": 8, "AId": 4}, {"Timestamp": 8, "AId": 3}]) == [
+            {"Timestamp": 8, "AId": 3}]
+
+    def test_columns(self):
+        cursor = PageCursor("AGG_TRADE", 0, 100, limit=2)
+        cursor.advance_page({"Timestamp": [1, 2], "AId": [1, 2]}, "columns")
+        assert cursor.advance_page({"Timestamp": [2, 3], "AId": [2, 3]}, "columns") == {"Timestamp": [3], "AId": [3]}
+
+
+@pytest.mark.parametrize("name", ["kline", "aggtrade"])
+@pytest.mark.parametrize("is_asc", [True, False], ids=["asc", "desc"])
+def test_paged_matches_unpaged(client, binary, name, is_asc):
+    expected = unpaged(name, client, is_asc=is_asc)
+    _, iterate, _, args = QUERIES[name]
+    for limit in (7, 9, 300):
+        assert list(iterate(*args, BASE_TIMESTAMP, END_TIMESTAMP, limit=limit, is_asc=is_asc, client=client)) == expected
+
+
+@pytest.mark.parametrize("is_asc", [True, False], ids=["asc", "desc"])
+def test_paged_orderbook_matches_unpaged(client, is_asc):
+    expected = unpaged("orderbook", client, is_asc=is_asc)
+    for limit in (3, 5):
+        assert list(rpcUtils.iter_orderbook("binance", "future", "btcusdt", BASE_TIMESTAMP, END_TIMESTAMP, limit=limit,
+                                            is_asc=is_asc, client=client)) == expected
+
+
+def test_paged_columns_match_unpaged(client):
+    expected = unpaged("aggtrade", client)
+    pages = list(rpcUtils.iter_aggtrade("binance", "future", "btcusdt", BASE_TIMESTAMP, END_TIMESTAMP, limit=7,
+                                        client=client, output="columns"))
+    assert [aid for page in pages for aid in page["AId"]] == [row["AId"] for row in expected]
+
+
+@pytest.mark.parametrize("name", ["kline", "aggtrade", "orderbook"])
+def test_streamed_matches_unpaged(client, name):
+    expected = unpaged(name, client)
+    _, _, stream, args = QUERIES[name]
+    assert list(stream(*args, BASE_TIMESTAMP, END_TIMESTAMP, chunk_size=7, client=client)) == expected
+    assert list(stream(*args, BASE_TIMESTAMP, END_TIMESTAMP, limit=10, client=client)) == expected[:10]
+
+
+def test_stream_falls_back_to_paging(source):
+    # 不支持 streamData 的服务端返回 UNIMPLEMENTED，客户端改为分页查询
+    class NoStreamServicer(MarketHistoryServicer):
+        streamData = market_history_pb2_grpc.MarketHistoryServiceServicer.streamData
+
+    server, port = serve(NoStreamServicer(source))
+    client = MarketRpcClient(f"127.0.0.1:{port}", options=rpcUtils.GRPC_OPTION)
+    try:
+        expected = unpaged("aggtrade", client)
+        assert list(rpcUtils.stream_aggtrade("binance", "future", "btcusdt", BASE_TIMESTAMP, END_TIMESTAMP,
+                                             client=client)) == expected
+        assert list(rpcUtils.stream_aggtrade("binance", "future", "btcusdt", BASE_TIMESTAMP, END_TIMESTAMP, limit=10,
+                                             client=client)) == expected[:10]
+        with pytest.raises(grpc.RpcError):
+            list(rpcUtils.stream_data(rpcUtils.build_aggtrade_request("binance", "future", "btcusdt", BASE_TIMESTAMP,
+                                                                      END_TIMESTAMP), client=client))
+    finally:
+        client.close()
+        server.stop(None)